@@ -0,0 +1,141 @@
+"""Cold-start benchmark for the Lambda handlers.
+
+For each handler, fresh interpreters import the handler module and then run
+its first-use initialization: creating the SDK clients and importing the heavy
+modules that are deferred to the first invocation. Both steps are timed.
+A `python -X importtime` report is captured for each handler as well, and its
+slowest imports are printed with the timings.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 5] [--output-dir benchmarks/output]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+FUNCTIONS_DIR = os.path.join(ROOT, "functions")
+PYDUB_LAYER_DIR = os.path.join(ROOT, "pydub_layer", "python")
+
+# What the first invocation of each handler initializes on top of the import
+FIRST_USE = {
+    "email_filter": (
+        "import clients, allowlist\n"
+        "clients.s3_client()\n"
+        "clients.lambda_client()\n"
+        "allowlist.get_allowlist()\n"
+    ),
+    "raw_data_to_audio": (
+        "import clients\n"
+        "clients.s3_client()\n"
+        "clients.openai_client()\n"
+        "from pydub import AudioSegment\n"
+    ),
+}
+
+MEASURE = """
+import importlib, json, time
+t0 = time.perf_counter()
+importlib.import_module({handler!r})
+t1 = time.perf_counter()
+exec({first_use!r})
+t2 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "first_invocation_ms": (t2 - t1) * 1000}}))
+"""
+
+
+def handler_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [FUNCTIONS_DIR, PYDUB_LAYER_DIR] + env.get("PYTHONPATH", "").split(os.pathsep)
+    ).rstrip(os.pathsep)
+    # clients are only constructed, never called
+    env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    env.setdefault("OPENAI_API_KEY", "cold-start-benchmark")
+    env.setdefault("WHITELIST", "cold-start@example.com")
+    return env
+
+
+def measure(handler, runs):
+    code = MEASURE.format(handler=handler, first_use=FIRST_USE[handler])
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=FUNCTIONS_DIR,
+            env=handler_env(),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def importtime_report(handler):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {handler}"],
+        cwd=FUNCTIONS_DIR,
+        env=handler_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return out.stderr
+
+
+def slowest_imports(report, count):
+    """Top-level packages of the report sorted by cumulative import time."""
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit() or "." in name.strip():
+            continue
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to print")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "benchmarks", "output"))
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary = {}
+
+    print(f"{'handler':<20} {'import ms':>12} {'first invocation ms':>22}   (median of {args.runs})")
+    for handler in FIRST_USE:
+        results = measure(handler, args.runs)
+        import_ms = statistics.median(r["import_ms"] for r in results)
+        first_ms = statistics.median(r["first_invocation_ms"] for r in results)
+        summary[handler] = {
+            "runs": results,
+            "import_ms": import_ms,
+            "first_invocation_ms": first_ms,
+        }
+        print(f"{handler:<20} {import_ms:>12.1f} {first_ms:>22.1f}")
+
+    for handler in FIRST_USE:
+        report = importtime_report(handler)
+        report_path = os.path.join(args.output_dir, f"importtime_{handler}.txt")
+        with open(report_path, "w") as f:
+            f.write(report)
+        summary[handler]["importtime_report"] = os.path.relpath(report_path, ROOT)
+
+        print(f"\nslowest imports of {handler} (cumulative us), full report in {report_path}")
+        for cumulative, name in slowest_imports(report, args.top):
+            print(f"  {cumulative:>10}  {name}")
+
+    with open(os.path.join(args.output_dir, "cold_start.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark of the pydub sample engine backends.
+
+Times the AudioSegment operations that go through `pydub.sample_engine` on
+16-bit 44.1 kHz stereo noise, once per backend, and prints a markdown table
+with the speedup of NumPy over audioop. The table and the raw timings are
+also written to the output directory. Without NumPy installed only the
+audioop column is filled in.
+
+Usage:
+    python benchmarks/sample_engine.py [--minutes 1 10 60] [--repeat 3] [--output-dir benchmarks/output]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.join(ROOT, "pydub_layer", "python"))
+
+from pydub import AudioSegment, sample_engine  # noqa: E402
+from pydub.mixer import Mixer  # noqa: E402
+
+FRAME_RATE = 44100
+
+OPERATIONS = {
+    "apply_gain": lambda seg, mono: seg.apply_gain(-3.5),
+    "overlay": lambda seg, mono: seg.overlay(seg[: len(seg) // 2], position=len(seg) // 4),
+    "overlay (ducked)": lambda seg, mono: seg.overlay(
+        seg[: len(seg) // 2], position=len(seg) // 4, gain_during_overlay=-6
+    ),
+    "Mixer (4 tracks)": lambda seg, mono: mix_quarters(seg),
+    "set_channels(1)": lambda seg, mono: seg.set_channels(1),
+    "set_channels(2)": lambda seg, mono: mono.set_channels(2),
+    "split_to_mono": lambda seg, mono: seg.split_to_mono(),
+    "from_mono_audiosegments": lambda seg, mono: AudioSegment.from_mono_audiosegments(mono, mono),
+    "get_dc_offset": lambda seg, mono: seg.get_dc_offset(2),
+    "remove_dc_offset": lambda seg, mono: seg.remove_dc_offset(),
+}
+
+
+def mix_quarters(seg):
+    # four half-length tracks, staggered so up to three overlap at a time
+    quarter = len(seg) // 4
+    mixer = Mixer(seg)
+    for i in range(4):
+        mixer.add(seg[i * quarter:(i + 2) * quarter], position=i * quarter, gain=-6)
+    return mixer.mix()
+
+
+def noise(minutes, channels):
+    frames = int(minutes * 60 * FRAME_RATE)
+    return AudioSegment(
+        os.urandom(frames * 2 * channels),
+        sample_width=2,
+        frame_rate=FRAME_RATE,
+        channels=channels,
+    )
+
+
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+        del result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 60])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per operation, best is kept")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "benchmarks", "output"))
+    args = parser.parse_args()
+
+    engines = sample_engine.available_engines()
+    os.makedirs(args.output_dir, exist_ok=True)
+    results = []
+
+    table = []
+
+    def row(line):
+        print(line)
+        table.append(line)
+
+    row("| duration | operation | " + " | ".join(f"{name} s" for name in engines) + " | speedup |")
+    row("|---|---|" + "---:|" * (len(engines) + 1))
+    for minutes in args.minutes:
+        seg = noise(minutes, 2)
+        mono = noise(minutes, 1)
+        for operation, fn in OPERATIONS.items():
+            timings = {}
+            for name in engines:
+                sample_engine.set_engine(name)
+                timings[name] = best_time(lambda seg=seg, mono=mono: fn(seg, mono), args.repeat)
+            speedup = timings["audioop"] / timings["numpy"] if "numpy" in timings else None
+            results.append(
+                {"minutes": minutes, "operation": operation, "seconds": timings, "speedup": speedup}
+            )
+            cells = " | ".join(f"{timings[name]:.3f}" for name in engines)
+            row(f"| {minutes:g} min | {operation} | {cells} | "
+                + (f"{speedup:.1f}x" if speedup else "-") + " |")
+        # free this duration's audio before making the next one
+        del seg, mono
+
+    sample_engine.set_engine()
+    with open(os.path.join(args.output_dir, "sample_engine.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    with open(os.path.join(args.output_dir, "sample_engine.md"), "w") as f:
+        f.write("\n".join(table) + "\n")
+
+
+if __name__ == "__main__":
+    main()
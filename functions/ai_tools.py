@@ -1,12 +1,18 @@
 import logging
 import os
 import tempfile
-from openai import OpenAI
 
+from clients import openai_client
+from constants import (
+    EXTRACT_COST_PER_INPUT_TOKEN,
+    EXTRACT_COST_PER_OUTPUT_TOKEN,
+    EXTRACT_MODEL,
+    TTS_COST_PER_CHAR,
+    TTS_MODEL,
+)
+from metrics import log_payload, stage
 from typing import Literal
 
-openai_client = OpenAI(api_key=os.environ["OPENAI_API_KEY"], timeout=60)
-
 logger = logging.getLogger()
 
 
@@ -22,20 +28,35 @@ def extract_text_from_raw_data(raw_data: str) -> str | None:
 
     prompt = f"{base_prompt}{raw_data}"
 
-    logger.info(f"Prompt to OpenAI: {prompt}")
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-            },
-        ],
-        temperature=0,
-        max_tokens=16383,
-    )
-    extracted_text = response.choices[0].message.content
-    logger.info(f"Response from OpenAI: {extracted_text}")
+    log_payload("Prompt to OpenAI", prompt)
+    with stage("extract", model=EXTRACT_MODEL) as extract:
+        raw_response = openai_client().chat.completions.with_raw_response.create(
+            model=EXTRACT_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                },
+            ],
+            temperature=0,
+            max_tokens=16383,
+        )
+        response = raw_response.parse()
+        extracted_text = response.choices[0].message.content
+
+        extract.record("Retries", getattr(raw_response, "retries_taken", 0))
+        extract.record("InputChars", len(prompt))
+        extract.record("OutputChars", len(extracted_text or ""))
+        if response.usage:
+            extract.record("InputTokens", response.usage.prompt_tokens)
+            extract.record("OutputTokens", response.usage.completion_tokens)
+            extract.record(
+                "EstimatedCost",
+                response.usage.prompt_tokens * EXTRACT_COST_PER_INPUT_TOKEN
+                + response.usage.completion_tokens * EXTRACT_COST_PER_OUTPUT_TOKEN,
+                "None",
+            )
+    log_payload("Response from OpenAI", extracted_text or "")
     return extracted_text
 
 
@@ -47,10 +68,16 @@ def text_to_audio(
     """Convert text to audio. Returns the path to the audio file."""
     temp_dir = tempfile.gettempdir()
     speech_file_path = os.path.join(temp_dir, filename + ".mp3")
-    with openai_client.audio.speech.with_streaming_response.create(
-        model="tts-1",
-        voice=voice,
-        input=text,
-    ) as response:
-        response.stream_to_file(speech_file_path)
+    with stage("synthesize", model=TTS_MODEL, chunk=filename) as synthesize:
+        with openai_client().audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=voice,
+            input=text,
+        ) as response:
+            response.stream_to_file(speech_file_path)
+
+        synthesize.record("Retries", getattr(response, "retries_taken", 0))
+        synthesize.record("InputChars", len(text))
+        synthesize.record("Bytes", os.path.getsize(speech_file_path), "Bytes")
+        synthesize.record("EstimatedCost", len(text) * TTS_COST_PER_CHAR, "None")
     return speech_file_path
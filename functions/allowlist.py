@@ -0,0 +1,136 @@
+import logging
+import os
+import time
+from dataclasses import dataclass
+from s3_utils import get_file_content_if_modified
+from typing import FrozenSet, Iterable, Tuple
+
+# How long a loaded allowlist file is trusted before checking S3 for changes
+DEFAULT_TTL_SECONDS = 300
+
+logger = logging.getLogger()
+
+
+@dataclass(frozen=True)
+class SenderAllowlist:
+    """Senders allowed to submit emails.
+
+    Entries are either full addresses ("jane@example.com"), every address of a
+    domain ("*@example.com") or every address of its subdomains
+    ("*@*.example.com"). Lookups are set membership tests, plus one per label
+    of the sender's domain for the subdomain wildcards.
+    """
+
+    addresses: FrozenSet[str]
+    domains: FrozenSet[str]
+    parent_domains: FrozenSet[str]
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[str]) -> "SenderAllowlist":
+        addresses = set()
+        domains = set()
+        parent_domains = set()
+        for entry in entries:
+            entry = entry.strip().lower()
+            if not entry or entry.startswith("#"):
+                continue
+            if entry.startswith("*@*."):
+                parent_domains.add(entry[4:])
+            elif entry.startswith("*@"):
+                domains.add(entry[2:])
+            else:
+                addresses.add(entry)
+        return cls(frozenset(addresses), frozenset(domains), frozenset(parent_domains))
+
+    @classmethod
+    def from_text(cls, text: str) -> "SenderAllowlist":
+        """Parse entries separated by commas or newlines; "#" starts a comment."""
+        lines = (line.split("#", 1)[0] for line in text.splitlines())
+        return cls.from_entries(entry for line in lines for entry in line.split(","))
+
+    def __len__(self) -> int:
+        return len(self.addresses) + len(self.domains) + len(self.parent_domains)
+
+    def allows(self, sender: str) -> bool:
+        sender = sender.strip().lower()
+        if sender in self.addresses:
+            return True
+        _, _, domain = sender.rpartition("@")
+        if not domain:
+            return False
+        if domain in self.domains:
+            return True
+        # walk up the parents of the domain: a.b.example.com -> b.example.com
+        # -> example.com -> com
+        _, _, parent = domain.partition(".")
+        while parent:
+            if parent in self.parent_domains:
+                return True
+            _, _, parent = parent.partition(".")
+        return False
+
+
+def _parse_s3_uri(uri: str) -> Tuple[str, str]:
+    if not uri.startswith("s3://"):
+        raise ValueError(f"Invalid S3 URI for the allowlist: {uri}")
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    return bucket, key
+
+
+class AllowlistLoader:
+    """Loads the allowlist once per container and refreshes it after a TTL.
+
+    Entries come from the WHITELIST environment variable (comma separated) and,
+    when WHITELIST_S3_URI is set, from that S3 object (one entry per line).
+    After WHITELIST_TTL_SECONDS the S3 object is fetched again, conditionally on
+    its ETag, so unchanged files are not downloaded. If a refresh fails, the
+    allowlist already loaded stays in use.
+    """
+
+    def __init__(self) -> None:
+        self._allowlist: SenderAllowlist | None = None
+        self._etag: str | None = None
+        self._file_text = ""
+        self._expires_at = 0.0
+
+    def get(self) -> SenderAllowlist:
+        if self._allowlist is not None and time.monotonic() < self._expires_at:
+            return self._allowlist
+        try:
+            self._load()
+        except Exception as e:
+            if self._allowlist is None:
+                raise e
+            logger.error(f"Error refreshing the sender allowlist, keeping the current one: {e}")
+            self._expires_at = time.monotonic() + self._ttl()
+        return self._allowlist
+
+    def _ttl(self) -> float:
+        return float(os.environ.get("WHITELIST_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+
+    def _load(self) -> None:
+        uri = os.environ.get("WHITELIST_S3_URI")
+        file_changed = False
+        if uri:
+            bucket, key = _parse_s3_uri(uri)
+            text, self._etag = get_file_content_if_modified(bucket, key, self._etag)
+            if text is not None:
+                self._file_text = text
+                file_changed = True
+            self._expires_at = time.monotonic() + self._ttl()
+        else:
+            # nothing to refresh, the environment can't change in a container
+            self._expires_at = float("inf")
+
+        if self._allowlist is None or file_changed:
+            env_text = os.environ.get("WHITELIST", "")
+            self._allowlist = SenderAllowlist.from_text(env_text + "\n" + self._file_text)
+            logger.info(f"Loaded sender allowlist with {len(self._allowlist)} entries")
+
+
+_loader = AllowlistLoader()
+
+
+def get_allowlist() -> SenderAllowlist:
+    """Get the sender allowlist of this container."""
+    return _loader.get()
@@ -3,9 +3,8 @@ import os
 import tempfile
 
 from ai_tools import text_to_audio
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from natsort import natsorted
-from pydub import AudioSegment  # type: ignore
+from concurrent.futures import ThreadPoolExecutor
+from metrics import record, stage
 from s3_utils import (
     file_exists,
     new_key_for_processed_file,
@@ -18,13 +17,19 @@ MAX_TTS_CHARS = 4096
 logger = logging.getLogger()
 
 
+@stage("assemble")
 def reassemble_audio_files(tmp_files: List[str]) -> str:
     """Reassemble the audio files into one."""
-    audio_segments = [AudioSegment.from_file(file) for file in tmp_files]
+    # pydub is only needed once there is audio to assemble
+    from pydub import AudioSegment  # type: ignore
+
+    # the chunks' ffmpeg processes run side by side
+    audio_segments = AudioSegment.from_files(tmp_files)
     combined = sum(audio_segments)
     temp_dir = tempfile.gettempdir()
     speech_file_path = os.path.join(temp_dir, "speech.mp3")
     combined.export(speech_file_path, format="mp3")
+    record("Bytes", os.path.getsize(speech_file_path), "Bytes")
     return speech_file_path
 
 
@@ -59,7 +64,10 @@ def handle_audio(input_key: str, text: str, output_bucket: str) -> str:
     audio_file_exists = file_exists(output_bucket, audio_key)
     if not audio_file_exists:
         # Chunk the text into smaller pieces
-        chunked_texts = chunk_texts(text)
+        with stage("chunk") as chunk:
+            chunked_texts = chunk_texts(text)
+            chunk.record("InputChars", len(text))
+            chunk.record("Chunks", len(chunked_texts))
 
         # Convert each chunk to audio in parallel
         futures = []
@@ -68,11 +76,13 @@ def handle_audio(input_key: str, text: str, output_bucket: str) -> str:
             for idx, chunk in enumerate(chunked_texts):
                 futures.append(executor.submit(text_to_audio, chunk, str(idx), "alloy"))
 
-            chunk_files = [future.result() for future in as_completed(futures)]
+            # futures are in chunk order
+            chunk_files = [future.result() for future in futures]
 
         # Reassemble the audio files and write the final audio file to S3
-        tmp_file = reassemble_audio_files(natsorted(chunk_files))
-        write_file_to_s3(output_bucket, audio_key, tmp_file)
+        tmp_file = reassemble_audio_files(chunk_files)
+        with stage("upload", key=audio_key):
+            write_file_to_s3(output_bucket, audio_key, tmp_file)
     else:
         logger.info(f"Audio file already exists: {output_bucket}/{audio_key}")
 
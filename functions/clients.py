@@ -0,0 +1,53 @@
+"""Lazily created clients shared by the handler modules.
+
+Clients are created on first use rather than at import, so a cold start only
+pays for the SDKs the invocation actually needs. Each client is created once
+per container and reused across invocations and threads.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict
+
+_clients: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            # another thread may have created it while we were waiting
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def boto3_client(service_name: str) -> Any:
+    """Get the boto3 client for an AWS service."""
+
+    def factory() -> Any:
+        import boto3  # type: ignore
+
+        return boto3.client(service_name)
+
+    return _get_or_create(f"boto3.{service_name}", factory)
+
+
+def s3_client() -> Any:
+    return boto3_client("s3")
+
+
+def lambda_client() -> Any:
+    return boto3_client("lambda")
+
+
+def openai_client() -> Any:
+    """Get the OpenAI client."""
+
+    def factory() -> Any:
+        from openai import OpenAI
+
+        return OpenAI(api_key=os.environ["OPENAI_API_KEY"], timeout=60)
+
+    return _get_or_create("openai", factory)
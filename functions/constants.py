@@ -0,0 +1,20 @@
+RSS_FEED_KEY = "rss/podcast_feed.xml"
+# Episode durations keyed by audio key, along with the ETag they were read from
+RSS_DURATIONS_KEY = "rss/durations.json"
+RSS_FEED_CONTENT_TYPE = "application/rss+xml; charset=utf-8"
+# Podcast clients poll the feed constantly, so let caches hold it for a few
+# minutes and revalidate against the ETag afterwards.
+RSS_FEED_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+
+# CloudWatch namespace of the pipeline metrics
+METRICS_NAMESPACE = "Speakyer"
+
+# List prices in USD, used to estimate the cost of each request
+EXTRACT_MODEL = "gpt-4o-mini"
+EXTRACT_COST_PER_INPUT_TOKEN = 0.15 / 1_000_000
+EXTRACT_COST_PER_OUTPUT_TOKEN = 0.60 / 1_000_000
+TTS_MODEL = "tts-1"
+TTS_COST_PER_CHAR = 15.0 / 1_000_000
+
+# Object metadata key holding the SHA-256 of the published content
+CONTENT_HASH_METADATA_KEY = "content-sha256"
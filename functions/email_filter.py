@@ -1,22 +1,18 @@
-import boto3  # type: ignore
 import logging
 import json
 import os
+from allowlist import get_allowlist
+from clients import lambda_client, s3_client
 from models import EmailInfo
 from responses import error_response, forbidden_response, success_response
 from typing import Any, Dict
 
-s3 = boto3.client("s3")
-lambda_client = boto3.client("lambda")
-
 logger = logging.getLogger()
 
 
 def validate_sender(sender: str) -> bool:
     """Check if the sender is whitelisted."""
-    return sender.lower() in [
-        email.lower() for email in os.environ["WHITELIST"].split(",")
-    ]
+    return get_allowlist().allows(sender)
 
 
 def invoke_next_lambda(payload: Dict[str, Any]) -> None:
@@ -24,7 +20,7 @@ def invoke_next_lambda(payload: Dict[str, Any]) -> None:
     logger.info(f"Invoking {function_name} with payload: {payload}")
     # invoke the next lambda synchronously
     try:
-        lambda_client.invoke(
+        lambda_client().invoke(
             FunctionName=function_name,
             InvocationType="Event",
             Payload=json.dumps(payload),
@@ -48,7 +44,7 @@ def lambda_handler(event, _):
         try:
             bucket = os.environ["S3_BUCKET"]
             key = f"emails/{email_info.message_id}.json"
-            s3.put_object(
+            s3_client().put_object(
                 Bucket=bucket,
                 Key=key,
                 Body=json.dumps(email_info.message),
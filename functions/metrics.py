@@ -0,0 +1,132 @@
+"""Lightweight per-stage instrumentation for the pipeline.
+
+Each stage is timed with `stage`, used as a context manager or a decorator.
+Counts such as characters, tokens, bytes and retries are recorded onto the
+stage running in the current context. When a stage ends, it is written to
+stdout as one CloudWatch embedded metric format (EMF) JSON line. CloudWatch
+turns those lines into metrics with a "Stage" dimension.
+
+    with stage("fetch", key=key) as fetch:
+        data = get_data()
+        fetch.record("Bytes", len(data), "Bytes")
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import time
+from constants import METRICS_NAMESPACE
+from typing import Any, Callable, Dict, Tuple
+
+# Payload logging is capped and sampled so prompts, responses and feeds don't
+# flood the logs. Both can be overridden through the environment.
+DEFAULT_PAYLOAD_LOG_MAX_CHARS = 1000
+DEFAULT_PAYLOAD_LOG_SAMPLE_RATE = 0.05
+
+logger = logging.getLogger()
+
+_current_stage: contextvars.ContextVar["Stage | None"] = contextvars.ContextVar(
+    "current_stage", default=None
+)
+
+
+class Stage:
+    """A timed pipeline stage, created with `stage`."""
+
+    def __init__(self, name: str, properties: Dict[str, Any]) -> None:
+        self.name = name
+        self.properties = properties
+        self.metrics: Dict[str, Tuple[float, str]] = {}
+        self._start = 0.0
+        self._token: contextvars.Token | None = None
+
+    def __enter__(self) -> "Stage":
+        self.metrics = {}
+        self._token = _current_stage.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.record("Duration", (time.perf_counter() - self._start) * 1000, "Milliseconds")
+        if exc_type is not None:
+            self.record("Errors", 1)
+        if self._token is not None:
+            _current_stage.reset(self._token)
+        emit(self.name, self.metrics, self.properties)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # a new Stage per call, so concurrent calls don't share state
+            with Stage(self.name, self.properties):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def record(self, name: str, value: float, unit: str = "Count") -> None:
+        """Add value to the metric, creating it if needed."""
+        total, unit = self.metrics.get(name, (0, unit))
+        self.metrics[name] = (total + value, unit)
+
+
+def stage(name: str, **properties: Any) -> Stage:
+    """Time a pipeline stage, as a context manager or a decorator.
+
+    Parameters:
+        name (str): The stage name, emitted as the "Stage" dimension
+        properties: Extra fields to emit with the metrics (not dimensions)
+    """
+    return Stage(name, properties)
+
+
+def record(name: str, value: float, unit: str = "Count") -> None:
+    """Record a metric on the stage running in the current context, if any."""
+    current = _current_stage.get()
+    if current is not None:
+        current.record(name, value, unit)
+
+
+def record_aws_response(response: Dict[str, Any]) -> None:
+    """Record the retries boto3 made for a request."""
+    retries = response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+    record("Retries", retries)
+
+
+def emit(stage_name: str, metrics: Dict[str, Tuple[float, str]], properties: Dict[str, Any]) -> None:
+    """Write metrics as one embedded metric format JSON line to stdout."""
+    line: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Stage"]],
+                    "Metrics": [
+                        {"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()
+                    ],
+                }
+            ],
+        },
+        "Stage": stage_name,
+    }
+    line.update(properties)
+    line.update({name: value for name, (value, _) in metrics.items()})
+    sys.stdout.write(json.dumps(line, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def log_payload(label: str, payload: str) -> None:
+    """Log a sample of large payloads, truncated to a maximum size."""
+    sample_rate = float(
+        os.environ.get("PAYLOAD_LOG_SAMPLE_RATE", DEFAULT_PAYLOAD_LOG_SAMPLE_RATE)
+    )
+    if random.random() >= sample_rate:
+        return
+    max_chars = int(os.environ.get("PAYLOAD_LOG_MAX_CHARS", DEFAULT_PAYLOAD_LOG_MAX_CHARS))
+    if len(payload) > max_chars:
+        payload = f"{payload[:max_chars]}... [truncated, {len(payload)} chars]"
+    logger.info(f"{label}: {payload}")
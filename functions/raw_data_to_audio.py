@@ -2,6 +2,7 @@ import logging
 import os
 
 from audio_handler import handle_audio
+from metrics import stage
 from responses import success_response, error_response
 from rss_handler import handle_rss
 from s3_utils import (
@@ -15,7 +16,8 @@ logger = logging.getLogger()
 def lambda_handler(event, _):
     bucket = event["bucket"]
     key = event["key"]
-    raw_data = get_file_content_from_s3(bucket, key)
+    with stage("fetch", key=key):
+        raw_data = get_file_content_from_s3(bucket, key)
 
     output_bucket = os.environ["OUTPUT_S3_BUCKET"]
     extracted_text, text_key = handle_text(
@@ -28,7 +30,8 @@ def lambda_handler(event, _):
         input_key=key, text=extracted_text, output_bucket=output_bucket
     )
 
-    handle_rss(bucket_name=output_bucket)
+    with stage("rss"):
+        handle_rss(bucket_name=output_bucket)
 
     return success_response(
         f"Extracted text from {key} stored in {output_bucket}/{text_key} and audio stored in {output_bucket}/{audio_key}"
@@ -1,11 +1,29 @@
-import boto3  # type: ignore
+import json
 import logging
+from clients import s3_client
+from constants import (
+    RSS_DURATIONS_KEY,
+    RSS_FEED_CACHE_CONTROL,
+    RSS_FEED_CONTENT_TYPE,
+    RSS_FEED_KEY,
+)
 from datetime import datetime
-from s3_utils import write_text_to_s3
+from metrics import log_payload
+from pydub.exceptions import CouldntDecodeError  # type: ignore
+from pydub.mp3_index import index_mp3  # type: ignore
+from s3_utils import (
+    file_exists,
+    get_file_bytes_from_s3,
+    get_file_content_from_s3,
+    publish_text_to_s3,
+    write_text_to_s3,
+)
+from typing import Any, Dict, List
 from xml.etree.ElementTree import Element, SubElement, tostring
 from xml.dom.minidom import parseString
 
-s3 = boto3.client("s3")
+ITUNES_NAMESPACE = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+
 logger = logging.getLogger()
 
 
@@ -13,6 +31,52 @@ def format_date_rss(date: datetime) -> str:
     return date.strftime("%a, %d %b %Y %H:%M:%S +0000")
 
 
+def format_duration_rss(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def get_episode_durations(
+    bucket_name: str, objects: List[Dict[str, Any]]
+) -> Dict[str, float]:
+    """Get the duration of each MP3 file in seconds.
+
+    Durations are kept in an index in the bucket, keyed by audio key along with
+    the ETag they were computed from. Only new or changed files are downloaded
+    and indexed (by reading their MP3 frame headers, without decoding).
+
+    Parameters:
+        bucket_name (str): The name of the S3 bucket holding the audio files
+        objects (List[Dict[str, Any]]): The audio objects listed from S3
+    Returns:
+        Dict[str, float]: The duration of each audio file, by key
+    """
+    index: Dict[str, Dict[str, Any]] = {}
+    if file_exists(bucket_name, RSS_DURATIONS_KEY):
+        index = json.loads(get_file_content_from_s3(bucket_name, RSS_DURATIONS_KEY))
+
+    durations = {}
+    index_changed = False
+    for obj in objects:
+        key = obj["Key"]
+        entry = index.get(key)
+        if entry is None or entry["etag"] != obj["ETag"]:
+            try:
+                mp3_index = index_mp3(get_file_bytes_from_s3(bucket_name, key))
+            except CouldntDecodeError as e:
+                logger.error(f"Error reading duration of {bucket_name}/{key}: {e}")
+                continue
+            entry = {"etag": obj["ETag"], "duration": mp3_index.duration}
+            index[key] = entry
+            index_changed = True
+        durations[key] = entry["duration"]
+
+    if index_changed:
+        write_text_to_s3(bucket_name, RSS_DURATIONS_KEY, json.dumps(index))
+
+    return durations
+
+
 def handle_rss(bucket_name: str):
     """Generate an RSS feed from the audio files in the S3 bucket.
 
@@ -23,10 +87,10 @@ def handle_rss(bucket_name: str):
     audio_files_prefix = "audios/"
 
     # Fetch the list of audio files from S3
-    response = s3.list_objects_v2(Bucket=bucket_name, Prefix=audio_files_prefix)
+    response = s3_client().list_objects_v2(Bucket=bucket_name, Prefix=audio_files_prefix)
 
     # Start building the RSS XML structure
-    rss = Element("rss", version="2.0")
+    rss = Element("rss", {"version": "2.0", "xmlns:itunes": ITUNES_NAMESPACE})
     channel = SubElement(rss, "channel")
 
     # Add basic channel info
@@ -40,39 +104,58 @@ def handle_rss(bucket_name: str):
     description.text = "Turn anything into a podcast."
 
     # Add the podcast items (episodes) for each audio file
-
-    for obj in response.get("Contents", []):
-        if obj["Key"].endswith(".mp3"):  # Adjust for your audio format
-            item = SubElement(channel, "item")
-
-            item_title = SubElement(item, "title")
-            item_title.text = (
-                obj["Key"].replace(audio_files_prefix, "").replace(".mp3", "")
-            )
-
-            item_link = SubElement(item, "link")
-            item_link.text = base_url + obj["Key"]
-
-            item_guid = SubElement(item, "guid")
-            item_guid.text = base_url + obj["Key"]
-
-            item_pubDate = SubElement(item, "pubDate")
-            last_modified = obj["LastModified"]
-            item_pubDate.text = format_date_rss(last_modified)
-
-            _ = SubElement(
-                item,
-                "enclosure",
-                url=base_url + obj["Key"],
-                length=str(obj["Size"]),
-                type="audio/mpeg",
-            )
+    audio_objects = [
+        obj
+        for obj in response.get("Contents", [])
+        if obj["Key"].endswith(".mp3")  # Adjust for your audio format
+    ]
+    durations = get_episode_durations(bucket_name, audio_objects)
+
+    for obj in audio_objects:
+        item = SubElement(channel, "item")
+
+        item_title = SubElement(item, "title")
+        item_title.text = (
+            obj["Key"].replace(audio_files_prefix, "").replace(".mp3", "")
+        )
+
+        item_link = SubElement(item, "link")
+        item_link.text = base_url + obj["Key"]
+
+        item_guid = SubElement(item, "guid")
+        item_guid.text = base_url + obj["Key"]
+
+        item_pubDate = SubElement(item, "pubDate")
+        last_modified = obj["LastModified"]
+        item_pubDate.text = format_date_rss(last_modified)
+
+        _ = SubElement(
+            item,
+            "enclosure",
+            url=base_url + obj["Key"],
+            length=str(obj["Size"]),
+            type="audio/mpeg",
+        )
+
+        if obj["Key"] in durations:
+            item_duration = SubElement(item, "itunes:duration")
+            item_duration.text = format_duration_rss(durations[obj["Key"]])
 
     # Convert the ElementTree to a string and format it
     rss_string = tostring(rss, encoding="utf-8")
     dom = parseString(rss_string)
     pretty_rss = dom.toprettyxml(indent="  ")
 
-    write_text_to_s3(bucket_name, "rss/podcast_feed.xml", pretty_rss)
-
-    logger.info(f"RSS feed generated successfully!: {pretty_rss}")
+    published = publish_text_to_s3(
+        bucket_name,
+        RSS_FEED_KEY,
+        pretty_rss,
+        content_type=RSS_FEED_CONTENT_TYPE,
+        cache_control=RSS_FEED_CACHE_CONTROL,
+    )
+
+    if published:
+        logger.info(f"RSS feed generated successfully: {RSS_FEED_KEY}")
+        log_payload("RSS feed", pretty_rss)
+    else:
+        logger.info(f"RSS feed unchanged, skipped publishing: {RSS_FEED_KEY}")
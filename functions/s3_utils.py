@@ -1,46 +1,141 @@
-import boto3  # type: ignore
+import gzip
+import hashlib
 import os
 from botocore.exceptions import ClientError  # type: ignore
+from clients import s3_client
+from constants import CONTENT_HASH_METADATA_KEY
+from metrics import record, record_aws_response
+from typing import Dict, Tuple
 
-s3 = boto3.client("s3")
+
+def get_file_bytes_from_s3(bucket: str, key: str) -> bytes:
+    """Get the raw bytes of a file from S3."""
+    response = s3_client().get_object(Bucket=bucket, Key=key)
+    record_aws_response(response)
+    body = response["Body"].read()
+    record("Bytes", len(body), "Bytes")
+    return body
 
 
 def get_file_content_from_s3(bucket: str, key: str) -> str:
     """Get the content of a file from S3."""
-    response = s3.get_object(Bucket=bucket, Key=key)
-    return response["Body"].read().decode("utf-8")
+    return get_file_bytes_from_s3(bucket, key).decode("utf-8")
+
+
+def get_file_content_if_modified(
+    bucket: str, key: str, etag: str | None
+) -> Tuple[str | None, str | None]:
+    """Get the content of a file from S3 unless it still has the given ETag.
+
+    Returns:
+        Tuple[str | None, str | None]: The content (None if unchanged) and the current ETag
+    """
+    kwargs = {"Bucket": bucket, "Key": key}
+    if etag:
+        kwargs["IfNoneMatch"] = etag
+    try:
+        response = s3_client().get_object(**kwargs)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "304":
+            return None, etag
+        else:
+            raise e
+    record_aws_response(response)
+    return response["Body"].read().decode("utf-8"), response["ETag"]
 
 
 def file_exists(bucket: str, key: str) -> bool:
     """Check if a file exists in S3."""
+    return get_file_metadata(bucket, key) is not None
+
+
+def get_file_metadata(bucket: str, key: str) -> Dict[str, str] | None:
+    """Get the user metadata of a file in S3, or None if it doesn't exist."""
     try:
-        s3.head_object(Bucket=bucket, Key=key)
+        response = s3_client().head_object(Bucket=bucket, Key=key)
     except ClientError as e:
         if e.response["Error"]["Code"] == "404":
-            return False
+            return None
         else:
             raise e
-    else:
-        return True
+    record_aws_response(response)
+    return response.get("Metadata", {})
 
 
 def write_text_to_s3(bucket: str, key: str, text: str) -> None:
     """Write the extracted text to S3."""
-    s3.put_object(
+    body = text.encode("utf-8")
+    response = s3_client().put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=body,
+    )
+    record_aws_response(response)
+    record("Bytes", len(body), "Bytes")
+
+
+def publish_text_to_s3(
+    bucket: str, key: str, text: str, content_type: str, cache_control: str
+) -> bool:
+    """Publish text to S3 for HTTP clients, along with a gzip variant.
+
+    The SHA-256 of the content is stored in the object metadata, and the
+    write is skipped entirely when the published content is unchanged so
+    that caches holding the current version stay valid.
+    The gzip variant is written to `key` + ".gz" with Content-Encoding set.
+
+    Parameters:
+        bucket (str): The S3 bucket to publish to
+        key (str): The key of the uncompressed object
+        text (str): The text to publish
+        content_type (str): The Content-Type of the text
+        cache_control (str): The Cache-Control header for both objects
+    Returns:
+        bool: Whether anything was written
+    """
+    body = text.encode("utf-8")
+    content_hash = hashlib.sha256(body).hexdigest()
+
+    metadata = get_file_metadata(bucket, key)
+    if metadata and metadata.get(CONTENT_HASH_METADATA_KEY) == content_hash:
+        return False
+
+    # Write the gzip variant first: the hash on the uncompressed object marks
+    # the publication as complete. mtime=0 keeps the compressed bytes stable.
+    compressed = gzip.compress(body, mtime=0)
+    response = s3_client().put_object(
+        Bucket=bucket,
+        Key=key + ".gz",
+        Body=compressed,
+        ContentType=content_type,
+        ContentEncoding="gzip",
+        CacheControl=cache_control,
+        Metadata={CONTENT_HASH_METADATA_KEY: content_hash},
+    )
+    record_aws_response(response)
+    response = s3_client().put_object(
         Bucket=bucket,
         Key=key,
-        Body=text,
+        Body=body,
+        ContentType=content_type,
+        CacheControl=cache_control,
+        Metadata={CONTENT_HASH_METADATA_KEY: content_hash},
     )
+    record_aws_response(response)
+    record("Bytes", len(body) + len(compressed), "Bytes")
+    return True
 
 
 def write_file_to_s3(bucket: str, key: str, file_path: str) -> None:
     """Write the file to S3."""
     with open(file_path, "rb") as file:
-        s3.put_object(
+        response = s3_client().put_object(
             Bucket=bucket,
             Key=key,
             Body=file,
         )
+    record_aws_response(response)
+    record("Bytes", os.path.getsize(file_path), "Bytes")
 
 
 def new_key_for_processed_file(key: str, prefix: str, ext: str) -> str:
@@ -1,6 +1,7 @@
 import logging
 
 from ai_tools import extract_text_from_raw_data
+from metrics import stage
 from s3_utils import (
     file_exists,
     get_file_content_from_s3,
@@ -38,6 +39,7 @@ def handle_text(
         extracted_text = get_file_content_from_s3(output_bucket, text_key)
 
     if not text_file_exists and extracted_text:
-        write_text_to_s3(output_bucket, text_key, extracted_text)
+        with stage("upload", key=text_key):
+            write_text_to_s3(output_bucket, text_key, extracted_text)
 
     return extracted_text, text_key
@@ -1 +1,9 @@
-from .audio_segment import AudioSegment
\ No newline at end of file
+def __getattr__(name):
+    # AudioSegment pulls in the effects and the rest of the processing stack,
+    # so it's imported on first use; light submodules like pydub.mp3_index
+    # can then be imported on their own.
+    if name == "AudioSegment":
+        from .audio_segment import AudioSegment
+        globals()["AudioSegment"] = AudioSegment
+        return AudioSegment
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
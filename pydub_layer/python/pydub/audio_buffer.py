@@ -0,0 +1,163 @@
+"""
+A mutable buffer of audio, for building up long audio piece by piece.
+
+AudioSegments are immutable, so every append(), overlay() or apply_gain()
+on the segment being built copies all of it: assembling an hour of audio in
+a thousand steps copies it a thousand times. An AudioBuffer keeps its audio
+in a bytearray with room to grow, and writes, mixes and gain changes only
+touch the region they apply to. freeze() then hands the bytearray over to
+an AudioSegment without copying it.
+"""
+from .audio_segment import AudioSegment
+from .sample_engine import get_engine
+from .utils import db_to_float
+
+
+class AudioBuffer(object):
+    """
+    Audio in a fixed format that can be changed in place:
+
+        buf = AudioBuffer(sample_width=2, frame_rate=44100, channels=2)
+        for chapter in chapters:
+            buf.append(chapter)
+        buf.mix(music, position=0, gain=-18)
+        book = buf.freeze()
+
+    Positions are in milliseconds, as for AudioSegments. Segments in another
+    format are converted to the buffer's format first.
+    """
+
+    def __init__(self, sample_width=2, frame_rate=44100, channels=1,
+                 reserve=0):
+        """
+        reserve (optional int):
+            Milliseconds of audio to allocate room for up front.
+
+        A sample_width of 3 needs AudioSegment.packed_24bit: otherwise
+        AudioSegments widen 24-bit audio to 4 bytes a sample.
+        """
+        if sample_width == 3 and not AudioSegment.packed_24bit:
+            raise ValueError("24-bit AudioBuffers need AudioSegment.packed_24bit")
+        self.sample_width = sample_width
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.frame_width = sample_width * channels
+        self._store = bytearray(self._byte_position(reserve))
+        self._length = 0
+        # set by freeze(): the store belongs to a segment now, and is copied
+        # before the next change
+        self._shared = False
+
+    @classmethod
+    def from_segment(cls, seg, reserve=0):
+        """
+        returns an AudioBuffer in seg's format, holding a copy of its audio
+        """
+        buf = cls(seg.sample_width, seg.frame_rate, seg.channels,
+                  max(reserve, len(seg)))
+        buf.append(seg)
+        return buf
+
+    def __len__(self):
+        """
+        returns the length of the buffered audio in milliseconds
+        """
+        return round(1000 * (self.frame_count() / self.frame_rate))
+
+    def frame_count(self):
+        return float(self._length // self.frame_width)
+
+    def append(self, seg):
+        """
+        adds seg to the end of the buffer
+        """
+        self.write(seg, position=None)
+        return self
+
+    def write(self, seg, position=0):
+        """
+        overwrites the buffer with seg from position onwards, growing the
+        buffer (with silence, past its end) as needed. With position None,
+        seg is appended.
+        """
+        data = self._convert(seg)._view
+        start = self._length if position is None else \
+            self._byte_position(position)
+        store = self._writable(start + len(data))
+        store[start:start + len(data)] = data
+        return self
+
+    def mix(self, seg, position=0, gain=0):
+        """
+        adds seg, with gain in dB, to the buffered audio from position
+        onwards. Unlike overlay() the buffer grows to fit all of seg.
+        """
+        data = self._convert(seg)._view
+        start = self._byte_position(position)
+        end = start + len(data)
+        region = memoryview(self._writable(end))[start:end]
+        factor = db_to_float(float(gain)) if gain else 1
+        # through a memoryview, which takes any buffer (e.g. NumPy arrays)
+        region[:] = get_engine().mix([(region, 1), (data, factor)],
+                                     self.sample_width)
+        return self
+
+    def apply_gain(self, volume_change, start=0, end=None):
+        """
+        changes the volume, by volume_change dB, of the buffered audio from
+        start to end (the end of the buffer by default)
+        """
+        start = min(self._byte_position(start), self._length)
+        end = self._length if end is None else \
+            min(max(self._byte_position(end), start), self._length)
+        if end > start and volume_change:
+            region = memoryview(self._writable(end))[start:end]
+            region[:] = get_engine().mul(region, self.sample_width,
+                                         db_to_float(float(volume_change)))
+        return self
+
+    def freeze(self):
+        """
+        returns the buffered audio as an AudioSegment. The segment takes
+        over the buffer's memory rather than copying it; the buffer can
+        still be changed afterwards, but then works on a copy.
+        """
+        seg = AudioSegment.empty()._spawn(
+            memoryview(self._store)[:self._length], overrides={
+                'sample_width': self.sample_width,
+                'frame_rate': self.frame_rate,
+                'frame_width': self.frame_width,
+                'channels': self.channels,
+            })
+        self._shared = True
+        return seg
+
+    def _byte_position(self, ms):
+        frames = int(ms * (self.frame_rate / 1000.0))
+        return max(frames, 0) * self.frame_width
+
+    def _convert(self, seg):
+        return seg._set_format(self.channels, self.frame_rate,
+                               self.sample_width)
+
+    def _writable(self, length):
+        """
+        returns the store, made private and at least length bytes long.
+        Bytes past the old end are zero, i.e. silence.
+        """
+        store = self._store
+        if self._shared or length > len(store):
+            # grow by doubling, so appending is amortized O(1) per byte
+            capacity = len(store)
+            if length > capacity:
+                capacity = max(length, 2 * capacity)
+            new_store = bytearray(capacity)
+            new_store[:self._length] = memoryview(store)[:self._length]
+            self._store = store = new_store
+            self._shared = False
+        self._length = max(self._length, length)
+        return store
+
+    def __repr__(self):
+        return "<AudioBuffer of {} ms, {} channels, {} Hz, {} bytes per sample>" \
+            .format(len(self), self.channels, self.frame_rate, self.sample_width)
@@ -0,0 +1,215 @@
+"""
+Encode audio as it's produced, through a single ffmpeg process.
+
+AudioSegment.export() needs the whole segment before it starts, and writes
+it to a temporary wav file for ffmpeg to read. An AudioEncoder starts ffmpeg
+once and pipes the raw samples of each segment written to it to ffmpeg's
+stdin, while the encoded output is passed on as ffmpeg produces it. Long
+audio can then be encoded a block at a time, holding one block in memory
+and encoding it while the next one is made.
+"""
+import subprocess
+import threading
+from tempfile import TemporaryFile
+
+from .audio_segment import PCM_FORMATS, AudioSegment
+from .exceptions import CouldntEncodeError
+from .logging_utils import log_conversion, log_subprocess_output
+from .utils import fsdecode
+
+# formats whose ffmpeg muxers seek back to finish the file (an index, the
+# sizes in a header, or mp3's Xing/LAME frame), and so need seekable output
+SEEKABLE_FORMATS = frozenset([
+    '3g2', '3gp', 'aiff', 'asf', 'au', 'avi', 'caf', 'f4v', 'flac', 'ipod',
+    'ismv', 'm4a', 'matroska', 'mov', 'mp3', 'mp4', 'psp', 'rf64', 'tta',
+    'w64', 'wav', 'webm', 'wma', 'wv',
+])
+
+
+class AudioEncoder(object):
+    """
+    Encodes the segments written to it, one after the other:
+
+        with AudioEncoder("book.mp3", format="mp3", bitrate="64k") as encoder:
+            for block in AudioSegment.iter_file("book.wav"):
+                encoder.write(block.fade_in(10))
+
+    out_f can be a path, which ffmpeg writes to directly, a file object, or
+    a callable, which is called with each chunk of encoded bytes. The other
+    arguments are those of AudioSegment.export(). Formats that ffmpeg can
+    only write to a seekable file (those in SEEKABLE_FORMATS, like mp4)
+    need a path.
+
+    The audio is encoded in the format (sample width, frame rate and
+    channels) of the first segment written, unless it's given; later
+    segments are converted to it.
+    """
+
+    # encoded bytes are read from ffmpeg in chunks of this size
+    chunk_size = 2 ** 16
+
+    def __init__(self, out_f, format='mp3', codec=None, bitrate=None,
+                 parameters=None, tags=None, id3v2_version='4', cover=None,
+                 sample_width=None, frame_rate=None, channels=None):
+        if format == "raw" and (codec is not None or parameters is not None):
+            raise AttributeError(
+                    'Can not invoke ffmpeg when export format is "raw"; '
+                    'specify an ffmpeg raw format like format="s16le" instead '
+                    'or call export(format="raw") with no codec or parameters')
+
+        self.format = format
+        self.sample_width = sample_width
+        self.frame_rate = frame_rate
+        self.channels = channels
+        # checked now, so bad tags fail before any audio is written
+        self._options = [] if format == "raw" else \
+            AudioSegment._conversion_options(format, codec, bitrate, parameters,
+                                             tags, id3v2_version, cover)
+
+        try:
+            self._path = fsdecode(out_f)
+        except TypeError:
+            self._path = None
+        self._out_f = out_f
+        self._close_out_f = False
+        if self._path and format == "raw":
+            # no ffmpeg to write it
+            self._out_f = open(self._path, 'wb')
+            self._close_out_f = True
+            self._path = None
+
+        self._process = None
+        self._stderr = None
+        self._reader = None
+        self._reader_error = None
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # don't finish a file that's missing audio
+            self._stop(kill=True)
+
+    def write(self, seg):
+        """
+        encodes seg after the segments written before it, and returns the
+        encoder
+        """
+        if self.closed:
+            raise ValueError("write to closed AudioEncoder")
+        for attr in ('sample_width', 'frame_rate', 'channels'):
+            if getattr(self, attr) is None:
+                setattr(self, attr, getattr(seg, attr))
+
+        seg = seg._set_format(self.channels, self.frame_rate, self.sample_width)
+        if self.format == "raw":
+            self._emit(seg._view)
+            return self
+
+        if self._process is None:
+            self._start()
+        try:
+            self._process.stdin.write(seg._view)
+        except (OSError, ValueError):
+            # ffmpeg has stopped; close() says why
+            self.close()
+        return self
+
+    def close(self):
+        """
+        finishes encoding, once all the segments are written. Raises
+        CouldntEncodeError if ffmpeg failed.
+        """
+        if self.closed:
+            return
+        if self.format != "raw" and self._process is None:
+            # nothing was written: encode no audio
+            self.write(AudioSegment.silent(0))
+
+        returncode = self._stop()
+        p_err = None
+        if self._stderr is not None:
+            self._stderr.seek(0)
+            p_err = self._stderr.read()
+            self._stderr.close()
+            log_subprocess_output(p_err)
+
+        if self._reader_error is not None:
+            raise self._reader_error
+        if returncode:
+            raise CouldntEncodeError(
+                "Encoding failed. ffmpeg/avlib returned error code: {0}\n\nCommand:{1}\n\nOutput from ffmpeg/avlib:\n\n{2}".format(
+                    returncode, self._command, p_err))
+
+    def _start(self):
+        self._command = [
+            AudioSegment.converter,
+            '-y',  # always overwrite existing files
+            "-f", PCM_FORMATS[self.sample_width],
+            "-ar", str(self.frame_rate),
+            "-ac", str(self.channels),
+            "-i", "pipe:0",  # input options (filename last)
+        ] + self._options + [
+            "-f", self.format, self._path or "pipe:1",  # output options (filename last)
+        ]
+        log_conversion(self._command)
+
+        # stderr goes to a file, so ffmpeg can't block on a full pipe while
+        # nothing reads it
+        self._stderr = TemporaryFile()
+        self._process = subprocess.Popen(
+            self._command, stdin=subprocess.PIPE,
+            stdout=None if self._path else subprocess.PIPE,
+            stderr=self._stderr)
+        if not self._path:
+            self._reader = threading.Thread(target=self._read_output)
+            self._reader.daemon = True
+            self._reader.start()
+
+    def _read_output(self):
+        stdout = self._process.stdout
+        try:
+            chunk = stdout.read1(self.chunk_size)
+            while chunk:
+                self._emit(chunk)
+                chunk = stdout.read1(self.chunk_size)
+        except Exception as e:
+            # raised by close(); ffmpeg is stopped, as nothing reads its
+            # output anymore
+            self._reader_error = e
+            self._process.kill()
+
+    def _emit(self, data):
+        if hasattr(self._out_f, 'write'):
+            self._out_f.write(data)
+        else:
+            self._out_f(bytes(data))
+
+    def _stop(self, kill=False):
+        """
+        ends the ffmpeg process (if any) and returns its exit code
+        """
+        self.closed = True
+        returncode = None
+        p = self._process
+        if p is not None:
+            if kill:
+                p.kill()
+            try:
+                p.stdin.close()
+            except OSError:
+                pass
+            returncode = p.wait()
+            if self._reader is not None:
+                self._reader.join()
+                p.stdout.close()
+            if kill:
+                self._stderr.close()
+                self._stderr = None
+        if self._close_out_f:
+            self._out_f.close()
+        return returncode
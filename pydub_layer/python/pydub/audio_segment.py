@@ -2,15 +2,24 @@ from __future__ import division
 
 import array
 import os
+import shutil
 import subprocess
-from tempfile import TemporaryFile, NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryFile
+import threading
+import time
 import wave
 import sys
 import struct
-from .logging_utils import log_conversion, log_subprocess_output
-from .utils import mediainfo_json, fsdecode
+from concurrent.futures import ThreadPoolExecutor
+from .logging_utils import (
+    log_conversion,
+    log_decode_timing,
+    log_subprocess_output,
+)
+from .utils import fsdecode
 import base64
 from collections import namedtuple
+from contextlib import contextmanager
 
 try:
     from StringIO import StringIO
@@ -19,11 +28,6 @@ except:
 
 from io import BytesIO
 
-try:
-    from itertools import izip
-except:
-    izip = zip
-
 from .utils import (
     _fd_or_path_or_tempfile,
     db_to_float,
@@ -32,13 +36,16 @@ from .utils import (
     get_array_type,
     audioop,
 )
+from .mixer import Mixer
+from .probe import probe_info
+from .sample_engine import FADE_CURVES, get_engine
 from .exceptions import (
     TooManyMissingFrames,
     InvalidDuration,
     InvalidID3TagVersion,
     InvalidTag,
     CouldntDecodeError,
-    CouldntEncodeError,
+    CouldntDecodeFilesError,
     MissingAudioParameter,
 )
 
@@ -149,6 +156,151 @@ def fix_wav_headers(data):
     data[pos + 4:pos + 8] = struct.pack('<I', len(data) - pos - 8)
 
 
+def read_wav_stream_header(stream):
+    """
+    Reads a wav header from the start of stream, up to the audio data, so
+    the data can be read from the stream next. Returns a WavData without
+    raw_data and the size of the data subchunk, which wav streamed through
+    a pipe (e.g. by ffmpeg) can't fill in.
+    """
+    header = bytearray(stream.read(12))
+    if header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise CouldntDecodeError("Couldn't read wav audio from data")
+    while True:
+        chunk = stream.read(8)
+        if len(chunk) < 8:
+            raise CouldntDecodeError("Couldn't find data header in wav data")
+        header += chunk
+        if chunk[:4] == b'data':
+            headers = extract_wav_headers(header)
+            return read_wav_audio(header, headers), headers[-1].size
+        header += stream.read(struct.unpack_from('<I', chunk, 4)[0])
+
+
+# ffmpeg's raw sample formats, by sample width (pydub's 8-bit samples are
+# signed)
+PCM_FORMATS = {
+    1: 's8',
+    2: 's16le',
+    3: 's24le',
+    4: 's32le',
+}
+
+
+def _pcm_format(info):
+    """
+    the sample width, channels and frame rate to decode the first audio
+    stream in ffprobe's info to, keeping its sample width. Each is None if
+    info doesn't tell.
+    """
+    audio_streams = [x for x in info.get('streams', [])
+                     if x.get('codec_type') == 'audio']
+    if not audio_streams:
+        return None, None, None
+    stream = audio_streams[0]
+    # This is a workaround for some ffprobe versions that always say
+    # that mp3/mp4/aac/webm/ogg files contain fltp samples
+    audio_codec = stream.get('codec_name')
+    if (stream.get('sample_fmt') == 'fltp' and
+            audio_codec in ['mp3', 'mp4', 'aac', 'webm', 'ogg']):
+        bits_per_sample = 16
+    else:
+        bits_per_sample = stream.get('bits_per_sample')
+    sample_width = bits_per_sample // 8 \
+        if bits_per_sample in (8, 16, 24, 32) else None
+    # ffprobe gives the sample rate as a string
+    channels = int(stream['channels']) if stream.get('channels') else None
+    frame_rate = int(stream['sample_rate']) if stream.get('sample_rate') else None
+    return sample_width, channels, frame_rate
+
+
+def _read_all(file):
+    """
+    reads the rest of file. Reading 2GB or more at once fails with OSError
+    on some platforms, in which case it's read in chunks.
+    """
+    try:
+        return file.read()
+    except OSError:
+        return _read_to_end(file, 2 ** 31 - 1)
+
+
+def _feed_stdin(file, stdin, chunk_size=2 ** 16):
+    """
+    copies file into a subprocess' stdin a chunk at a time, then closes it
+    """
+    try:
+        chunk = file.read(chunk_size)
+        while chunk:
+            stdin.write(chunk)
+            chunk = file.read(chunk_size)
+    except (OSError, ValueError):
+        # the subprocess has exited (or was killed) before reading it all
+        pass
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+@contextmanager
+def _converter_output(conversion_command, stdin_file=None):
+    """
+    Runs the converter and yields its stdout. stdin_file, if any, is fed to
+    its stdin from a thread. Raises CouldntDecodeError if the converter
+    fails; if the with block raises (or a generator using it is closed),
+    the converter is killed instead.
+    """
+    log_conversion(conversion_command)
+
+    # stderr goes to a file, so the converter can't block on a full pipe
+    # while nothing reads it
+    p_err = TemporaryFile()
+    try:
+        p = subprocess.Popen(conversion_command,
+                             stdin=None if stdin_file is None else subprocess.PIPE,
+                             stdout=subprocess.PIPE, stderr=p_err)
+        feeder = None
+        if stdin_file is not None:
+            feeder = threading.Thread(target=_feed_stdin, args=(stdin_file, p.stdin))
+            feeder.daemon = True
+            feeder.start()
+
+        try:
+            yield p.stdout
+        except BaseException:
+            p.kill()
+            raise
+        finally:
+            p.stdout.close()
+            p.wait()
+            if feeder:
+                feeder.join()
+
+        if p.returncode != 0:
+            p_err.seek(0)
+            raise CouldntDecodeError(
+                "Decoding failed. ffmpeg returned error code: {0}\n\nOutput from ffmpeg/avlib:\n\n{1}".format(
+                    p.returncode, p_err.read()))
+    finally:
+        p_err.close()
+
+
+def _read_to_end(stream, chunk_size=2 ** 20):
+    """
+    reads the rest of stream into a single bytearray. Unlike joining a list
+    of chunks at the end, this doesn't need twice the memory: large
+    bytearrays mostly grow in place.
+    """
+    data = bytearray()
+    chunk = stream.read(chunk_size)
+    while chunk:
+        data += chunk
+        chunk = stream.read(chunk_size)
+    return data
+
+
 class AudioSegment(object):
     """
     AudioSegments are *immutable* objects representing segments of audio
@@ -159,7 +311,15 @@ class AudioSegment(object):
         a = AudioSegment.from_mp3(mp3file)
         first_second = a[:1000] # get the first second of an mp3
         slice = a[5000:10000] # get a slice from 5 to 10 seconds of an mp3
+
+    Slices are views: they share the buffer of the segment they were taken
+    from (through an offset and a length) instead of copying its bytes. The
+    bytes of a view are only copied out when they're needed as a bytestring
+    (e.g. raw_data), at which point the view lets go of the shared buffer.
     """
+    __slots__ = ('sample_width', 'frame_rate', 'channels', 'frame_width',
+                 '_buffer', '_offset', '_length', '__weakref__')
+
     converter = get_encoder_name()  # either ffmpeg or avconv
 
     # TODO: remove in 1.0 release
@@ -176,6 +336,12 @@ class AudioSegment(object):
         "ogg": "libvorbis"
     }
 
+    # Keep 24-bit audio as packed 3 byte samples (sample_width 3) instead of
+    # widening it to 32-bit, so it takes 25% less memory and is exported as
+    # 24-bit. Off by default: code written for pydub's usual sample widths
+    # may expect 24-bit input to come out 4 bytes wide.
+    packed_24bit = False
+
     def __init__(self, data=None, *args, **kwargs):
         self.sample_width = kwargs.pop("sample_width", None)
         self.frame_rate = kwargs.pop("frame_rate", None)
@@ -183,7 +349,10 @@ class AudioSegment(object):
 
         audio_params = (self.sample_width, self.frame_rate, self.channels)
 
-        if isinstance(data, array.array):
+        if self.sample_width == 3 and getattr(data, 'itemsize', 1) == 4:
+            # 24-bit sample values, as returned by get_array_of_samples()
+            data = get_engine().pack_24bit(data)
+        elif isinstance(data, array.array):
             try:
                 data = data.tobytes()
             except:
@@ -212,14 +381,10 @@ class AudioSegment(object):
             try:
                 data = data if isinstance(data, (basestring, bytes)) else data.read()
             except(OSError):
-                d = b''
-                reader = data.read(2 ** 31 - 1)
-                while reader:
-                    d += reader
-                    reader = data.read(2 ** 31 - 1)
-                data = d
-
-            wav_data = read_wav_audio(data)
+                data = _read_to_end(data, 2 ** 31 - 1)
+
+            # the audio is a view of the wav data, not a copy
+            wav_data = read_wav_audio(memoryview(data))
             if not wav_data:
                 raise CouldntDecodeError("Couldn't read wav audio from data")
 
@@ -232,31 +397,70 @@ class AudioSegment(object):
                 # convert from unsigned integers in wav
                 self._data = audioop.bias(self._data, 1, -128)
 
-        # Convert 24-bit audio to 32-bit audio.
-        # (stdlib audioop and array modules do not support 24-bit data)
-        if self.sample_width == 3:
-            byte_buffer = BytesIO()
-
-            # Workaround for python 2 vs python 3. _data in 2.x are length-1 strings,
-            # And in 3.x are ints.
-            pack_fmt = 'BBB' if isinstance(self._data[0], int) else 'ccc'
-
-            # This conversion maintains the 24 bit values.  The values are
-            # not scaled up to the 32 bit range.  Other conversions could be
-            # implemented.
-            i = iter(self._data)
-            padding = {False: b'\x00', True: b'\xFF'}
-            for b0, b1, b2 in izip(i, i, i):
-                byte_buffer.write(padding[b2 > b'\x7f'[0]])
-                old_bytes = struct.pack(pack_fmt, b0, b1, b2)
-                byte_buffer.write(old_bytes)
-
-            self._data = byte_buffer.getvalue()
+        # Convert 24-bit audio to 32-bit audio, unless it's kept packed.
+        # (the array module does not support 24-bit data)
+        if self.sample_width == 3 and not self.packed_24bit:
+            self._data = get_engine().widen_24bit(self._data)
             self.sample_width = 4
             self.frame_width = self.channels * self.sample_width
 
         super(AudioSegment, self).__init__(*args, **kwargs)
 
+    @property
+    def _data(self):
+        """
+        the audio data as a bytestring, copied out of the shared buffer the
+        first time it's needed
+        """
+        buffer = self._buffer
+        if type(buffer) is not bytes or self._offset or \
+                self._length != len(buffer):
+            buffer = self._view.tobytes()
+            self._buffer = buffer
+            self._offset = 0
+        return buffer
+
+    @_data.setter
+    def _data(self, data):
+        self._buffer = data
+        self._offset = 0
+        self._length = len(data) if not isinstance(data, memoryview) \
+            else data.nbytes
+
+    @property
+    def _view(self):
+        """
+        a read-only memoryview of the audio data (no copy)
+        """
+        view = memoryview(self._buffer)
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        return view[self._offset:self._offset + self._length].toreadonly()
+
+    def __getstate__(self):
+        return {
+            'sample_width': self.sample_width,
+            'frame_rate': self.frame_rate,
+            'channels': self.channels,
+            'frame_width': self.frame_width,
+            'data': self._data,
+        }
+
+    def __setstate__(self, state):
+        state = dict(state)
+        self._data = state.pop('data')
+        for attr, val in state.items():
+            setattr(self, attr, val)
+
+    def lazy(self):
+        """
+        returns a LazySegment of this segment, which records gain changes,
+        fades and DC offset removal and runs them together, in one pass
+        where the sample engine can, once the audio is needed
+        """
+        from .lazy import LazySegment
+        return LazySegment(self)
+
     @property
     def raw_data(self):
         """
@@ -266,11 +470,17 @@ class AudioSegment(object):
 
     def get_array_of_samples(self, array_type_override=None):
         """
-        returns the raw_data as an array of samples
+        returns the raw_data as an array of samples (packed 24-bit samples
+        are unpacked to 32-bit items of the same value)
         """
         if array_type_override is None:
             array_type_override = self.array_type
-        return array.array(array_type_override, self._data)
+        data = self._view
+        if self.sample_width == 3:
+            data = get_engine().unpack_24bit(data)
+        samples = array.array(array_type_override)
+        samples.frombytes(data)
+        return samples
 
     @property
     def array_type(self):
@@ -317,22 +527,23 @@ class AudioSegment(object):
 
         start = self._parse_position(start) * self.frame_width
         end = self._parse_position(end) * self.frame_width
-        data = self._data[start:end]
 
         # ensure the output is as long as the requester is expecting
         expected_length = end - start
-        missing_frames = (expected_length - len(data)) // self.frame_width
+        available = max(0, min(end, self._length) - max(start, 0))
+        missing_frames = (expected_length - available) // self.frame_width
         if missing_frames:
             if missing_frames > self.frame_count(ms=2):
                 raise TooManyMissingFrames(
                     "You should never be filling in "
                     "   more than 2 ms with silence here, "
                     "missing frames: %s" % missing_frames)
+            data = self._view[start:end]
             silence = audioop.mul(data[:self.frame_width],
                                   self.sample_width, 0)
-            data += (silence * missing_frames)
+            return self._spawn([data, silence * missing_frames])
 
-        return self._spawn(data)
+        return self._spawn_view(start, end)
 
     def get_sample_slice(self, start_sample=None, end_sample=None):
         """
@@ -356,8 +567,7 @@ class AudioSegment(object):
         start_i = bounded(start_sample, 0) * self.frame_width
         end_i = bounded(end_sample, max_val) * self.frame_width
 
-        data = self._data[start_i:end_i]
-        return self._spawn(data)
+        return self._spawn_view(start_i, end_i)
 
     def __add__(self, arg):
         if isinstance(arg, AudioSegment):
@@ -410,7 +620,18 @@ class AudioSegment(object):
         if isinstance(data, list):
             data = b''.join(data)
 
-        if isinstance(data, array.array):
+        metadata = {
+            'sample_width': self.sample_width,
+            'frame_rate': self.frame_rate,
+            'frame_width': self.frame_width,
+            'channels': self.channels
+        }
+        metadata.update(overrides)
+
+        if metadata['sample_width'] == 3 and getattr(data, 'itemsize', 1) == 4:
+            # 24-bit sample values, as returned by get_array_of_samples()
+            data = get_engine().pack_24bit(data)
+        elif isinstance(data, array.array):
             try:
                 data = data.tobytes()
             except:
@@ -422,14 +643,36 @@ class AudioSegment(object):
                 data.seek(0)
             data = data.read()
 
-        metadata = {
-            'sample_width': self.sample_width,
-            'frame_rate': self.frame_rate,
-            'frame_width': self.frame_width,
-            'channels': self.channels
-        }
-        metadata.update(overrides)
-        return self.__class__(data=data, metadata=metadata)
+        if metadata['sample_width'] == 3 and not self.packed_24bit:
+            # 24-bit data still has to be converted by __init__
+            return self.__class__(data=data, metadata=metadata)
+
+        seg = object.__new__(self.__class__)
+        seg.sample_width = metadata['sample_width']
+        seg.frame_rate = metadata['frame_rate']
+        seg.frame_width = metadata['frame_width']
+        seg.channels = metadata['channels']
+        seg._data = data
+        return seg
+
+    def _spawn_view(self, start, end):
+        """
+        Creates a new audio segment with the same metadata as this one that
+        shares this segment's buffer, from byte offset start to end (clamped
+        to the data). No audio data is copied.
+        """
+        start = min(max(start, 0), self._length)
+        end = min(max(end, start), self._length)
+
+        seg = object.__new__(self.__class__)
+        seg.sample_width = self.sample_width
+        seg.frame_rate = self.frame_rate
+        seg.frame_width = self.frame_width
+        seg.channels = self.channels
+        seg._buffer = self._buffer
+        seg._offset = self._offset + start
+        seg._length = end - start
+        return seg
 
     @classmethod
     def _sync(cls, *segs):
@@ -442,6 +685,20 @@ class AudioSegment(object):
             for seg in segs
         )
 
+    def _set_format(self, channels=None, frame_rate=None, sample_width=None):
+        """
+        converts to the given channels, frame rate and sample width, in the
+        same order as _sync(); None leaves that one as it is
+        """
+        seg = self
+        if channels is not None:
+            seg = seg.set_channels(channels)
+        if frame_rate is not None:
+            seg = seg.set_frame_rate(frame_rate)
+        if sample_width is not None:
+            seg = seg.set_sample_width(sample_width)
+        return seg
+
     def _parse_position(self, val):
         if val < 0:
             val = len(self) - abs(val)
@@ -482,18 +739,16 @@ class AudioSegment(object):
             raise ValueError(
                 "AudioSegment.from_mono_audiosegments requires all arguments are mono AudioSegment instances")
 
+        if len(set(len(seg._view) for seg in segs)) > 1:
+            raise ValueError(
+                "AudioSegment.from_mono_audiosegments requires all arguments to have the same length")
+
         channels = len(segs)
         sample_width = segs[0].sample_width
         frame_rate = segs[0].frame_rate
 
-        frame_count = max(int(seg.frame_count()) for seg in segs)
-        data = array.array(
-            segs[0].array_type,
-            b'\0' * (frame_count * sample_width * channels)
-        )
-
-        for i, seg in enumerate(segs):
-            data[i::channels] = seg.get_array_of_samples()
+        data = get_engine().interleave([seg._view for seg in segs],
+                                       sample_width)
 
         return cls(
             data,
@@ -613,8 +868,16 @@ class AudioSegment(object):
         return obj
 
     @classmethod
-    def from_file(cls, file, format=None, codec=None, parameters=None, **kwargs):
-        orig_file = file
+    def from_file(cls, file, format=None, codec=None, parameters=None,
+                  start_second=None, duration=None, target_frame_rate=None,
+                  target_channels=None, target_sample_width=None, **kwargs):
+        # with start_second and/or duration (in seconds) only that part of
+        # the file is decoded: wav and raw files are read from the byte
+        # offset it starts at, anything else is seeked in by ffmpeg.
+        # The target_* arguments have ffmpeg decode to that format; wav and
+        # raw files, which aren't decoded by ffmpeg, are converted after
+        # they're read.
+        ranged = start_second is not None or duration is not None
         try:
             filename = fsdecode(file)
         except TypeError:
@@ -635,11 +898,29 @@ class AudioSegment(object):
 
             return False
 
-        if is_format("wav"):
+        if is_format("wav") and ranged:
+            try:
+                wav_data, data_size = read_wav_stream_header(file)
+            except (CouldntDecodeError, struct.error):
+                file.seek(0)
+            else:
+                return cls._read_range(file, wav_data, start_second, duration,
+                                       data_size)._set_format(
+                    target_channels, target_frame_rate, target_sample_width)
+        elif is_format("wav"):
             try:
-                return cls._from_safe_wav(file)
+                obj = cls._from_safe_wav(file)
             except:
                 file.seek(0)
+            else:
+                return obj._set_format(target_channels, target_frame_rate,
+                                       target_sample_width)
+        elif (is_format("raw") or is_format("pcm")) and ranged:
+            wav_data = WavData(1, kwargs['channels'], kwargs['frame_rate'],
+                               kwargs['sample_width'] * 8, b'')
+            return cls._read_range(file, wav_data, start_second, duration,
+                                   signed=True)._set_format(
+                target_channels, target_frame_rate, target_sample_width)
         elif is_format("raw") or is_format("pcm"):
             sample_width = kwargs['sample_width']
             frame_rate = kwargs['frame_rate']
@@ -650,7 +931,262 @@ class AudioSegment(object):
                 'channels': channels,
                 'frame_width': channels * sample_width
             }
-            return cls(data=file.read(), metadata=metadata)
+            return cls(data=file.read(), metadata=metadata)._set_format(
+                target_channels, target_frame_rate, target_sample_width)
+
+        read_ahead_limit = kwargs.get('read_ahead_limit', -1)
+        stdin_file = None if filename else BytesIO(_read_all(file))
+        if codec or (target_sample_width and target_channels and
+                     target_frame_rate):
+            # the probe only tells what format to decode to
+            info = None
+        else:
+            # the input is only read once: the probe reads the BytesIO too
+            info = probe_info(filename or stdin_file, read_ahead_limit)
+        conversion_command, pcm_format = cls._decode_command(
+            filename, format, codec, parameters, read_ahead_limit, info,
+            start_second, duration, target_frame_rate, target_channels,
+            target_sample_width)
+
+        try:
+            with _converter_output(conversion_command, stdin_file) as stdout:
+                # the audio is read into a buffer of its own, which the
+                # AudioSegment wraps as is
+                if pcm_format is not None:
+                    wav_data = pcm_format
+                    data = _read_to_end(stdout)
+                else:
+                    try:
+                        wav_data, _ = read_wav_stream_header(stdout)
+                    except (CouldntDecodeError, struct.error):
+                        wav_data = None
+                    else:
+                        data = _read_to_end(stdout)
+        finally:
+            if close_file:
+                file.close()
+
+        if wav_data is None:
+            raise CouldntDecodeError(
+                "Decoding failed. Couldn't read wav audio from ffmpeg's output")
+        if pcm_format is not None and not data:
+            raise CouldntDecodeError(
+                "Decoding failed. ffmpeg's output was empty")
+        return cls._from_pcm(data, wav_data, signed=pcm_format is not None)
+
+    @classmethod
+    def from_files(cls, files, max_workers=None, **kwargs):
+        """
+        Decodes each of files with from_file(), passing it kwargs, and
+        returns the AudioSegments in the same order. Up to max_workers
+        files (the number of CPUs by default) are decoded at once, each by
+        its own ffmpeg process. The target_* arguments of from_file() decode
+        them all to a common format.
+
+        All files are decoded before a CouldntDecodeFilesError is raised for
+        those that failed; the total time taken is logged to the
+        "pydub.converter" logger.
+        """
+        files = list(files)
+        if not files:
+            return []
+        workers = min(max_workers or os.cpu_count() or 1, len(files))
+
+        def decode(file):
+            start = time.perf_counter()
+            seg = cls.from_file(file, **kwargs)
+            return seg, time.perf_counter() - start
+
+        start = time.perf_counter()
+        segments, errors, decode_time = [], [], 0.0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for file, future in [(f, executor.submit(decode, f)) for f in files]:
+                try:
+                    seg, seconds = future.result()
+                except Exception as e:
+                    errors.append((file, e))
+                else:
+                    segments.append(seg)
+                    decode_time += seconds
+        log_decode_timing(len(files), workers, time.perf_counter() - start,
+                          decode_time)
+
+        if errors:
+            raise CouldntDecodeFilesError(
+                "Decoding failed for {0} of {1} files:\n\n{2}".format(
+                    len(errors), len(files), "\n\n".join(
+                        "{0}: {1}".format(file, e) for file, e in errors)),
+                errors)
+        return segments
+
+    @classmethod
+    def iter_file(cls, file, block_ms=1000, format=None, codec=None,
+                  parameters=None, **kwargs):
+        """
+        Decodes file a block at a time and yields it as AudioSegments of
+        block_ms milliseconds (the last one may be shorter), so that long
+        files can be processed without holding all of their audio in memory.
+
+        Takes the same arguments as from_file(). Wav and raw files are read
+        directly; anything else is read from ffmpeg's output as it decodes.
+        Unlike paths, file objects aren't probed with ffprobe (that would
+        read them whole): unless their sample width can be told from their
+        first bytes, they decode to ffmpeg's default of 16 bits, unless codec
+        or parameters say otherwise.
+        """
+        try:
+            filename = fsdecode(file)
+        except TypeError:
+            filename = None
+        file, close_file = _fd_or_path_or_tempfile(file, 'rb', tempfile=False)
+
+        if format:
+            format = format.lower()
+            format = AUDIO_FILE_EXT_ALIASES.get(format, format)
+
+        def is_format(f):
+            f = f.lower()
+            if format == f:
+                return True
+
+            if filename:
+                return filename.lower().endswith(".{0}".format(f))
+
+            return False
+
+        try:
+            if is_format("wav"):
+                try:
+                    wav_data, data_size = read_wav_stream_header(file)
+                except (CouldntDecodeError, struct.error):
+                    file.seek(0)
+                else:
+                    for seg in cls._iter_pcm(file, wav_data, block_ms, data_size):
+                        yield seg
+                    return
+            elif is_format("raw") or is_format("pcm"):
+                wav_data = WavData(1, kwargs['channels'], kwargs['frame_rate'],
+                                   kwargs['sample_width'] * 8, b'')
+                for seg in cls._iter_pcm(file, wav_data, block_ms, signed=True):
+                    yield seg
+                return
+
+            read_ahead_limit = kwargs.get('read_ahead_limit', -1)
+            if codec:
+                info = None
+            elif filename:
+                info = probe_info(filename, read_ahead_limit)
+            elif file.seekable():
+                # probing would read it whole, but the header can be sniffed
+                info = probe_info(file, read_ahead_limit, probe=False)
+            else:
+                info = None
+            conversion_command, pcm_format = cls._decode_command(
+                filename, format, codec, parameters, read_ahead_limit, info)
+
+            # ffmpeg is killed if the caller stops iterating early
+            with _converter_output(conversion_command,
+                                   None if filename else file) as stdout:
+                if pcm_format is not None:
+                    wav_data = pcm_format
+                else:
+                    try:
+                        wav_data, _ = read_wav_stream_header(stdout)
+                    except (CouldntDecodeError, struct.error):
+                        wav_data = None
+                if wav_data is not None:
+                    # the data size isn't known while streaming, so read it
+                    # until ffmpeg is done
+                    for seg in cls._iter_pcm(stdout, wav_data, block_ms,
+                                             signed=pcm_format is not None):
+                        yield seg
+            if wav_data is None:
+                raise CouldntDecodeError(
+                    "Decoding failed. Couldn't read wav audio from ffmpeg's output")
+        finally:
+            if close_file:
+                file.close()
+
+    @classmethod
+    def _iter_pcm(cls, stream, wav_data, block_ms, size=None, signed=False):
+        """
+        yields the pcm audio read from stream, in the format of wav_data, as
+        AudioSegments of block_ms milliseconds: up to size bytes of it, or
+        all of it
+        """
+        frame_width = wav_data.channels * wav_data.bits_per_sample // 8
+        block_size = max(int(block_ms * wav_data.sample_rate / 1000), 1) * frame_width
+        while size is None or size > 0:
+            data = stream.read(block_size if size is None else min(block_size, size))
+            if len(data) < frame_width:
+                break
+            if size is not None:
+                size -= len(data)
+            yield cls._from_pcm(data, wav_data, signed)
+
+    @classmethod
+    def _from_pcm(cls, data, wav_data, signed=False):
+        """
+        an AudioSegment of pcm data in the format of wav_data, without
+        copying it unless it has to be converted
+        """
+        frame_width = wav_data.channels * wav_data.bits_per_sample // 8
+        if len(data) % frame_width:
+            # cut off by the end of the stream
+            data = data[:len(data) // frame_width * frame_width]
+        if wav_data.bits_per_sample == 8 and not signed:
+            # convert from unsigned integers in wav
+            data = audioop.bias(data, 1, -128)
+        return cls(data, sample_width=wav_data.bits_per_sample // 8,
+                   frame_rate=wav_data.sample_rate, channels=wav_data.channels)
+
+    @classmethod
+    def _read_range(cls, file, wav_data, start_second, duration, size=None,
+                    signed=False):
+        """
+        an AudioSegment of duration seconds (or the rest) of the pcm audio
+        read from file, in the format of wav_data, from start_second on. file
+        is read from its position, which is where the audio starts, and
+        holds size bytes of it (or the rest of the file)
+        """
+        frame_rate = wav_data.sample_rate
+        frame_width = wav_data.channels * wav_data.bits_per_sample // 8
+        start_second = start_second or 0
+        start = int(start_second * frame_rate) * frame_width
+        if size is not None:
+            start = min(start, size)
+        if duration is not None:
+            length = max(int((start_second + duration) * frame_rate) * frame_width - start, 0)
+            if size is not None:
+                length = min(length, size - start)
+        else:
+            # -1 reads the rest
+            length = -1 if size is None else size - start
+
+        file.seek(start, os.SEEK_CUR)
+        data = file.read(length)
+        return cls._from_pcm(data, wav_data, signed)
+
+    @classmethod
+    def _decode_command(cls, filename, format=None, codec=None, parameters=None,
+                        read_ahead_limit=-1, info=None, start_second=None,
+                        duration=None, frame_rate=None, channels=None,
+                        sample_width=None):
+        """
+        the converter command that decodes filename (or stdin) to stdout,
+        and the format of its output as WavData, or None if it's wav.
+
+        The audio is decoded in the given frame rate, channels and sample
+        width, which default to those of the probed info, if any. When all
+        three are known, ffmpeg outputs raw samples in that format, with no
+        header to parse; otherwise it outputs wav, whose header tells the
+        rest.
+        """
+        if info:
+            probed = _pcm_format(info)
+            sample_width = sample_width or probed[0]
+            channels = channels or probed[1]
+            frame_rate = frame_rate or probed[2]
 
         conversion_command = [cls.converter,
                               '-y',  # always overwrite existing files
@@ -665,45 +1201,41 @@ class AudioSegment(object):
             # force audio decoder
             conversion_command += ["-acodec", codec]
 
-        read_ahead_limit = kwargs.get('read_ahead_limit', -1)
+        # as input options, so ffmpeg seeks in the input rather than
+        # decoding up to the start
+        if start_second is not None:
+            conversion_command += ["-ss", str(start_second)]
+        if duration is not None:
+            conversion_command += ["-t", str(duration)]
+
         if filename:
             conversion_command += ["-i", filename]
-            stdin_parameter = None
-            stdin_data = None
+        elif cls.converter == 'ffmpeg':
+            conversion_command += ["-read_ahead_limit", str(read_ahead_limit),
+                                   "-i", "cache:pipe:0"]
         else:
-            if cls.converter == 'ffmpeg':
-                conversion_command += ["-read_ahead_limit", str(read_ahead_limit),
-                                       "-i", "cache:pipe:0"]
-            else:
-                conversion_command += ["-i", "-"]
-            stdin_parameter = subprocess.PIPE
-            stdin_data = file.read()
+            conversion_command += ["-i", "-"]
 
-        if codec:
-            info = None
+        if sample_width and channels and frame_rate:
+            output_format = PCM_FORMATS[sample_width]
+            pcm_format = WavData(1, channels, frame_rate, sample_width * 8, b'')
         else:
-            info = mediainfo_json(orig_file, read_ahead_limit=read_ahead_limit)
-        if info:
-            audio_streams = [x for x in info['streams']
-                             if x['codec_type'] == 'audio']
-            # This is a workaround for some ffprobe versions that always say
-            # that mp3/mp4/aac/webm/ogg files contain fltp samples
-            audio_codec = audio_streams[0].get('codec_name')
-            if (audio_streams[0].get('sample_fmt') == 'fltp' and
-                    audio_codec in ['mp3', 'mp4', 'aac', 'webm', 'ogg']):
-                bits_per_sample = 16
-            else:
-                bits_per_sample = audio_streams[0]['bits_per_sample']
-            if bits_per_sample == 8:
-                acodec = 'pcm_u8'
-            else:
-                acodec = 'pcm_s%dle' % bits_per_sample
-
-            conversion_command += ["-acodec", acodec]
+            # the wav muxer takes the sample format from the pcm codec
+            if sample_width == 1:
+                conversion_command += ["-acodec", "pcm_u8"]
+            elif sample_width:
+                conversion_command += ["-acodec", "pcm_s%dle" % (sample_width * 8)]
+            output_format = "wav"
+            pcm_format = None
+
+        if frame_rate:
+            conversion_command += ["-ar", str(frame_rate)]
+        if channels:
+            conversion_command += ["-ac", str(channels)]
 
         conversion_command += [
             "-vn",  # Drop any video streams if there are any
-            "-f", "wav",  # output options (filename last)
+            "-f", output_format,  # output options (filename last)
             "-"
         ]
 
@@ -711,48 +1243,33 @@ class AudioSegment(object):
             # extend arguments with arbitrary set
             conversion_command.extend(parameters)
 
-        log_conversion(conversion_command)
-
-        p = subprocess.Popen(conversion_command, stdin=stdin_parameter,
-                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p_out, p_err = p.communicate(input=stdin_data)
-
-        if p.returncode != 0 or len(p_out) == 0:
-            if close_file:
-                file.close()
-            raise CouldntDecodeError(
-                "Decoding failed. ffmpeg returned error code: {0}\n\nOutput from ffmpeg/avlib:\n\n{1}".format(
-                    p.returncode, p_err))
-
-        p_out = bytearray(p_out)
-        fix_wav_headers(p_out)
-        obj = cls._from_safe_wav(BytesIO(p_out))
-
-        if close_file:
-            file.close()
-
-        return obj
+        return conversion_command, pcm_format
 
     @classmethod
-    def from_mp3(cls, file, parameters=None):
-        return cls.from_file(file, 'mp3', parameters=parameters)
+    def from_mp3(cls, file, parameters=None, start_second=None, duration=None):
+        return cls.from_file(file, 'mp3', parameters=parameters,
+                             start_second=start_second, duration=duration)
 
     @classmethod
-    def from_flv(cls, file, parameters=None):
-        return cls.from_file(file, 'flv', parameters=parameters)
+    def from_flv(cls, file, parameters=None, start_second=None, duration=None):
+        return cls.from_file(file, 'flv', parameters=parameters,
+                             start_second=start_second, duration=duration)
 
     @classmethod
-    def from_ogg(cls, file, parameters=None):
-        return cls.from_file(file, 'ogg', parameters=parameters)
+    def from_ogg(cls, file, parameters=None, start_second=None, duration=None):
+        return cls.from_file(file, 'ogg', parameters=parameters,
+                             start_second=start_second, duration=duration)
 
     @classmethod
-    def from_wav(cls, file, parameters=None):
-        return cls.from_file(file, 'wav', parameters=parameters)
+    def from_wav(cls, file, parameters=None, start_second=None, duration=None):
+        return cls.from_file(file, 'wav', parameters=parameters,
+                             start_second=start_second, duration=duration)
 
     @classmethod
     def from_raw(cls, file, **kwargs):
         return cls.from_file(file, 'raw', sample_width=kwargs['sample_width'], frame_rate=kwargs['frame_rate'],
-                             channels=kwargs['channels'])
+                             channels=kwargs['channels'], start_second=kwargs.get('start_second'),
+                             duration=kwargs.get('duration'))
 
     @classmethod
     def _from_safe_wav(cls, file):
@@ -798,7 +1315,7 @@ class AudioSegment(object):
         cover (file)
             Set cover for audio file from image file. (png or jpg)
         """
-        id3v2_allowed_versions = ['3', '4']
+        from .audio_encoder import SEEKABLE_FORMATS, AudioEncoder
 
         if format == "raw" and (codec is not None or parameters is not None):
             raise AttributeError(
@@ -806,28 +1323,64 @@ class AudioSegment(object):
                     'specify an ffmpeg raw format like format="s16le" instead '
                     'or call export(format="raw") with no codec or parameters')
 
+        # wav with no ffmpeg parameters can just be written directly to out_f
+        easy_wav = format == "wav" and codec is None and parameters is None
+
+        try:
+            path = fsdecode(out_f)
+        except TypeError:
+            path = None
+        if path and format != "raw" and not easy_wav:
+            # the samples are piped to ffmpeg, which writes the file itself;
+            # it's only opened once ffmpeg is done with it
+            with AudioEncoder(path, format, codec, bitrate, parameters, tags,
+                              id3v2_version, cover) as encoder:
+                encoder.write(self)
+            return open(path, 'rb+')
+
         out_f, _ = _fd_or_path_or_tempfile(out_f, 'wb+')
         out_f.seek(0)
 
         if format == "raw":
-            out_f.write(self._data)
+            out_f.write(self._view)
             out_f.seek(0)
             return out_f
 
-        # wav with no ffmpeg parameters can just be written directly to out_f
-        easy_wav = format == "wav" and codec is None and parameters is None
-
         if easy_wav:
-            data = out_f
+            self._write_wav(out_f)
+            return out_f
+
+        # the samples are piped to ffmpeg, and its output is piped to out_f,
+        # unless the format needs seekable output, which goes through a
+        # temporary file
+        output = None
+        if format in SEEKABLE_FORMATS:
+            output = NamedTemporaryFile(mode="w+b", delete=False)
+            target = output.name
         else:
-            data = NamedTemporaryFile(mode="wb", delete=False)
+            target = out_f
 
-        pcm_for_wav = self._data
+        try:
+            with AudioEncoder(target, format, codec, bitrate, parameters, tags,
+                              id3v2_version, cover) as encoder:
+                encoder.write(self)
+            if output is not None:
+                shutil.copyfileobj(output, out_f)
+        finally:
+            if output is not None:
+                output.close()
+                os.unlink(output.name)
+
+        out_f.seek(0)
+        return out_f
+
+    def _write_wav(self, out_f):
+        pcm_for_wav = self._view
         if self.sample_width == 1:
             # convert to unsigned integers for wav
-            pcm_for_wav = audioop.bias(self._data, 1, 128)
+            pcm_for_wav = audioop.bias(pcm_for_wav, 1, 128)
 
-        wave_data = wave.open(data, 'wb')
+        wave_data = wave.open(out_f, 'wb')
         wave_data.setnchannels(self.channels)
         wave_data.setsampwidth(self.sample_width)
         wave_data.setframerate(self.frame_rate)
@@ -837,39 +1390,36 @@ class AudioSegment(object):
         wave_data.writeframesraw(pcm_for_wav)
         wave_data.close()
 
-        # for easy wav files, we're done (wav data is written directly to out_f)
-        if easy_wav:
-            return out_f
-
-        output = NamedTemporaryFile(mode="w+b", delete=False)
-
-        # build converter command to export
-        conversion_command = [
-            self.converter,
-            '-y',  # always overwrite existing files
-            "-f", "wav", "-i", data.name,  # input options (filename last)
-        ]
+    @classmethod
+    def _conversion_options(cls, format, codec=None, bitrate=None, parameters=None,
+                            tags=None, id3v2_version='4', cover=None):
+        """
+        the converter arguments for export()'s options, from after the audio
+        input to before the output
+        """
+        id3v2_allowed_versions = ['3', '4']
+        options = []
 
         if codec is None:
-            codec = self.DEFAULT_CODECS.get(format, None)
+            codec = cls.DEFAULT_CODECS.get(format, None)
 
         if cover is not None:
             if cover.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')) and format == "mp3":
-                conversion_command.extend(["-i", cover, "-map", "0", "-map", "1", "-c:v", "mjpeg"])
+                options.extend(["-i", cover, "-map", "0", "-map", "1", "-c:v", "mjpeg"])
             else:
                 raise AttributeError(
                     "Currently cover images are only supported by MP3 files. The allowed image formats are: .tif, .jpg, .bmp, .jpeg and .png.")
 
         if codec is not None:
             # force audio encoder
-            conversion_command.extend(["-acodec", codec])
+            options.extend(["-acodec", codec])
 
         if bitrate is not None:
-            conversion_command.extend(["-b:a", bitrate])
+            options.extend(["-b:a", bitrate])
 
         if parameters is not None:
             # extend arguments with arbitrary set
-            conversion_command.extend(parameters)
+            options.extend(parameters)
 
         if tags is not None:
             if not isinstance(tags, dict):
@@ -878,7 +1428,7 @@ class AudioSegment(object):
                 # Extend converter command with tags
                 # print(tags)
                 for key, value in tags.items():
-                    conversion_command.extend(
+                    options.extend(
                         ['-metadata', '{0}={1}'.format(key, value)])
 
                 if format == 'mp3':
@@ -886,48 +1436,19 @@ class AudioSegment(object):
                     if id3v2_version not in id3v2_allowed_versions:
                         raise InvalidID3TagVersion(
                             "id3v2_version not allowed, allowed versions: %s" % id3v2_allowed_versions)
-                    conversion_command.extend([
+                    options.extend([
                         "-id3v2_version", id3v2_version
                     ])
 
         if sys.platform == 'darwin' and codec == 'mp3':
-            conversion_command.extend(["-write_xing", "0"])
-
-        conversion_command.extend([
-            "-f", format, output.name,  # output options (filename last)
-        ])
-
-        log_conversion(conversion_command)
-
-        # read stdin / write stdout
-        with open(os.devnull, 'rb') as devnull:
-            p = subprocess.Popen(conversion_command, stdin=devnull, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        p_out, p_err = p.communicate()
-
-        log_subprocess_output(p_out)
-        log_subprocess_output(p_err)
-
-        if p.returncode != 0:
-            raise CouldntEncodeError(
-                "Encoding failed. ffmpeg/avlib returned error code: {0}\n\nCommand:{1}\n\nOutput from ffmpeg/avlib:\n\n{2}".format(
-                    p.returncode, conversion_command, p_err))
-
-        output.seek(0)
-        out_f.write(output.read())
-
-        data.close()
-        output.close()
-
-        os.unlink(data.name)
-        os.unlink(output.name)
+            options.extend(["-write_xing", "0"])
 
-        out_f.seek(0)
-        return out_f
+        return options
 
     def get_frame(self, index):
         frame_start = index * self.frame_width
         frame_end = frame_start + self.frame_width
-        return self._data[frame_start:frame_end]
+        return self._view[frame_start:frame_end].tobytes()
 
     def frame_count(self, ms=None):
         """
@@ -937,7 +1458,7 @@ class AudioSegment(object):
         if ms is not None:
             return ms * (self.frame_rate / 1000.0)
         else:
-            return float(len(self._data) // self.frame_width)
+            return float(self._length // self.frame_width)
 
     def set_sample_width(self, sample_width):
         if sample_width == self.sample_width:
@@ -946,7 +1467,7 @@ class AudioSegment(object):
         frame_width = self.channels * sample_width
 
         return self._spawn(
-            audioop.lin2lin(self._data, self.sample_width, sample_width),
+            audioop.lin2lin(self._view, self.sample_width, sample_width),
             overrides={'sample_width': sample_width, 'frame_width': frame_width}
         )
 
@@ -954,12 +1475,12 @@ class AudioSegment(object):
         if frame_rate == self.frame_rate:
             return self
 
-        if self._data:
-            converted, _ = audioop.ratecv(self._data, self.sample_width,
+        if self._length:
+            converted, _ = audioop.ratecv(self._view, self.sample_width,
                                           self.channels, self.frame_rate,
                                           frame_rate, None)
         else:
-            converted = self._data
+            converted = b''
 
         return self._spawn(data=converted,
                            overrides={'frame_rate': frame_rate})
@@ -968,63 +1489,59 @@ class AudioSegment(object):
         if channels == self.channels:
             return self
 
-        if channels == 2 and self.channels == 1:
-            fn = audioop.tostereo
-            frame_width = self.frame_width * 2
-            fac = 1
-            converted = fn(self._data, self.sample_width, fac, fac)
+        if self.channels == 1:
+            return self.remix([[1]] * channels)
         elif channels == 1 and self.channels == 2:
-            fn = audioop.tomono
-            frame_width = self.frame_width // 2
-            fac = 0.5
-            converted = fn(self._data, self.sample_width, fac, fac)
+            return self.remix([[0.5, 0.5]])
         elif channels == 1:
-            channels_data = [seg.get_array_of_samples() for seg in self.split_to_mono()]
-            frame_count = int(self.frame_count())
-            converted = array.array(
-                channels_data[0].typecode,
-                b'\0' * (frame_count * self.sample_width)
-            )
-            for raw_channel_data in channels_data:
-                for i in range(frame_count):
-                    converted[i] += raw_channel_data[i] // self.channels
-            frame_width = self.frame_width // self.channels
-        elif self.channels == 1:
-            dup_channels = [self for iChannel in range(channels)]
-            return AudioSegment.from_mono_audiosegments(*dup_channels)
+            # each channel is floor-divided by the channel count before
+            # they're added up, which a gain matrix can't express
+            converted = get_engine().downmix(self._view, self.sample_width,
+                                             self.channels)
+            return self._spawn(data=converted,
+                               overrides={
+                                   'channels': channels,
+                                   'frame_width': self.sample_width})
         else:
             raise ValueError(
                 "AudioSegment.set_channels only supports mono-to-multi channel and multi-to-mono channel conversion")
 
+    def remix(self, matrix):
+        """
+        Mixes the channels through a gain matrix in a single pass. matrix has
+        a row per output channel, each with a gain (a ratio, not dB) for every
+        channel of this segment. For example [[0.5, 0.5]] mixes stereo down
+        to mono, [[1], [1]] makes mono stereo and [[1, 0], [0, -1]] inverts
+        the phase of the right channel.
+        """
+        matrix = [[float(gain) for gain in row] for row in matrix]
+        if not matrix or any(len(row) != self.channels for row in matrix):
+            raise ValueError(
+                "remix matrix must have a row per output channel with {} gains each".format(self.channels))
+
+        channels = len(matrix)
+        converted = get_engine().remix(self._view, self.sample_width, matrix)
         return self._spawn(data=converted,
                            overrides={
                                'channels': channels,
-                               'frame_width': frame_width})
+                               'frame_width': channels * self.sample_width})
 
     def split_to_mono(self):
         if self.channels == 1:
             return [self]
 
-        samples = self.get_array_of_samples()
-
-        mono_channels = []
-        for i in range(self.channels):
-            samples_for_current_channel = samples[i::self.channels]
-
-            try:
-                mono_data = samples_for_current_channel.tobytes()
-            except AttributeError:
-                mono_data = samples_for_current_channel.tostring()
+        channels_data = get_engine().deinterleave(self._view,
+                                                  self.sample_width,
+                                                  self.channels)
 
-            mono_channels.append(
-                self._spawn(mono_data, overrides={"channels": 1, "frame_width": self.sample_width})
-            )
-
-        return mono_channels
+        return [
+            self._spawn(mono_data, overrides={"channels": 1, "frame_width": self.sample_width})
+            for mono_data in channels_data
+        ]
 
     @property
     def rms(self):
-        return audioop.rms(self._data, self.sample_width)
+        return audioop.rms(self._view, self.sample_width)
 
     @property
     def dBFS(self):
@@ -1035,7 +1552,7 @@ class AudioSegment(object):
 
     @property
     def max(self):
-        return audioop.max(self._data, self.sample_width)
+        return audioop.max(self._view, self.sample_width)
 
     @property
     def max_possible_amplitude(self):
@@ -1061,14 +1578,14 @@ class AudioSegment(object):
         if not 1 <= channel <= 2:
             raise ValueError("channel value must be 1 (left) or 2 (right)")
 
+        engine = get_engine()
         if self.channels == 1:
-            data = self._data
-        elif channel == 1:
-            data = audioop.tomono(self._data, self.sample_width, 1, 0)
+            data = self._view
         else:
-            data = audioop.tomono(self._data, self.sample_width, 0, 1)
+            data = engine.get_channel(self._view, self.sample_width,
+                                      self.channels, channel - 1)
 
-        return float(audioop.avg(data, self.sample_width)) / self.max_possible_amplitude
+        return float(engine.avg(data, self.sample_width)) / self.max_possible_amplitude
 
     def remove_dc_offset(self, channel=None, offset=None):
         """
@@ -1085,32 +1602,28 @@ class AudioSegment(object):
         if offset:
             offset = int(round(offset * self.max_possible_amplitude))
 
+        engine = get_engine()
+
         def remove_data_dc(data, off):
             if not off:
-                off = audioop.avg(data, self.sample_width)
-            return audioop.bias(data, self.sample_width, -off)
+                off = engine.avg(data, self.sample_width)
+            return engine.bias(data, self.sample_width, -off)
 
         if self.channels == 1:
-            return self._spawn(data=remove_data_dc(self._data, offset))
-
-        left_channel = audioop.tomono(self._data, self.sample_width, 1, 0)
-        right_channel = audioop.tomono(self._data, self.sample_width, 0, 1)
-
-        if not channel or channel == 1:
-            left_channel = remove_data_dc(left_channel, offset)
+            return self._spawn(data=remove_data_dc(self._view, offset))
 
-        if not channel or channel == 2:
-            right_channel = remove_data_dc(right_channel, offset)
+        channels_data = engine.deinterleave(self._view, self.sample_width,
+                                            self.channels)
+        for i, data in enumerate(channels_data):
+            if not channel or channel == i + 1:
+                channels_data[i] = remove_data_dc(data, offset)
 
-        left_channel = audioop.tostereo(left_channel, self.sample_width, 1, 0)
-        right_channel = audioop.tostereo(right_channel, self.sample_width, 0, 1)
-
-        return self._spawn(data=audioop.add(left_channel, right_channel,
-                                            self.sample_width))
+        return self._spawn(data=engine.interleave(channels_data,
+                                                  self.sample_width))
 
     def apply_gain(self, volume_change):
-        return self._spawn(data=audioop.mul(self._data, self.sample_width,
-                                            db_to_float(float(volume_change))))
+        return self._spawn(data=get_engine().mul(self._view, self.sample_width,
+                                                 db_to_float(float(volume_change))))
 
     def overlay(self, seg, position=0, loop=False, times=None, gain_during_overlay=None):
         """
@@ -1138,86 +1651,111 @@ class AudioSegment(object):
             this has the effect of 'ducking' the audio under the overlay.
         """
 
-        if loop:
-            # match loop=True's behavior with new times (count) mechinism.
-            times = -1
-        elif times is None:
-            # no times specified, just once through
-            times = 1
-        elif times == 0:
-            # it's a no-op, make a copy since we never mutate
-            return self._spawn(self._data)
-
-        output = StringIO()
-
-        seg1, seg2 = AudioSegment._sync(self, seg)
-        sample_width = seg1.sample_width
-        spawn = seg1._spawn
-
-        output.write(seg1[:position]._data)
-
-        # drop down to the raw data
-        seg1 = seg1[position:]._data
-        seg2 = seg2._data
-        pos = 0
-        seg1_len = len(seg1)
-        seg2_len = len(seg2)
-        while times:
-            remaining = max(0, seg1_len - pos)
-            if seg2_len >= remaining:
-                seg2 = seg2[:remaining]
-                seg2_len = remaining
-                # we've hit the end, we're done looping (if we were) and this
-                # is our last go-around
-                times = 1
-
-            if gain_during_overlay:
-                seg1_overlaid = seg1[pos:pos + seg2_len]
-                seg1_adjusted_gain = audioop.mul(seg1_overlaid, self.sample_width,
-                                                 db_to_float(float(gain_during_overlay)))
-                output.write(audioop.add(seg1_adjusted_gain, seg2, sample_width))
-            else:
-                output.write(audioop.add(seg1[pos:pos + seg2_len], seg2,
-                                         sample_width))
-            pos += seg2_len
+        if times == 0 and not loop:
+            # it's a no-op, share the buffer since we never mutate
+            return self._spawn_view(0, self._length)
 
-            # dec times to break our while loop (eventually)
-            times -= 1
+        mixer = Mixer(self)
+        mixer.add(seg, position=position, loop=loop, times=times,
+                  duck=gain_during_overlay)
+        return mixer.mix()
 
-        output.write(seg1[pos:])
+    def append(self, seg, crossfade=100):
+        return self.join([self, seg], crossfade=crossfade)
 
-        return spawn(data=output)
+    @classmethod
+    def join(cls, segments, crossfade=0):
+        """
+        Joins segments end to end, like chaining append() calls, but builds
+        the output in a single pass instead of copying it on every append.
 
-    def append(self, seg, crossfade=100):
-        seg1, seg2 = AudioSegment._sync(self, seg)
-
-        if not crossfade:
-            return seg1._spawn(seg1._data + seg2._data)
-        elif crossfade > len(self):
-            raise ValueError("Crossfade is longer than the original AudioSegment ({}ms > {}ms)".format(
-                crossfade, len(self)
-            ))
-        elif crossfade > len(seg):
-            raise ValueError("Crossfade is longer than the appended AudioSegment ({}ms > {}ms)".format(
-                crossfade, len(seg)
-            ))
-
-        xf = seg1[-crossfade:].fade(to_gain=-120, start=0, end=float('inf'))
-        xf *= seg2[:crossfade].fade(from_gain=-120, start=0, end=float('inf'))
-
-        output = TemporaryFile()
-
-        output.write(seg1[:-crossfade]._data)
-        output.write(xf._data)
-        output.write(seg2[crossfade:]._data)
-
-        output.seek(0)
-        obj = seg1._spawn(data=output)
-        output.close()
-        return obj
+        segments (iterable of AudioSegment):
+            The segments to join, synced to a common format first.
+
+        crossfade (optional int or sequence of ints):
+            The crossfade in milliseconds between consecutive segments, or a
+            sequence with one crossfade per pair of consecutive segments.
+        """
+        segments = list(segments)
+        if not segments:
+            return cls.empty()
+        segs = cls._sync(*segments)
+        if isinstance(crossfade, (list, tuple)):
+            if len(crossfade) != len(segs) - 1:
+                raise ValueError("Expected {} crossfades, got {}".format(
+                    len(segs) - 1, len(crossfade)))
+            crossfades = crossfade
+        else:
+            crossfades = [crossfade] * (len(segs) - 1)
+
+        first = segs[0]
+        frame_width = first.frame_width
+        frame_rate = first.frame_rate
+        silent_frame = audioop.mul(b'\0' * frame_width, first.sample_width, 0)
+
+        # the output so far, as a list of chunks that's only joined at the end
+        chunks = [first._view]
+        length = first._length
+
+        def pop_from(position, length):
+            # removes the output from byte position on and returns it
+            parts = []
+            while length > position:
+                chunk = chunks.pop()
+                keep = max(0, len(chunk) - (length - position))
+                if keep:
+                    chunks.append(chunk[:keep])
+                parts.append(chunk[keep:])
+                length -= len(chunk) - keep
+            return b''.join(reversed(parts))
+
+        def padding(missing_bytes):
+            missing_frames = missing_bytes // frame_width
+            if missing_frames > frame_rate * 2 / 1000.0:
+                raise TooManyMissingFrames(
+                    "You should never be filling in "
+                    "   more than 2 ms with silence here, "
+                    "missing frames: %s" % missing_frames)
+            return silent_frame * missing_frames
+
+        for seg, crossfade in zip(segs[1:], crossfades):
+            if not crossfade:
+                chunks.append(seg._view)
+                length += seg._length
+                continue
+
+            output_ms = round(1000 * ((length // frame_width) / frame_rate))
+            if crossfade > output_ms:
+                raise ValueError("Crossfade is longer than the original AudioSegment ({}ms > {}ms)".format(
+                    crossfade, output_ms
+                ))
+            elif crossfade > len(seg):
+                raise ValueError("Crossfade is longer than the appended AudioSegment ({}ms > {}ms)".format(
+                    crossfade, len(seg)
+                ))
+
+            # the frames output[:-crossfade] and output[-crossfade:] would
+            # take, with the same rounding and silence padding
+            tail_start = int((output_ms - crossfade) * (frame_rate / 1000.0)) * frame_width
+            tail_end = int(output_ms * (frame_rate / 1000.0)) * frame_width
+            tail = pop_from(min(tail_start, length), length)
+            tail = tail[:max(0, min(tail_end, length) - tail_start)]
+            if tail_start > length:
+                chunks.append(padding(tail_start - length))
+            tail += padding(tail_end - tail_start - len(tail))
+
+            xf = first._spawn(tail).fade(to_gain=-120, start=0, end=float('inf'))
+            xf *= seg[:crossfade].fade(from_gain=-120, start=0, end=float('inf'))
+            rest = seg[crossfade:]
+
+            chunks.append(xf._view)
+            chunks.append(rest._view)
+            length = tail_start + xf._length + rest._length
+
+        return first._spawn(chunks)
 
     def fade(self, to_gain=0, from_gain=0, start=None, end=None,
-             duration=None):
+             duration=None, curve='linear'):
         """
         Fade the volume of this audio segment.
 
@@ -1235,6 +1773,12 @@ class AudioSegment(object):
         duration (int):
             default = until the end of the audio segment
             the duration of the fade
+
+        curve (str):
+            default = "linear"
+            how the gain moves from one frame to the next: "linear" (in
+            amplitude), "equal_power" (constant power across a crossfade
+            with the opposite fade) or "log" (linear in db)
         """
         if None not in [duration, end, start]:
             raise TypeError('Only two of the three arguments, "start", '
@@ -1244,85 +1788,79 @@ class AudioSegment(object):
         if to_gain == 0 and from_gain == 0:
             return self
 
-        start = min(len(self), start) if start is not None else None
-        end = min(len(self), end) if end is not None else None
-
-        if start is not None and start < 0:
-            start += len(self)
-        if end is not None and end < 0:
-            end += len(self)
-
-        if duration is not None and duration < 0:
-            raise InvalidDuration("duration must be a positive integer")
+        if curve not in FADE_CURVES:
+            raise ValueError("curve must be one of: {}".format(", ".join(FADE_CURVES)))
 
-        if duration:
-            if start is not None:
-                end = start + duration
-            elif end is not None:
-                start = end - duration
-        else:
-            duration = end - start
+        start, end = self._fade_range(start, end, duration)
 
         from_power = db_to_float(from_gain)
+        to_power = db_to_float(to_gain)
+        engine = get_engine()
 
         output = []
 
         # original data - up until the crossfade portion, as is
-        before_fade = self[:start]._data
+        before_fade = self[:start]._view
         if from_gain != 0:
-            before_fade = audioop.mul(before_fade,
-                                      self.sample_width,
-                                      from_power)
+            before_fade = engine.mul(before_fade,
+                                     self.sample_width,
+                                     from_power)
         output.append(before_fade)
 
-        gain_delta = db_to_float(to_gain) - from_power
+        # the fade itself is one gain ramp, with a gain step on every frame
+        # (the ramp keeps its slope when the fade runs past the end)
+        fade_start = self._parse_position(start)
+        fade_end = self._parse_position(end)
+        output.append(engine.ramp(
+            self._view[fade_start * self.frame_width:fade_end * self.frame_width],
+            self.sample_width, self.channels, from_power, to_power, curve,
+            ramp_frames=fade_end - fade_start))
 
-        # fades longer than 100ms can use coarse fading (one gain step per ms),
-        # shorter fades will have audible clicks so they use precise fading
-        # (one gain step per sample)
-        if duration > 100:
-            scale_step = gain_delta / duration
-
-            for i in range(duration):
-                volume_change = from_power + (scale_step * i)
-                chunk = self[start + i]
-                chunk = audioop.mul(chunk._data,
+        # original data after the crossfade portion, at the new volume
+        after_fade = self[end:]._view
+        if to_gain != 0:
+            after_fade = engine.mul(after_fade,
                                     self.sample_width,
-                                    volume_change)
+                                    to_power)
+        output.append(after_fade)
 
-                output.append(chunk)
-        else:
-            start_frame = self.frame_count(ms=start)
-            end_frame = self.frame_count(ms=end)
-            fade_frames = end_frame - start_frame
-            scale_step = gain_delta / fade_frames
+        return self._spawn(data=output)
 
-            for i in range(int(fade_frames)):
-                volume_change = from_power + (scale_step * i)
-                sample = self.get_frame(int(start_frame + i))
-                sample = audioop.mul(sample, self.sample_width, volume_change)
+    def _fade_range(self, start, end, duration):
+        """
+        resolves fade()'s start, end and duration arguments to the start and
+        end of the fade, in milliseconds
+        """
+        start = min(len(self), start) if start is not None else None
+        end = min(len(self), end) if end is not None else None
 
-                output.append(sample)
+        if start is not None and start < 0:
+            start += len(self)
+        if end is not None and end < 0:
+            end += len(self)
 
-        # original data after the crossfade portion, at the new volume
-        after_fade = self[end:]._data
-        if to_gain != 0:
-            after_fade = audioop.mul(after_fade,
-                                     self.sample_width,
-                                     db_to_float(to_gain))
-        output.append(after_fade)
+        if duration is not None and duration < 0:
+            raise InvalidDuration("duration must be a positive integer")
 
-        return self._spawn(data=output)
+        if duration:
+            if start is not None:
+                end = start + duration
+            elif end is not None:
+                start = end - duration
+
+        return start, end
 
-    def fade_out(self, duration):
-        return self.fade(to_gain=-120, duration=duration, end=float('inf'))
+    def fade_out(self, duration, curve='linear'):
+        return self.fade(to_gain=-120, duration=duration, end=float('inf'),
+                         curve=curve)
 
-    def fade_in(self, duration):
-        return self.fade(from_gain=-120, duration=duration, start=0)
+    def fade_in(self, duration, curve='linear'):
+        return self.fade(from_gain=-120, duration=duration, start=0,
+                         curve=curve)
 
     def reverse(self):
         return self._spawn(
-            data=audioop.reverse(self._data, self.sample_width)
+            data=audioop.reverse(self._view, self.sample_width)
         )
 
     def _repr_html_(self):
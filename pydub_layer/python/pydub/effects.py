@@ -9,6 +9,7 @@ from .utils import (
     audioop,
     get_min_max_value
 )
+from .sample_engine import get_engine
 from .silence import split_on_silence
 from .exceptions import TooManyMissingFrames, InvalidDuration
 
@@ -18,16 +19,11 @@ if sys.version_info >= (3, 0):
 
 @register_pydub_effect
 def apply_mono_filter_to_each_channel(seg, filter_fn):
-    n_channels = seg.channels
-
     channel_segs = seg.split_to_mono()
     channel_segs = [filter_fn(channel_seg) for channel_seg in channel_segs]
 
-    out_data = seg.get_array_of_samples()
-    for channel_i, channel_seg in enumerate(channel_segs):
-        for sample_i, sample in enumerate(channel_seg.get_array_of_samples()):
-            index = (sample_i * n_channels) + channel_i
-            out_data[index] = sample
+    out_data = get_engine().interleave(
+        [channel_seg._view for channel_seg in channel_segs], seg.sample_width)
 
     return seg._spawn(out_data)
 
@@ -86,12 +82,8 @@ def speedup(seg, playback_speed=1.5, chunk_size=150, crossfade=25):
     last_chunk = chunks[-1]
     chunks = [chunk[:-ms_to_remove_per_chunk] for chunk in chunks[:-1]]
 
-    out = chunks[0]
-    for chunk in chunks[1:]:
-        out = out.append(chunk, crossfade=crossfade)
-
-    out += last_chunk
-    return out
+    crossfades = [crossfade] * (len(chunks) - 1) + [0]
+    return seg.join(chunks + [last_chunk], crossfade=crossfades)
     
 
 @register_pydub_effect
@@ -105,11 +97,7 @@ def strip_silence(seg, silence_len=1000, silence_thresh=-16, padding=100):
     if not len(chunks):
         return seg[0:0]
 
-    seg = chunks[0]
-    for chunk in chunks[1:]:
-        seg = seg.append(chunk, crossfade=crossfade)
-
-    return seg
+    return seg.join(chunks, crossfade=crossfade)
 
 
 @register_pydub_effect
@@ -197,21 +185,17 @@ def invert_phase(seg, channels=(1, 1)):
     Note that mono AudioSegments will become stereo.
     """
     if channels == (1, 1):
-        inverted = audioop.mul(seg._data, seg.sample_width, -1.0)  
+        inverted = audioop.mul(seg._view, seg.sample_width, -1.0)  
         return seg._spawn(data=inverted)
     
     else:
-        if seg.channels == 2:
-            left, right = seg.split_to_mono()
-        else:
+        if seg.channels != 2:
             raise Exception("Can't implicitly convert an AudioSegment with " + str(seg.channels) + " channels to stereo.")
             
         if channels == (1, 0):    
-            left = left.invert_phase()
+            return seg.remix([[-1, 0], [0, 1]])
         else:
-            right = right.invert_phase()
-        
-        return seg.from_mono_audiosegments(left, right)
+            return seg.remix([[1, 0], [0, -1]])
         
 
 
@@ -320,22 +304,12 @@ def apply_gain_stereo(seg, left_gain=0.0, right_gain=0.0):
     
     note: mono audio segments will be converted to stereo
     """
-    if seg.channels == 1:
-        left = right = seg
-    elif seg.channels == 2:
-        left, right = seg.split_to_mono()
-    
     l_mult_factor = db_to_float(left_gain)
     r_mult_factor = db_to_float(right_gain)
     
-    left_data = audioop.mul(left._data, left.sample_width, l_mult_factor)
-    left_data = audioop.tostereo(left_data, left.sample_width, 1, 0)
-    
-    right_data = audioop.mul(right._data, right.sample_width, r_mult_factor)
-    right_data = audioop.tostereo(right_data, right.sample_width, 0, 1)
-    
-    output = audioop.add(left_data, right_data, seg.sample_width)
-    
-    return seg._spawn(data=output,
-                overrides={'channels': 2,
-                           'frame_width': 2 * seg.sample_width})
+    if seg.channels == 1:
+        return seg.remix([[l_mult_factor], [r_mult_factor]])
+    elif seg.channels == 2:
+        return seg.remix([[l_mult_factor, 0], [0, r_mult_factor]])
+    else:
+        raise ValueError("apply_gain_stereo requires a mono or stereo AudioSegment")
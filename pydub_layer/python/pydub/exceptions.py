@@ -24,6 +24,18 @@ class CouldntDecodeError(PydubException):
     pass
 
 
+class CouldntDecodeFilesError(CouldntDecodeError):
+    """
+    Raised by AudioSegment.from_files() when any of the files couldn't be
+    decoded. errors holds a (file, exception) pair for each of them, in
+    input order.
+    """
+
+    def __init__(self, message, errors):
+        super(CouldntDecodeFilesError, self).__init__(message)
+        self.errors = errors
+
+
 class CouldntEncodeError(PydubException):
     pass
 
@@ -0,0 +1,194 @@
+"""
+Lazy AudioSegments, which record pointwise operations instead of running them.
+
+Every AudioSegment operation makes a new copy of the audio, so a chain like
+seg.apply_gain(-3).fade_in(500).fade_out(500) reads and writes it three
+times. seg.lazy() returns a LazySegment, which only records gain changes,
+fades and DC offset removal as stages. When the audio is needed (raw_data,
+export(), rms, slicing or any other operation), the stages run through the
+sample engine's envelope() kernel. Under NumPy that is a single pass, with
+the gains of the stages between two DC offset removals folded together.
+
+Each run of folded gains is rounded and clipped once rather than after every
+stage, so lazy results can differ from the eager ones by about one unit in
+the last place per gain stage, and a chain that clips part way through (a
+boost followed by a cut) keeps the peaks the eager chain would have lost.
+Offsets are added to the rounded samples and wrap around like bias(). The
+audioop engine still runs the stages one pass at a time, with the same
+rounding as the eager operations. Fades also keep every frame of the audio,
+where an eager fade may drop or pad the last frame when the segment's length
+in milliseconds is rounded.
+"""
+from .audio_segment import AudioSegment
+from .sample_engine import FADE_CURVES, BiasStage, GainStage, get_engine
+from .utils import db_to_float
+
+
+class LazySegment(object):
+    """
+    An AudioSegment with pending gain, fade and DC offset stages. Any other
+    attribute is looked up on the materialized AudioSegment, and AudioSegment
+    results of its methods are wrapped in a LazySegment again, so chains
+    stay lazy after an operation that had to run.
+    """
+    __slots__ = ('_source', '_stages', '_segment')
+
+    def __init__(self, seg, stages=()):
+        self._source = seg
+        self._stages = tuple(stages)
+        self._segment = None if self._stages else seg
+
+    # the format and the length don't change with the pending stages
+    @property
+    def sample_width(self):
+        return self._source.sample_width
+
+    @property
+    def frame_rate(self):
+        return self._source.frame_rate
+
+    @property
+    def channels(self):
+        return self._source.channels
+
+    @property
+    def frame_width(self):
+        return self._source.frame_width
+
+    def __len__(self):
+        return len(self._source)
+
+    def frame_count(self, ms=None):
+        return self._source.frame_count(ms)
+
+    def lazy(self):
+        return self
+
+    def materialize(self):
+        """
+        runs the pending stages and returns the resulting AudioSegment
+        """
+        if self._segment is None:
+            source = self._source
+            data = get_engine().envelope(source._view, source.sample_width,
+                                         source.channels, self._stages)
+            self._segment = source._spawn(data)
+        return self._segment
+
+    def _then(self, stage):
+        stages = self._stages
+        if stages and _is_constant(stage) and _is_constant(stages[-1]):
+            # consecutive gain changes become one
+            stage = stage._replace(to_power=stage.to_power * stages[-1].to_power)
+            stages = stages[:-1]
+        return LazySegment(self._source, stages + (stage,))
+
+    def apply_gain(self, volume_change):
+        power = db_to_float(float(volume_change))
+        return self._then(GainStage(0, 0, power, power, 'linear'))
+
+    def fade(self, to_gain=0, from_gain=0, start=None, end=None,
+             duration=None, curve='linear'):
+        if None not in [duration, end, start]:
+            raise TypeError('Only two of the three arguments, "start", '
+                            '"end", and "duration" may be specified')
+
+        if to_gain == 0 and from_gain == 0:
+            return self
+
+        if curve not in FADE_CURVES:
+            raise ValueError("curve must be one of: {}".format(", ".join(FADE_CURVES)))
+
+        source = self._source
+        start, end = source._fade_range(start, end, duration)
+        return self._then(GainStage(source._parse_position(start),
+                                    source._parse_position(end),
+                                    db_to_float(from_gain),
+                                    db_to_float(to_gain), curve))
+
+    def fade_out(self, duration, curve='linear'):
+        return self.fade(to_gain=-120, duration=duration, end=float('inf'),
+                         curve=curve)
+
+    def fade_in(self, duration, curve='linear'):
+        return self.fade(from_gain=-120, duration=duration, start=0,
+                         curve=curve)
+
+    def remove_dc_offset(self, channel=None, offset=None):
+        if channel and not 1 <= channel <= 2:
+            raise ValueError("channel value must be None, 1 (left) or 2 (right)")
+
+        if offset and not -1.0 <= offset <= 1.0:
+            raise ValueError("offset value must be in range -1.0 to 1.0")
+
+        if offset:
+            offsets = [int(round(offset * self._source.max_possible_amplitude))] * \
+                self.channels
+        else:
+            # the offsets are averages of the audio as it is at this stage
+            seg = self.materialize()
+            engine = get_engine()
+            channels_data = [seg._view] if seg.channels == 1 else \
+                engine.deinterleave(seg._view, seg.sample_width, seg.channels)
+            offsets = [engine.avg(data, seg.sample_width) for data in channels_data]
+
+        if self.channels == 1:
+            channel = None
+        offsets = tuple(-off if not channel or channel == i + 1 else 0
+                        for i, off in enumerate(offsets))
+        return self._then(BiasStage(offsets))
+
+    def __add__(self, arg):
+        if isinstance(arg, (AudioSegment, LazySegment)):
+            return _wrap(self.materialize() + _materialized(arg))
+        return self.apply_gain(arg)
+
+    def __sub__(self, arg):
+        if isinstance(arg, (AudioSegment, LazySegment)):
+            raise TypeError("AudioSegment objects can't be subtracted from "
+                            "each other")
+        return self.apply_gain(-arg)
+
+    def __getitem__(self, millisecond):
+        return _wrap(self.materialize()[millisecond])
+
+    def __eq__(self, other):
+        return self.materialize() == _materialized(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.materialize())
+
+    def __getattr__(self, name):
+        attr = getattr(self.materialize(), name)
+        if not callable(attr):
+            return attr
+
+        def method(*args, **kwargs):
+            args = [_materialized(arg) for arg in args]
+            kwargs = dict((key, _materialized(arg)) for key, arg in kwargs.items())
+            return _wrap(attr(*args, **kwargs))
+
+        return method
+
+    def __repr__(self):
+        return "<LazySegment of {!r} with {} pending stages>".format(
+            self._source, len(self._stages))
+
+
+def _is_constant(stage):
+    return isinstance(stage, GainStage) and stage.start == stage.end == 0
+
+
+def _materialized(seg):
+    return seg.materialize() if isinstance(seg, LazySegment) else seg
+
+
+def _wrap(result):
+    if isinstance(result, AudioSegment):
+        return LazySegment(result)
+    if isinstance(result, (list, tuple)):
+        return type(result)(_wrap(item) for item in result)
+    return result
@@ -8,6 +8,11 @@ converter_logger = logging.getLogger("pydub.converter")
 def log_conversion(conversion_command):
     converter_logger.debug("subprocess.call(%s)", repr(conversion_command))
 
+def log_decode_timing(file_count, workers, wall_time, decode_time):
+    converter_logger.debug(
+        "decoded %d files, %d at a time, in %.3fs (%.3fs spent decoding)",
+        file_count, workers, wall_time, decode_time)
+
 def log_subprocess_output(output):
     if output:
         for line in output.rstrip().splitlines():
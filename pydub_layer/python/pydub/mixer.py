@@ -0,0 +1,153 @@
+"""
+Mix any number of tracks onto a base segment in one pass.
+
+AudioSegment.overlay() lays one segment over another, so laying N tracks over
+a timeline takes N overlays, each copying the whole output. A Mixer collects
+the tracks first and syncs their formats once. It then builds the output
+region by region: where tracks overlap their samples are added up wider than
+the sample width and clipped once, rather than after every track.
+"""
+from collections import namedtuple
+
+from .sample_engine import get_engine
+from .utils import db_to_float
+
+_Track = namedtuple('_Track', ['seg', 'position', 'gain', 'times', 'duck'])
+
+
+class Mixer(object):
+    """
+    Lays tracks over a base segment:
+
+        mixer = Mixer(music_bed)
+        mixer.add(intro, position=0)
+        mixer.add(voice, position=2000, duck=-12)
+        mixed = mixer.mix()
+
+    Like overlay(), the result is as long as the base, in the widest format
+    (channels, frame rate and sample width) of all the segments.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.tracks = []
+
+    def add(self, seg, position=0, gain=0, loop=False, times=None, duck=None):
+        """
+        Adds a track and returns the mixer, so calls can be chained.
+
+        seg (AudioSegment):
+            The track.
+
+        position (optional int):
+            Where the track starts on the base, in milliseconds.
+
+        gain (optional float):
+            Gain applied to the track, in dB.
+
+        loop (optional bool):
+            Repeat the track until the end of the base. Overrides times.
+
+        times (optional int):
+            Repeat the track the specified number of times, or until the end
+            of the base. 0 leaves the track out.
+
+        duck (optional float):
+            Gain in dB applied to the base and to the tracks added before this
+            one while this one plays, like overlay()'s gain_during_overlay.
+            Overlapping ducks add up.
+        """
+        if loop:
+            times = -1
+        elif times is None:
+            times = 1
+        self.tracks.append(_Track(seg, position, gain, times, duck))
+        return self
+
+    def mix(self):
+        """
+        returns the mixed AudioSegment
+        """
+        segs = self.base._sync(self.base, *[track.seg for track in self.tracks])
+        base = segs[0]
+        length = base._length
+
+        # each input as (start, end, data, gain, duck), in bytes of the output
+        inputs = [(0, length, base._view, 0, None)]
+        for track, seg in zip(self.tracks, segs[1:]):
+            data = seg._view
+            start = base._parse_position(min(track.position, len(base)))
+            start = min(max(start * base.frame_width, 0), length)
+            if track.times < 0:
+                end = length
+            else:
+                end = min(length, start + track.times * len(data))
+            if data and end > start:
+                inputs.append((start, end, data, track.gain, track.duck))
+
+        layers = []
+        for i, (start, end, data, gain, duck) in enumerate(inputs):
+            ducks = [(duck_start, duck_end, duck_gain)
+                     for duck_start, duck_end, _, _, duck_gain in inputs[i + 1:]
+                     if duck_gain]
+            for a, b, factor in _gain_pieces(start, end, gain, ducks):
+                layers.extend(_repetitions(a, b, start, data, factor))
+
+        return base._spawn(_render(layers, length, base.sample_width))
+
+
+def _gain_pieces(start, end, gain, ducks):
+    """
+    splits start:end where the ducks start and stop, into (a, b, factor)
+    pieces of constant gain
+    """
+    points = sorted({start, end} | set(
+        point for duck_start, duck_end, _ in ducks
+        for point in (duck_start, duck_end) if start < point < end
+    ))
+    for a, b in zip(points, points[1:]):
+        db = gain + sum(duck_gain for duck_start, duck_end, duck_gain in ducks
+                        if duck_start <= a and b <= duck_end)
+        yield a, b, db_to_float(float(db)) if db else 1
+
+
+def _repetitions(a, b, start, data, factor):
+    """
+    the (a, b, data, factor) layers of a:b in a track that repeats data
+    from start
+    """
+    length = len(data)
+    pos = a
+    while pos < b:
+        repetition_start = start + (pos - start) // length * length
+        stop = min(b, repetition_start + length)
+        yield (pos, stop,
+               data[pos - repetition_start:stop - repetition_start], factor)
+        pos = stop
+
+
+def _render(layers, length, sample_width):
+    """
+    the output data, built up from the regions between the layers' edges
+    """
+    engine = get_engine()
+    points = sorted({0, length} | set(layer[0] for layer in layers) |
+                    set(layer[1] for layer in layers))
+    layers = sorted(layers, key=lambda layer: layer[0])
+    active = []
+    added = 0
+    chunks = []
+    for p, q in zip(points, points[1:]):
+        while added < len(layers) and layers[added][0] <= p:
+            active.append(layers[added])
+            added += 1
+        active = [layer for layer in active if layer[1] > p]
+
+        region = [(data[p - a:q - a], factor) for a, _, data, factor in active]
+        if len(region) > 1:
+            chunks.append(engine.mix(region, sample_width))
+        elif region[0][1] != 1:
+            chunks.append(engine.mul(region[0][0], sample_width, region[0][1]))
+        else:
+            chunks.append(region[0][0])
+    return chunks
@@ -0,0 +1,277 @@
+"""
+Index MP3 streams by walking their frame headers, without decoding any audio.
+
+A single pass over the bytes hops from one frame header to the next, which is
+enough to get the exact frame count (and so the exact duration), the average
+bitrate and a time -> byte seek table. Xing/Info and VBRI header frames are
+recognized and excluded from the audio frames.
+"""
+import struct
+from collections import namedtuple
+
+from .exceptions import CouldntDecodeError
+
+# MPEG version bits -> version id (1 = MPEG-1, 2 = MPEG-2, 25 = MPEG-2.5)
+_VERSIONS = {0: 25, 2: 2, 3: 1}
+
+# layer bits -> layer number
+_LAYERS = {1: 3, 2: 2, 3: 1}
+
+_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    25: (11025, 12000, 8000),
+}
+
+# kbps, indexed by the 4 bitrate bits (0 is "free format", 15 is invalid)
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+FrameHeader = namedtuple('FrameHeader', ['version', 'layer', 'bitrate',
+                                         'sample_rate', 'channels',
+                                         'samples', 'size'])
+
+
+class Mp3Index(namedtuple('Mp3Index', ['duration', 'frame_count', 'bitrate',
+                                       'sample_rate', 'channels',
+                                       'vbr_header', 'seek_interval',
+                                       'seek_table'])):
+    """
+    duration: exact playback duration in seconds (without the encoder delay
+        and padding recorded in a LAME tag)
+    frame_count: number of audio frames (Xing/VBRI header frames excluded)
+    bitrate: average bitrate of the audio frames in bits per second
+    vbr_header: "Xing", "Info", "VBRI" or None
+    seek_table: byte offset of the frame playing at n * seek_interval seconds,
+        i.e. the last frame that starts at or before that time
+    """
+    __slots__ = ()
+
+    def byte_offset(self, seconds):
+        """
+        returns the byte offset of the frame playing at the last seek point
+        at or before the given time, so decoding from there reaches it
+        """
+        if not self.seek_table:
+            raise ValueError("MP3 stream has no audio frames")
+        i = int(max(seconds, 0) // self.seek_interval)
+        return self.seek_table[min(i, len(self.seek_table) - 1)]
+
+
+def _build_header_table():
+    """
+    Maps the top 22 bits of a frame header (everything before the padding
+    bit) to (version, layer, bitrate, sample_rate,
+    samples_per_frame, frame size without padding, padding size).
+    """
+    table = {}
+    for version_bits, version in _VERSIONS.items():
+        for layer_bits, layer in _LAYERS.items():
+            bitrates = _BITRATES[(min(version, 2), layer)]
+            if layer == 1:
+                samples = 384
+            elif layer == 3 and version != 1:
+                samples = 576
+            else:
+                samples = 1152
+            for bitrate_bits in range(1, 15):
+                bitrate = bitrates[bitrate_bits] * 1000
+                for rate_bits in range(3):
+                    sample_rate = _SAMPLE_RATES[version][rate_bits]
+                    if layer == 1:
+                        size = (12 * bitrate // sample_rate) * 4
+                        padding = 4
+                    else:
+                        size = (samples // 8) * bitrate // sample_rate
+                        padding = 1
+                    for protection_bit in (0, 1):
+                        key = (0x7FF << 10 | version_bits << 8 |
+                               layer_bits << 6 | protection_bit << 5 |
+                               bitrate_bits << 1) << 1 | rate_bits
+                        table[key] = (version, layer, bitrate, sample_rate,
+                                      samples, size, padding)
+    return table
+
+
+# keyed by header >> 10; the padding bit is (header >> 9) & 1
+_HEADERS = _build_header_table()
+
+
+def parse_frame_header(data, pos=0):
+    """
+    Parses the 4 byte MPEG audio frame header at data[pos:pos + 4].
+    Returns None if there isn't a valid header there.
+    """
+    if pos + 4 > len(data):
+        return None
+    header = struct.unpack_from('>I', data, pos)[0]
+    params = _HEADERS.get(header >> 10)
+    if params is None:
+        return None
+    version, layer, bitrate, sample_rate, samples, size, padding = params
+    if (header >> 9) & 1:
+        size += padding
+    channels = 1 if (header >> 6) & 3 == 3 else 2
+    return FrameHeader(version, layer, bitrate, sample_rate, channels,
+                       samples, size)
+
+
+def _id3v2_size(data, pos):
+    if data[pos:pos + 3] != b'ID3' or pos + 10 > len(data):
+        return 0
+    size = 0
+    for b in data[pos + 6:pos + 10]:
+        size = (size << 7) | (b & 0x7F)
+    # a footer doubles the 10 byte header
+    footer = 10 if data[pos + 5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _vbr_header(data, pos, frame):
+    """
+    Returns (tag, encoder_delay, encoder_padding) when the frame at pos is a
+    Xing/Info or VBRI header frame rather than audio, otherwise None. The
+    delay and padding come from the LAME tag when there is one.
+    """
+    # the Xing tag sits right after the layer III side information
+    if frame.version == 1:
+        side_info = 17 if frame.channels == 1 else 32
+    else:
+        side_info = 9 if frame.channels == 1 else 17
+    xing = pos + 4 + side_info
+    tag = bytes(data[xing:xing + 4])
+    if tag in (b'Xing', b'Info'):
+        flags = struct.unpack_from('>I', data, xing + 4)[0]
+        # the frames, bytes, TOC and quality fields are each optional
+        lame = xing + 8 + 4 * bool(flags & 1) + 4 * bool(flags & 2) + \
+            100 * bool(flags & 4) + 4 * bool(flags & 8)
+        delay = padding = 0
+        if data[lame:lame + 4] in (b'LAME', b'Lavc', b'Lavf') and \
+                lame + 24 <= pos + frame.size:
+            b0, b1, b2 = data[lame + 21:lame + 24]
+            delay = (b0 << 4) | (b1 >> 4)
+            padding = ((b1 & 0x0F) << 8) | b2
+        return tag.decode('ascii'), delay, padding
+
+    vbri = pos + 36
+    if bytes(data[vbri:vbri + 4]) == b'VBRI':
+        return 'VBRI', struct.unpack_from('>H', data, vbri + 6)[0], 0
+
+    return None
+
+
+def _sync(data, pos, end):
+    """
+    Finds the next position at or after pos where two consecutive valid
+    frame headers start.
+    """
+    while pos < end:
+        pos = data.find(b'\xff', pos, end)
+        if pos < 0:
+            return -1
+        frame = parse_frame_header(data, pos)
+        if frame is not None:
+            next_pos = pos + frame.size
+            if next_pos >= end or parse_frame_header(data, next_pos) is not None:
+                return pos
+        pos += 1
+    return -1
+
+
+def index_mp3(data, seek_interval=1.0):
+    """
+    Builds an Mp3Index from the bytes of an MP3 file (bytes, bytearray or
+    memoryview). Only frame headers are read, no audio is decoded.
+
+    seek_interval (float):
+        spacing of the entries in the seek table in seconds (default: 1.0)
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+
+    end = len(data)
+    # ID3v1 and APEv2 trailers are not frames
+    if data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    pos = 0
+    while True:
+        tag_size = _id3v2_size(data, pos)
+        if not tag_size:
+            break
+        pos += tag_size
+
+    pos = _sync(data, pos, end)
+    if pos < 0:
+        raise CouldntDecodeError("Couldn't find an MPEG audio frame in data")
+
+    first = parse_frame_header(data, pos)
+    vbr_header = None
+    delay = padding = 0
+    vbr = _vbr_header(data, pos, first) if first.layer == 3 else None
+    if vbr is not None:
+        vbr_header, delay, padding = vbr
+        pos += first.size
+
+    sample_rate = first.sample_rate
+    samples_per_second = float(sample_rate)
+    frame_count = 0
+    sample_count = 0
+    audio_bytes = 0
+    next_seek = 0
+    seek_step = seek_interval * sample_rate
+    seek_table = []
+
+    # local aliases, this loop runs once per frame
+    headers = _HEADERS
+    unpack_from = struct.unpack_from
+    append = seek_table.append
+
+    while pos + 4 <= end:
+        header = unpack_from('>I', data, pos)[0]
+        params = headers.get(header >> 10)
+        if params is None or params[3] != sample_rate:
+            if data[pos:pos + 3] == b'APE' or data[pos:pos + 3] == b'TAG':
+                break
+            pos = _sync(data, pos + 1, end)
+            if pos < 0:
+                break
+            continue
+
+        size = params[5] + params[6] if (header >> 9) & 1 else params[5]
+        if pos + size > end:
+            # truncated last frame
+            break
+
+        frame_count += 1
+        sample_count += params[4]
+
+        # this frame plays every seek point before the next frame starts
+        while sample_count > next_seek:
+            append(pos)
+            next_seek += seek_step
+
+        audio_bytes += size
+        pos += size
+
+    bitrate = int(round(audio_bytes * 8 / (sample_count / samples_per_second))) \
+        if sample_count else 0
+    # encoder delay and padding are decoded but not played back
+    duration = max(sample_count - delay - padding, 0) / samples_per_second
+
+    return Mp3Index(
+        duration=duration,
+        frame_count=frame_count,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        channels=first.channels,
+        vbr_header=vbr_header,
+        seek_interval=seek_interval,
+        seek_table=seek_table,
+    )
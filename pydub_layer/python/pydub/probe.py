@@ -0,0 +1,209 @@
+"""
+Find out what from_file() needs to know about a file without running ffprobe
+for every one.
+
+Decoding a file through ffmpeg only needs the sample format, channels and
+sample rate of its audio, so that it's decoded to raw samples without losing
+bits. For MP3, WAV, Ogg (Vorbis and Opus) and FLAC files those can be read
+off their first bytes. Other files are probed with ffprobe, and the results
+are kept in a small LRU cache, keyed by path, size and modification time, or
+by a hash of the content of file objects.
+"""
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from .mp3_index import _id3v2_size, parse_frame_header
+from .utils import fsdecode, mediainfo_json
+
+
+class ProbeCache(object):
+    """
+    A thread-safe LRU cache of ffprobe results
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+            return info
+
+    def put(self, key, info):
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+probe_cache = ProbeCache()
+
+
+def probe_info(file, read_ahead_limit=-1, probe=True):
+    """
+    Returns info about file (a path or a seekable file object) like
+    mediainfo_json()'s, or at least the codec_name, sample_fmt,
+    bits_per_sample, channels and sample_rate of its first audio stream.
+    The position of file objects is left as it was.
+
+    With probe False, files that aren't recognized by their first bytes
+    aren't probed either, and None is returned. Otherwise the cache key of
+    a file object that has to be probed is the SHA-1 of all of its content,
+    so the whole file is read and hashed before the cache is looked at.
+    """
+    try:
+        filename = fsdecode(file)
+    except TypeError:
+        filename = None
+
+    if filename:
+        with open(filename, 'rb') as f:
+            info = sniff_info(f)
+    else:
+        info = sniff_info(file)
+    if info or not probe:
+        return info
+
+    if filename:
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+    else:
+        position = file.tell()
+        key = hashlib.sha1(file.read()).hexdigest()
+        file.seek(position)
+
+    info = probe_cache.get(key)
+    if info is None:
+        info = mediainfo_json(filename or file, read_ahead_limit=read_ahead_limit)
+        if not filename:
+            file.seek(position)
+        if info:
+            probe_cache.put(key, info)
+    return info
+
+
+def sniff_info(file):
+    """
+    Recognizes MP3, WAV, Ogg Vorbis/Opus and FLAC audio by the first bytes
+    of file (a seekable file object, whose position is left as it was).
+    Returns info like mediainfo_json()'s with a single audio stream, or None
+    for anything else.
+    """
+    position = file.tell()
+    try:
+        stream = _sniff_stream(file, position)
+    finally:
+        file.seek(position)
+    if stream is None:
+        return None
+    stream['codec_type'] = 'audio'
+    stream['index'] = 0
+    return {'streams': [stream]}
+
+
+def _stream(codec_name, sample_fmt, bits_per_sample, channels, sample_rate):
+    return {
+        'codec_name': codec_name,
+        'sample_fmt': sample_fmt,
+        'bits_per_sample': bits_per_sample,
+        'channels': channels,
+        # a string, as ffprobe gives it
+        'sample_rate': str(sample_rate),
+    }
+
+
+def _sniff_stream(file, start):
+    head = file.read(64)
+
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return _sniff_wav(file, start)
+
+    if head[:4] == b'fLaC' and len(head) >= 26 and head[4] & 0x7F == 0:
+        # the STREAMINFO block comes first: after the block and frame sizes
+        # come 20 bits of sample rate, 3 of channels and 5 of bits per sample
+        fields = struct.unpack_from('>Q', head, 18)[0]
+        sample_rate = fields >> 44
+        channels = ((fields >> 41) & 0x7) + 1
+        bits = ((fields >> 36) & 0x1F) + 1
+        # ffmpeg's flac decoder gives 16 or 32-bit samples
+        if bits <= 16:
+            return _stream('flac', 's16', 16, channels, sample_rate)
+        return _stream('flac', 's32', 32, channels, sample_rate)
+
+    if head[:4] == b'OggS' and len(head) >= 27:
+        # the first packet of the first page identifies the codec
+        packet = 27 + head[26]
+        if head[packet:packet + 7] == b'\x01vorbis' and len(head) >= packet + 16:
+            # the version, then the channels and sample rate
+            channels, sample_rate = struct.unpack_from('<BI', head, packet + 11)
+            return _stream('vorbis', 'fltp', 32, channels, sample_rate)
+        if head[packet:packet + 8] == b'OpusHead' and len(head) >= packet + 10:
+            # opus always decodes at 48kHz, whatever rate the header gives
+            return _stream('opus', 'fltp', 32, head[packet + 9], 48000)
+        return None
+
+    tag_size = _id3v2_size(head, 0)
+    if tag_size:
+        file.seek(start + tag_size)
+        head = file.read(4)
+    frame = parse_frame_header(head)
+    if frame is None or frame.layer != 3:
+        return None
+    if not tag_size:
+        # a single header could be chance, so without a tag in front the
+        # next frame has to follow
+        file.seek(start + frame.size)
+        if parse_frame_header(file.read(4)) is None:
+            return None
+    # ffmpeg decodes mp3 to floats, which mediainfo_json() reports as fltp
+    return _stream('mp3', 'fltp', 0, frame.channels, frame.sample_rate)
+
+
+def _sniff_wav(file, start):
+    pos = 12
+    while True:
+        file.seek(start + pos)
+        header = file.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, size = header[:4], struct.unpack('<I', header[4:])[0]
+        if chunk_id == b'fmt ':
+            break
+        if chunk_id == b'data':
+            return None
+        pos += 8 + size
+
+    fmt = file.read(size)
+    if len(fmt) < 16:
+        return None
+    audio_format, channels, sample_rate, _, _, bits = \
+        struct.unpack_from('<HHIIHH', fmt)
+    if audio_format == 0xFFFE and len(fmt) >= 26:
+        # WAVE_FORMAT_EXTENSIBLE: the format is the start of the SubFormat GUID
+        audio_format = struct.unpack_from('<H', fmt, 24)[0]
+    # samples are stored in whole bytes
+    bits = (bits + 7) // 8 * 8
+    if audio_format == 1:
+        if bits == 8:
+            return _stream('pcm_u8', 'u8', 8, channels, sample_rate)
+        return _stream('pcm_s%dle' % bits, 's%d' % min(bits, 32), bits,
+                       channels, sample_rate)
+    if audio_format == 3:
+        return _stream('pcm_f%dle' % bits, 'flt' if bits == 32 else 'dbl', bits,
+                       channels, sample_rate)
+    return None
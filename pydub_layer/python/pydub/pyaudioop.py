@@ -1,22 +1,44 @@
+"""
+Pure Python replacement for the parts of the audioop module that pydub uses,
+for interpreters without audioop (it was removed in Python 3.13).
+
+Fragments are processed as whole arrays of samples: NumPy arrays when NumPy
+can be imported, otherwise array.array with list comprehensions. Results
+match audioop exactly, including its clipping, rounding and wrap-around,
+with one tolerance: avg, rms and the find* functions add the samples up
+exactly, where audioop adds them up in a double that starts rounding once the
+sum passes 2 ** 53.
+
+The u-law, a-law and ADPCM codecs and byteswap are left out.
+"""
+import array
+import math
+from builtins import max as builtin_max
+from builtins import min as builtin_min
+
 try:
-    from __builtin__ import max as builtin_max
-    from __builtin__ import min as builtin_min
+    import numpy as np
 except ImportError:
-    from builtins import max as builtin_max
-    from builtins import min as builtin_min
-import math
-import struct
-from fractions import gcd
-from ctypes import create_string_buffer
+    np = None
 
 
 class error(Exception):
     pass
 
 
+_TYPECODES = {
+    1: 'b',
+    2: 'h',
+    4: 'i' if array.array('i').itemsize == 4 else 'l',
+}
+
+# samples per block in the NumPy kernels, so temporaries stay in cache
+_BLOCK = 1 << 16
+
+
 def _check_size(size):
-    if size != 1 and size != 2 and size != 4:
-        raise error("Size should be 1, 2 or 4")
+    if size not in (1, 2, 3, 4):
+        raise error("Size should be 1, 2, 3 or 4")
 
 
 def _check_params(length, size):
@@ -25,526 +47,606 @@ def _check_params(length, size):
         raise error("not a whole number of frames")
 
 
-def _sample_count(cp, size):
-    return len(cp) / size
-
-
-def _get_samples(cp, size, signed=True):
-    for i in range(_sample_count(cp, size)):
-        yield _get_sample(cp, size, i, signed)
-
-
-def _struct_format(size, signed):
-    if size == 1:
-        return "b" if signed else "B"
-    elif size == 2:
-        return "h" if signed else "H"
-    elif size == 4:
-        return "i" if signed else "I"
-
-
-def _get_sample(cp, size, i, signed=True):
-    fmt = _struct_format(size, signed)
-    start = i * size
-    end = start + size
-    return struct.unpack_from(fmt, buffer(cp)[start:end])[0]
-
-
-def _put_sample(cp, size, i, val, signed=True):
-    fmt = _struct_format(size, signed)
-    struct.pack_into(fmt, cp, i * size, val)
-
-
-def _get_maxval(size, signed=True):
-    if signed and size == 1:
-        return 0x7f
-    elif size == 1:
-        return 0xff
-    elif signed and size == 2:
-        return 0x7fff
-    elif size == 2:
-        return 0xffff
-    elif signed and size == 4:
-        return 0x7fffffff
-    elif size == 4:
-        return 0xffffffff
+def _buffer(cp):
+    """
+    a flat memoryview of the bytes of a bytes-like object
+    """
+    try:
+        view = memoryview(cp)
+    except TypeError:
+        raise TypeError("a bytes-like object is required, not '%s'"
+                        % type(cp).__name__)
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    return view
+
+
+def _bounds(size):
+    maxval = (1 << (8 * size - 1)) - 1
+    return -maxval - 1, maxval
+
+
+def _fbound(val, minval, maxval):
+    """
+    clips and floors a product like audioop does
+    """
+    if val > maxval:
+        return maxval
+    if val < minval + 1:
+        return minval
+    return int(math.floor(val))
+
+
+# -- NumPy kernels, shared with pydub.sample_engine --
+
+def _np_samples(cp, size):
+    """
+    the samples of a fragment as a (read-only, when possible zero-copy)
+    ndarray; 24-bit samples are widened to int32
+    """
+    if size == 3:
+        raw = np.frombuffer(cp, dtype=np.uint8).reshape(-1, 3)
+        wide = np.zeros((len(raw), 4), dtype=np.uint8)
+        wide[:, 1:] = raw
+        return wide.view(np.int32).reshape(-1) >> 8
+    return np.frombuffer(cp, dtype='i%d' % size)
+
+
+def _np_pack(samples, size):
+    """
+    packs in-range samples into a uint8 ndarray of size byte samples
+    """
+    if size == 3:
+        wide = samples.astype(np.int32).view(np.uint8).reshape(-1, 4)
+        return np.ascontiguousarray(wide[:, :3]).reshape(-1)
+    samples = np.ascontiguousarray(samples, dtype='i%d' % size)
+    return samples.reshape(-1).view(np.uint8)
+
+
+def _np_scale(samples, factor, out, size):
+    """
+    out[:] = floor(clip(samples * factor)), computed in double precision one
+    block at a time
+    """
+    lo, hi = _bounds(size)
+    temp = np.empty(builtin_min(len(samples), _BLOCK), dtype=np.float64)
+    for start in range(0, len(samples), _BLOCK):
+        stop = builtin_min(start + _BLOCK, len(samples))
+        block = temp[:stop - start]
+        np.multiply(samples[start:stop], factor, out=block, dtype=np.float64)
+        np.clip(block, lo, hi, out=block)
+        np.floor(block, out=block)
+        out[start:stop] = block
+    return out
+
+
+def _np_mul(samples, size, factor):
+    return _np_scale(samples, float(factor), np.empty_like(samples), size)
+
+
+def _np_add(samples1, samples2, size):
+    lo, hi = _bounds(size)
+    out = np.empty_like(samples1)
+    temp = np.empty(builtin_min(len(out), _BLOCK), dtype=np.int64)
+    for start in range(0, len(out), _BLOCK):
+        stop = builtin_min(start + _BLOCK, len(out))
+        block = temp[:stop - start]
+        np.add(samples1[start:stop], samples2[start:stop], out=block,
+               dtype=np.int64)
+        np.clip(block, lo, hi, out=block)
+        out[start:stop] = block
+    return out
+
+
+def _np_bias(samples, size, bias):
+    # unsigned arithmetic wraps around on overflow, like audioop
+    if size == 3:
+        wrapped = (samples.astype(np.int64) + ((bias + (1 << 23)) & 0xFFFFFF)) \
+            & 0xFFFFFF
+        return wrapped - (1 << 23)
+    unsigned = samples.view('u%d' % size)
+    wrapped = unsigned + np.array(bias & ((1 << (8 * size)) - 1), dtype=unsigned.dtype)
+    return wrapped.view(samples.dtype)
+
+
+def _np_sum(samples):
+    return int(samples.sum(dtype=np.int64))
+
+
+def _np_sum_squares(samples):
+    total = 0
+    for start in range(0, len(samples), _BLOCK):
+        block = samples[start:start + _BLOCK].astype(np.int64)
+        if samples.dtype.itemsize <= 2:
+            total += int(np.dot(block, block))
+        else:
+            # split into 16 bit halves so the int64 sums can't overflow
+            high = block >> 16
+            low = block & 0xFFFF
+            total += (int(np.dot(high, high)) << 32) + \
+                (int(np.dot(high, low)) << 17) + int(np.dot(low, low))
+    return total
 
 
-def _get_minval(size, signed=True):
-    if not signed:
-        return 0
-    elif size == 1:
-        return -0x80
-    elif size == 2:
-        return -0x8000
-    elif size == 4:
-        return -0x80000000
-
-
-def _get_clipfn(size, signed=True):
-    maxval = _get_maxval(size, signed)
-    minval = _get_minval(size, signed)
-    return lambda val: builtin_max(min(val, maxval), minval)
-
-
-def _overflow(val, size, signed=True):
-    minval = _get_minval(size, signed)
-    maxval = _get_maxval(size, signed)
-    if minval <= val <= maxval:
-        return val
-
-    bits = size * 8
-    if signed:
-        offset = 2**(bits-1)
-        return ((val + offset) % (2**bits)) - offset
-    else:
-        return val % (2**bits)
+def _np_tomono(samples, size, lfactor, rfactor):
+    lo, hi = _bounds(size)
+    frames = samples.reshape(-1, 2)
+    out = np.empty(len(frames), dtype=samples.dtype)
+    block_size = builtin_min(len(frames), _BLOCK)
+    left = np.empty(block_size, dtype=np.float64)
+    right = np.empty(block_size, dtype=np.float64)
+    for start in range(0, len(frames), _BLOCK):
+        stop = builtin_min(start + _BLOCK, len(frames))
+        lblock = left[:stop - start]
+        rblock = right[:stop - start]
+        np.multiply(frames[start:stop, 0], float(lfactor), out=lblock,
+                    dtype=np.float64)
+        np.multiply(frames[start:stop, 1], float(rfactor), out=rblock,
+                    dtype=np.float64)
+        np.add(lblock, rblock, out=lblock)
+        np.clip(lblock, lo, hi, out=lblock)
+        np.floor(lblock, out=lblock)
+        out[start:stop] = lblock
+    return out
+
+
+def _np_tostereo(samples, size, lfactor, rfactor):
+    if lfactor == 1 and rfactor == 1:
+        # floor(clip(x * 1.0)) is x
+        return np.repeat(samples, 2)
+    out = np.empty((len(samples), 2), dtype=samples.dtype)
+    _np_scale(samples, float(lfactor), out[:, 0], size)
+    _np_scale(samples, float(rfactor), out[:, 1], size)
+    return out.reshape(-1)
+
+
+# -- array fallbacks --
+
+def _array_samples(cp, size):
+    if size == 3:
+        raw = bytes(cp)
+        wide = bytearray(len(raw) // 3 * 4)
+        wide[1::4] = raw[0::3]
+        wide[2::4] = raw[1::3]
+        wide[3::4] = raw[2::3]
+        samples = array.array(_TYPECODES[4])
+        samples.frombytes(wide)
+        return array.array(_TYPECODES[4], [val >> 8 for val in samples])
+    samples = array.array(_TYPECODES[size])
+    samples.frombytes(cp)
+    return samples
+
+
+def _array_pack(samples, size):
+    if size == 3:
+        wide = array.array(_TYPECODES[4], samples).tobytes()
+        raw = bytearray(len(wide) // 4 * 3)
+        raw[0::3] = wide[0::4]
+        raw[1::3] = wide[1::4]
+        raw[2::3] = wide[2::4]
+        return bytes(raw)
+    return array.array(_TYPECODES[size], samples).tobytes()
+
+
+# -- dispatch --
+
+def _samples(cp, size):
+    if np is not None:
+        return _np_samples(cp, size)
+    return _array_samples(cp, size)
+
+
+def _fragment(cp, size):
+    cp = _buffer(cp)
+    _check_params(len(cp), size)
+    return cp
 
 
 def getsample(cp, size, i):
-    _check_params(len(cp), size)
-    if not (0 <= i < len(cp) / size):
+    cp = _fragment(cp, size)
+    if not 0 <= i < len(cp) // size:
         raise error("Index out of range")
-    return _get_sample(cp, size, i)
+    return int(_samples(cp[i * size:(i + 1) * size], size)[0])
 
 
 def max(cp, size):
-    _check_params(len(cp), size)
-
-    if len(cp) == 0:
+    samples = _samples(_fragment(cp, size), size)
+    if not len(samples):
         return 0
-
-    return builtin_max(abs(sample) for sample in _get_samples(cp, size))
+    return builtin_max(abs(int(samples.min())), abs(int(samples.max()))) \
+        if np is not None else builtin_max(abs(builtin_min(samples)),
+                                           abs(builtin_max(samples)))
 
 
 def minmax(cp, size):
-    _check_params(len(cp), size)
-
-    max_sample, min_sample = 0, 0
-    for sample in _get_samples(cp, size):
-        max_sample = builtin_max(sample, max_sample)
-        min_sample = builtin_min(sample, min_sample)
-
-    return min_sample, max_sample
+    samples = _samples(_fragment(cp, size), size)
+    if not len(samples):
+        return 0x7FFFFFFF, -0x80000000
+    if np is not None:
+        return int(samples.min()), int(samples.max())
+    return builtin_min(samples), builtin_max(samples)
 
 
 def avg(cp, size):
-    _check_params(len(cp), size)
-    sample_count = _sample_count(cp, size)
-    if sample_count == 0:
+    samples = _samples(_fragment(cp, size), size)
+    if not len(samples):
         return 0
-    return sum(_get_samples(cp, size)) / sample_count
+    total = _np_sum(samples) if np is not None else sum(samples)
+    return int(math.floor(total / len(samples)))
 
 
 def rms(cp, size):
-    _check_params(len(cp), size)
-
-    sample_count = _sample_count(cp, size)
-    if sample_count == 0:
+    samples = _samples(_fragment(cp, size), size)
+    if not len(samples):
         return 0
+    if np is not None:
+        sum_squares = _np_sum_squares(samples)
+    else:
+        sum_squares = sum(val * val for val in samples)
+    return int(math.sqrt(sum_squares / len(samples)))
 
-    sum_squares = sum(sample**2 for sample in _get_samples(cp, size))
-    return int(math.sqrt(sum_squares / sample_count))
-
-
-def _sum2(cp1, cp2, length):
-    size = 2
-    total = 0
-    for i in range(length):
-        total += getsample(cp1, size, i) * getsample(cp2, size, i)
-    return total
 
+def _fdiv(x, y):
+    """
+    x / y as a C double division, which gives inf or nan rather than raising
+    """
+    if y:
+        return x / y
+    if not x or x != x:
+        return math.nan
+    return math.copysign(math.inf, x) * math.copysign(1.0, y)
 
-def findfit(cp1, cp2):
-    size = 2
 
-    if len(cp1) % 2 != 0 or len(cp2) % 2 != 0:
+def _even_fragment(cp):
+    cp = _buffer(cp)
+    if len(cp) & 1:
         raise error("Strings should be even-sized")
+    return cp
+
+
+def _dot(samples1, samples2):
+    if np is not None:
+        return int(np.dot(samples1.astype(np.int64), samples2.astype(np.int64)))
+    return sum(val1 * val2 for val1, val2 in zip(samples1, samples2))
+
+
+def _window_squares(samples, width):
+    """
+    the sum of the squares of each run of width samples
+    """
+    if np is not None:
+        wide = samples.astype(np.int64)
+        totals = np.concatenate([np.zeros(1, dtype=np.int64),
+                                 np.cumsum(wide * wide)])
+        return totals[width:] - totals[:len(totals) - width]
+    total = sum(val * val for val in samples[:width])
+    totals = [total]
+    for j in range(1, len(samples) - width + 1):
+        total += samples[j + width - 1] ** 2 - samples[j - 1] ** 2
+        totals.append(total)
+    return totals
+
+
+def _window_products(samples, reference):
+    """
+    the dot product of reference with each run of samples as long as it
+    """
+    width = len(reference)
+    if np is not None:
+        if not width:
+            return np.zeros(len(samples) + 1, dtype=np.int64)
+        return np.correlate(samples.astype(np.int64),
+                            reference.astype(np.int64), 'valid')
+    return [_dot(samples[j:j + width], reference)
+            for j in range(len(samples) - width + 1)]
+
 
+def findfit(cp1, cp2):
+    cp1 = _even_fragment(cp1)
+    cp2 = _even_fragment(cp2)
     if len(cp1) < len(cp2):
         raise error("First sample should be longer")
-
-    len1 = _sample_count(cp1, size)
-    len2 = _sample_count(cp2, size)
-
-    sum_ri_2 = _sum2(cp2, cp2, len2)
-    sum_aij_2 = _sum2(cp1, cp1, len2)
-    sum_aij_ri = _sum2(cp1, cp2, len2)
-
-    result = (sum_ri_2 * sum_aij_2 - sum_aij_ri * sum_aij_ri) / sum_aij_2
-
-    best_result = result
-    best_i = 0
-
-    for i in range(1, len1 - len2 + 1):
-        aj_m1 = _get_sample(cp1, size, i - 1)
-        aj_lm1 = _get_sample(cp1, size, i + len2 - 1)
-
-        sum_aij_2 += aj_lm1**2 - aj_m1**2
-        sum_aij_ri = _sum2(buffer(cp1)[i*size:], cp2, len2)
-
-        result = (sum_ri_2 * sum_aij_2 - sum_aij_ri * sum_aij_ri) / sum_aij_2
-
-        if result < best_result:
-            best_result = result
-            best_i = i
-
-    factor = _sum2(buffer(cp1)[best_i*size:], cp2, len2) / sum_ri_2
-
-    return best_i, factor
+    samples = _samples(cp1, 2)
+    reference = _samples(cp2, 2)
+
+    # the offset where reference, scaled to fit best, leaves the smallest
+    # squared error, computed in doubles like audioop
+    sum_ri_2 = float(_dot(reference, reference))
+    squares = _window_squares(samples, len(reference))
+    products = _window_products(samples, reference)
+    if np is not None:
+        squares = squares.astype(np.float64)
+        products = products.astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            results = (sum_ri_2 * squares - products * products) / squares
+        # a nan first result is never beaten
+        best = 0 if np.isnan(results[0]) else int(np.nanargmin(results))
+    else:
+        best = best_result = None
+        for j, (sum_aij_2, sum_aij_ri) in enumerate(zip(squares, products)):
+            sum_aij_2 = float(sum_aij_2)
+            sum_aij_ri = float(sum_aij_ri)
+            result = _fdiv(sum_ri_2 * sum_aij_2 - sum_aij_ri * sum_aij_ri,
+                           sum_aij_2)
+            if best is None or result < best_result:
+                best, best_result = j, result
+    return best, _fdiv(float(products[best]), sum_ri_2)
 
 
 def findfactor(cp1, cp2):
-    size = 2
-
-    if len(cp1) % 2 != 0:
-        raise error("Strings should be even-sized")
-
+    cp1 = _even_fragment(cp1)
+    cp2 = _even_fragment(cp2)
     if len(cp1) != len(cp2):
         raise error("Samples should be same size")
-
-    sample_count = _sample_count(cp1, size)
-
-    sum_ri_2 = _sum2(cp2, cp2, sample_count)
-    sum_aij_ri = _sum2(cp1, cp2, sample_count)
-
-    return sum_aij_ri / sum_ri_2
+    samples = _samples(cp1, 2)
+    reference = _samples(cp2, 2)
+    return _fdiv(float(_dot(samples, reference)),
+                 float(_dot(reference, reference)))
 
 
 def findmax(cp, len2):
-    size = 2
-    sample_count = _sample_count(cp, size)
-
-    if len(cp) % 2 != 0:
-        raise error("Strings should be even-sized")
-
-    if len2 < 0 or sample_count < len2:
+    samples = _samples(_even_fragment(cp), 2)
+    if len2 < 0 or len(samples) < len2:
         raise error("Input sample should be longer")
-
-    if sample_count == 0:
-        return 0
-
-    result = _sum2(cp, cp, len2)
-    best_result = result
-    best_i = 0
-
-    for i in range(1, sample_count - len2 + 1):
-        sample_leaving_window = getsample(cp, size, i - 1)
-        sample_entering_window = getsample(cp, size, i + len2 - 1)
-
-        result -= sample_leaving_window**2
-        result += sample_entering_window**2
-
-        if result > best_result:
-            best_result = result
-            best_i = i
-
-    return best_i
+    squares = _window_squares(samples, len2)
+    # the first of the loudest windows
+    if np is not None:
+        return int(np.argmax(squares))
+    return builtin_max(range(len(squares)), key=squares.__getitem__)
+
+
+def _extremes(samples):
+    """
+    the samples where the signal turns from rising to falling or back,
+    ignoring repeated samples
+    """
+    if np is not None:
+        wide = samples.astype(np.int64)
+        if len(wide):
+            wide = wide[np.concatenate([[True], wide[1:] != wide[:-1]])]
+        falling = wide[1:] < wide[:-1]
+        return wide[1:-1][falling[1:] != falling[:-1]]
+    extremes = []
+    if len(samples):
+        prevval = samples[0]
+        prevdiff = None
+        for val in samples:
+            if val != prevval:
+                diff = val < prevval
+                if prevdiff is not None and diff != prevdiff:
+                    extremes.append(prevval)
+                prevval, prevdiff = val, diff
+    return extremes
+
+
+def _peak_to_peak(cp, size):
+    """
+    the differences between successive extremes
+    """
+    extremes = _extremes(_samples(_fragment(cp, size), size))
+    if np is not None:
+        return np.abs(np.diff(extremes))
+    return [abs(val - prev) for prev, val in zip(extremes, extremes[1:])]
 
 
 def avgpp(cp, size):
-    _check_params(len(cp), size)
-    sample_count = _sample_count(cp, size)
-
-    prevextremevalid = False
-    prevextreme = None
-    avg = 0
-    nextreme = 0
-
-    prevval = getsample(cp, size, 0)
-    val = getsample(cp, size, 1)
-
-    prevdiff = val - prevval
-
-    for i in range(1, sample_count):
-        val = getsample(cp, size, i)
-        diff = val - prevval
-
-        if diff * prevdiff < 0:
-            if prevextremevalid:
-                avg += abs(prevval - prevextreme)
-                nextreme += 1
-
-            prevextremevalid = True
-            prevextreme = prevval
-
-        prevval = val
-        if diff != 0:
-            prevdiff = diff
-
-    if nextreme == 0:
+    diffs = _peak_to_peak(cp, size)
+    if not len(diffs):
         return 0
-
-    return avg / nextreme
+    total = _np_sum(diffs) if np is not None else sum(diffs)
+    return int(total / len(diffs))
 
 
 def maxpp(cp, size):
-    _check_params(len(cp), size)
-    sample_count = _sample_count(cp, size)
-
-    prevextremevalid = False
-    prevextreme = None
-    max = 0
-
-    prevval = getsample(cp, size, 0)
-    val = getsample(cp, size, 1)
-
-    prevdiff = val - prevval
-
-    for i in range(1, sample_count):
-        val = getsample(cp, size, i)
-        diff = val - prevval
-
-        if diff * prevdiff < 0:
-            if prevextremevalid:
-                extremediff = abs(prevval - prevextreme)
-                if extremediff > max:
-                    max = extremediff
-            prevextremevalid = True
-            prevextreme = prevval
-
-        prevval = val
-        if diff != 0:
-            prevdiff = diff
-
-    return max
+    diffs = _peak_to_peak(cp, size)
+    if not len(diffs):
+        return 0
+    return int(diffs.max()) if np is not None else builtin_max(diffs)
 
 
 def cross(cp, size):
-    _check_params(len(cp), size)
-
-    crossings = 0
-    last_sample = 0
-    for sample in _get_samples(cp, size):
-        if sample <= 0 < last_sample or sample >= 0 > last_sample:
-            crossings += 1
-        last_sample = sample
-
-    return crossings
+    samples = _samples(_fragment(cp, size), size)
+    if not len(samples):
+        return -1
+    # the number of times the sign bit changes
+    if np is not None:
+        negative = samples < 0
+        return int(np.count_nonzero(negative[1:] != negative[:-1]))
+    negative = [val < 0 for val in samples]
+    return sum(1 for prev, val in zip(negative, negative[1:]) if val != prev)
 
 
 def mul(cp, size, factor):
-    _check_params(len(cp), size)
-    clip = _get_clipfn(size)
-
-    result = create_string_buffer(len(cp))
-
-    for i, sample in enumerate(_get_samples(cp, size)):
-        sample = clip(int(sample * factor))
-        _put_sample(result, size, i, sample)
-
-    return result.raw
+    samples = _samples(_fragment(cp, size), size)
+    if np is not None:
+        return _np_pack(_np_mul(samples, size, factor), size).tobytes()
+    lo, hi = _bounds(size)
+    factor = float(factor)
+    return _array_pack([_fbound(val * factor, lo, hi) for val in samples],
+                       size)
 
 
 def tomono(cp, size, fac1, fac2):
-    _check_params(len(cp), size)
-    clip = _get_clipfn(size)
-
-    sample_count = _sample_count(cp, size)
-
-    result = create_string_buffer(len(cp) / 2)
-
-    for i in range(0, sample_count, 2):
-        l_sample = getsample(cp, size, i)
-        r_sample = getsample(cp, size, i + 1)
-
-        sample = (l_sample * fac1) + (r_sample * fac2)
-        sample = clip(sample)
-
-        _put_sample(result, size, i / 2, sample)
-
-    return result.raw
+    cp = _fragment(cp, size)
+    if (len(cp) // size) & 1:
+        raise error("not a whole number of frames")
+    samples = _samples(cp, size)
+    if np is not None:
+        return _np_pack(_np_tomono(samples, size, fac1, fac2), size).tobytes()
+    lo, hi = _bounds(size)
+    fac1, fac2 = float(fac1), float(fac2)
+    return _array_pack([_fbound(left * fac1 + right * fac2, lo, hi)
+                        for left, right in zip(samples[0::2], samples[1::2])],
+                       size)
 
 
 def tostereo(cp, size, fac1, fac2):
-    _check_params(len(cp), size)
-
-    sample_count = _sample_count(cp, size)
-
-    result = create_string_buffer(len(cp) * 2)
-    clip = _get_clipfn(size)
-
-    for i in range(sample_count):
-        sample = _get_sample(cp, size, i)
-
-        l_sample = clip(sample * fac1)
-        r_sample = clip(sample * fac2)
-
-        _put_sample(result, size, i * 2, l_sample)
-        _put_sample(result, size, i * 2 + 1, r_sample)
-
-    return result.raw
+    samples = _samples(_fragment(cp, size), size)
+    if np is not None:
+        return _np_pack(_np_tostereo(samples, size, fac1, fac2), size).tobytes()
+    lo, hi = _bounds(size)
+    fac1, fac2 = float(fac1), float(fac2)
+    stereo = array.array(_TYPECODES[4], bytes(8 * len(samples)))
+    stereo[0::2] = array.array(_TYPECODES[4],
+                               [_fbound(val * fac1, lo, hi) for val in samples])
+    stereo[1::2] = array.array(_TYPECODES[4],
+                               [_fbound(val * fac2, lo, hi) for val in samples])
+    return _array_pack(stereo, size)
 
 
 def add(cp1, cp2, size):
-    _check_params(len(cp1), size)
-
+    cp1 = _fragment(cp1, size)
+    cp2 = _buffer(cp2)
     if len(cp1) != len(cp2):
         raise error("Lengths should be the same")
-
-    clip = _get_clipfn(size)
-    sample_count = _sample_count(cp1, size)
-    result = create_string_buffer(len(cp1))
-
-    for i in range(sample_count):
-        sample1 = getsample(cp1, size, i)
-        sample2 = getsample(cp2, size, i)
-
-        sample = clip(sample1 + sample2)
-
-        _put_sample(result, size, i, sample)
-
-    return result.raw
+    samples1 = _samples(cp1, size)
+    samples2 = _samples(cp2, size)
+    if np is not None:
+        return _np_pack(_np_add(samples1, samples2, size), size).tobytes()
+    lo, hi = _bounds(size)
+    return _array_pack([builtin_min(builtin_max(val1 + val2, lo), hi)
+                        for val1, val2 in zip(samples1, samples2)], size)
 
 
 def bias(cp, size, bias):
-    _check_params(len(cp), size)
-
-    result = create_string_buffer(len(cp))
-
-    for i, sample in enumerate(_get_samples(cp, size)):
-        sample = _overflow(sample + bias, size)
-        _put_sample(result, size, i, sample)
-
-    return result.raw
+    if not -0x80000000 <= bias <= 0x7FFFFFFF:
+        raise OverflowError("Python int too large to convert to C int")
+    samples = _samples(_fragment(cp, size), size)
+    if np is not None:
+        return _np_pack(_np_bias(samples, size, bias), size).tobytes()
+    bits = 8 * size
+    mask = (1 << bits) - 1
+    half = 1 << (bits - 1)
+    offset = bias + half
+    return _array_pack([((val + offset) & mask) - half for val in samples],
+                       size)
 
 
 def reverse(cp, size):
-    _check_params(len(cp), size)
-    sample_count = _sample_count(cp, size)
-
-    result = create_string_buffer(len(cp))
-    for i, sample in enumerate(_get_samples(cp, size)):
-        _put_sample(result, size, sample_count - i - 1, sample)
-
-    return result.raw
+    samples = _samples(_fragment(cp, size), size)
+    if np is not None:
+        return _np_pack(samples[::-1], size).tobytes()
+    samples.reverse()
+    return _array_pack(samples, size)
 
 
 def lin2lin(cp, size, size2):
-    _check_params(len(cp), size)
+    samples = _samples(_fragment(cp, size), size)
     _check_size(size2)
-
-    if size == size2:
-        return cp
-
-    new_len = (len(cp) / size) * size2
-
-    result = create_string_buffer(new_len)
-
-    for i in range(_sample_count(cp, size)):
-        sample = _get_sample(cp, size, i)
-        if size < size2:
-            sample = sample << (4 * size2 / size)
-        elif size > size2:
-            sample = sample >> (4 * size / size2)
-
-        sample = _overflow(sample, size2)
-
-        _put_sample(result, size2, i, sample)
-
-    return result.raw
+    shift = 8 * (size2 - size)
+    if np is not None:
+        samples = samples.astype(np.int64)
+        samples = samples << shift if shift >= 0 else samples >> -shift
+        return _np_pack(samples, size2).tobytes()
+    if shift >= 0:
+        return _array_pack([val << shift for val in samples], size2)
+    return _array_pack([val >> -shift for val in samples], size2)
 
 
 def ratecv(cp, size, nchannels, inrate, outrate, state, weightA=1, weightB=0):
-    _check_params(len(cp), size)
+    """
+    Converts the frame rate like audioop.ratecv: linear interpolation between
+    consecutive input frames (after an optional one-pole filter set by the
+    weights), with the same carried-over state.
+
+    Output frame o is produced after c input frames have been read, where c
+    is the smallest count with d0 + c * outrate - o * inrate >= 0, so every
+    output frame can be computed independently of the others.
+    """
+    _check_size(size)
     if nchannels < 1:
         raise error("# of channels should be >= 1")
-
     bytes_per_frame = size * nchannels
-    frame_count = len(cp) / bytes_per_frame
-
-    if bytes_per_frame / nchannels != size:
-        raise OverflowError("width * nchannels too big for a C int")
-
     if weightA < 1 or weightB < 0:
         raise error("weightA should be >= 1, weightB should be >= 0")
-
+    cp = _buffer(cp)
     if len(cp) % bytes_per_frame != 0:
         raise error("not a whole number of frames")
-
     if inrate <= 0 or outrate <= 0:
         raise error("sampling rate not > 0")
 
-    d = gcd(inrate, outrate)
-    inrate /= d
-    outrate /= d
-
-    prev_i = [0] * nchannels
-    cur_i = [0] * nchannels
+    d = math.gcd(inrate, outrate)
+    inrate //= d
+    outrate //= d
+    d = math.gcd(weightA, weightB)
+    weightA //= d
+    weightB //= d
 
     if state is None:
-        d = -outrate
+        d0 = -outrate
+        prev_i = [0] * nchannels
+        cur_i = [0] * nchannels
     else:
-        d, samps = state
-
-        if len(samps) != nchannels:
+        if not isinstance(state, tuple):
+            raise TypeError("state must be a tuple or None")
+        try:
+            d0, samps = state
+            if len(samps) != nchannels:
+                raise ValueError
+            prev_i, cur_i = (list(values) for values in zip(*samps))
+        except (TypeError, ValueError):
             raise error("illegal state argument")
 
-        prev_i, cur_i = zip(*samps)
-        prev_i, cur_i = list(prev_i), list(cur_i)
-
-    q = frame_count / inrate
-    ceiling = (q + 1) * outrate
-    nbytes = ceiling * bytes_per_frame
-
-    result = create_string_buffer(nbytes)
-
-    samples = _get_samples(cp, size)
-    out_i = 0
-    while True:
-        while d < 0:
-            if frame_count == 0:
-                samps = zip(prev_i, cur_i)
-                retval = result.raw
-
-                # slice off extra bytes
-                trim_index = (out_i * bytes_per_frame) - len(retval)
-                retval = buffer(retval)[:trim_index]
-
-                return (retval, (d, tuple(samps)))
-
+    frame_count = len(cp) // bytes_per_frame
+    # samples are interpolated at 32 bit, like audioop
+    shift = 32 - 8 * size
+    if np is not None:
+        frames = _np_samples(cp, size).astype(np.int64) << shift
+    else:
+        frames = [val << shift for val in _array_samples(cp, size)]
+
+    if weightB:
+        # the filter depends on its previous output
+        filtered = []
+        prev = list(cur_i)
+        wa, wb, wsum = float(weightA), float(weightB), float(weightA + weightB)
+        for i in range(frame_count):
             for chan in range(nchannels):
-                prev_i[chan] = cur_i[chan]
-                cur_i[chan] = samples.next()
-
-                cur_i[chan] = (
-                    (weightA * cur_i[chan] + weightB * prev_i[chan])
-                    / (weightA + weightB)
-                )
-
-            frame_count -= 1
-            d += outrate
-
-        while d >= 0:
+                prev[chan] = int((wa * int(frames[i * nchannels + chan]) +
+                                  wb * prev[chan]) / wsum)
+                filtered.append(prev[chan])
+        frames = np.array(filtered, dtype=np.int64) if np is not None \
+            else filtered
+
+    # history[c] and history[c + 1] are the frames interpolated between after
+    # c input frames have been read; the first two come from the state
+    total = frame_count * outrate + d0
+    out_count = total // inrate + 1 if total >= 0 else 0
+
+    if np is not None:
+        history = np.concatenate([
+            np.array([prev_i, cur_i], dtype=np.int64),
+            frames.reshape(-1, nchannels),
+        ]).astype(np.float64)
+        out = np.empty((out_count, nchannels), dtype=np.int64)
+        for start in range(0, out_count, _BLOCK):
+            o = np.arange(start, builtin_min(start + _BLOCK, out_count),
+                          dtype=np.int64)
+            c = np.maximum(-((d0 - o * inrate) // outrate), 0)
+            weight = (d0 + c * outrate - o * inrate)[:, None].astype(np.float64)
+            block = (history[c] * weight +
+                     history[c + 1] * (outrate - weight)) / outrate
+            out[start:start + len(o)] = np.trunc(block)
+        converted = _np_pack(out >> shift, size).tobytes()
+        history = history.astype(np.int64)
+        last = history[-2:]
+    else:
+        history = [float(val) for val in prev_i + cur_i] + \
+            [float(val) for val in frames]
+        out = []
+        for o in range(out_count):
+            c = builtin_max(-((d0 - o * inrate) // outrate), 0)
+            weight = d0 + c * outrate - o * inrate
+            base = c * nchannels
             for chan in range(nchannels):
-                cur_o = (
-                    (prev_i[chan] * d + cur_i[chan] * (outrate - d))
-                    / outrate
-                )
-                _put_sample(result, size, out_i, _overflow(cur_o, size))
-                out_i += 1
-                d -= inrate
-
-
-def lin2ulaw(cp, size):
-    raise NotImplementedError()
-
-
-def ulaw2lin(cp, size):
-    raise NotImplementedError()
-
-
-def lin2alaw(cp, size):
-    raise NotImplementedError()
-
-
-def alaw2lin(cp, size):
-    raise NotImplementedError()
-
-
-def lin2adpcm(cp, size, state):
-    raise NotImplementedError()
+                out.append(int((history[base + chan] * weight +
+                                history[base + nchannels + chan] *
+                                (outrate - weight)) / outrate) >> shift)
+        converted = _array_pack(out, size)
+        last = [history[-2 * nchannels:-nchannels],
+                history[-nchannels:]]
 
+    samps = tuple((int(last[0][chan]), int(last[1][chan]))
+                  for chan in range(nchannels))
+    return converted, (total - out_count * inrate, samps)
 
-def adpcm2lin(cp, size, state):
-    raise NotImplementedError()
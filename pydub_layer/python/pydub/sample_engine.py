@@ -0,0 +1,612 @@
+"""
+Sample arithmetic on raw little-endian PCM data, behind interchangeable
+backends:
+
+- "numpy": vectorized operations on np.frombuffer views of the data. Chosen
+  automatically when NumPy can be imported.
+- "audioop": audioop calls and array slicing. Always available.
+
+Both backends give bit-identical results, with documented tolerances:
+
+- avg() adds up samples in an int64 under NumPy, where audioop adds them up
+  in a double. The double stops being exact once the sum passes 2 ** 53,
+  which takes over 4 million full-scale 32-bit samples, so on such data the
+  NumPy average can differ from audioop's in the last place (and is the
+  exact one).
+- ramp() changes the gain on every frame under NumPy. The audioop backend
+  does too for ramps of up to AudioopEngine.ramp_steps frames, and holds the
+  gain over runs of frames on longer ones, so the cost stays bounded.
+  The "equal_power" and "log" curves use NumPy's transcendental functions
+  rather than the math module's, which can round gains differently in the
+  last place.
+
+The backend can be forced with the PYDUB_SAMPLE_ENGINE environment variable
+("numpy" or "audioop") or with set_engine().
+
+Data arguments can be any bytes-like object. Results are bytes-like objects
+(bytes, bytearray or a uint8 ndarray that doesn't share memory with the
+arguments) that AudioSegment can wrap without copying.
+"""
+from __future__ import division
+
+import array
+import itertools
+from collections import namedtuple
+import math
+import operator
+import os
+
+from . import pyaudioop
+from .utils import audioop, get_array_type
+
+np = pyaudioop.np
+
+# gain curves of AudioSegment.fade and ramp()
+FADE_CURVES = ('linear', 'equal_power', 'log')
+
+
+def ramp_gain(curve, from_power, to_power, frame_count, i, m=math):
+    """
+    The gain at frame i (a number, or an ndarray with m=numpy) of a
+    frame_count frames long ramp from from_power towards to_power:
+
+    - "linear": amplitude changes linearly
+    - "equal_power": power follows sin/cos, so an equal power fade in and
+      fade out of the same length add up to constant power
+    - "log": linear in decibels (both powers must be above 0)
+    """
+    if curve == 'linear':
+        return from_power + ((to_power - from_power) / frame_count) * i
+    position = i / frame_count
+    if curve == 'equal_power':
+        angle = (math.pi / 2) * position
+        return m.sqrt((from_power * m.cos(angle)) ** 2 +
+                      (to_power * m.sin(angle)) ** 2)
+    if curve == 'log':
+        return from_power * (to_power / from_power) ** position
+    raise ValueError("Unknown fade curve {!r}, expected one of: {}"
+                     .format(curve, ", ".join(FADE_CURVES)))
+
+
+# the stages of envelope(): a gain of from_power up to frame start, a
+# ramp_gain curve from start to end and to_power from end on
+GainStage = namedtuple('GainStage', ['start', 'end', 'from_power', 'to_power',
+                                     'curve'])
+# an offset added to each channel's samples
+BiasStage = namedtuple('BiasStage', ['offsets'])
+
+
+# the low byte of a widened 24-bit sample: the sign extension of its high byte
+_SIGN_PADDING = bytes(0xFF if b > 0x7F else 0x00 for b in range(256))
+
+
+class AudioopEngine(object):
+    """
+    Sample operations on top of audioop, which handles sample widths 1 to 4.
+    """
+    name = 'audioop'
+
+    def mul(self, data, sample_width, factor):
+        return audioop.mul(data, sample_width, factor)
+
+    def add(self, data1, data2, sample_width):
+        return audioop.add(data1, data2, sample_width)
+
+    def bias(self, data, sample_width, bias):
+        return audioop.bias(data, sample_width, bias)
+
+    def avg(self, data, sample_width):
+        return audioop.avg(data, sample_width)
+
+    def tomono(self, data, sample_width, lfactor, rfactor):
+        return audioop.tomono(data, sample_width, lfactor, rfactor)
+
+    def tostereo(self, data, sample_width, lfactor, rfactor):
+        return audioop.tostereo(data, sample_width, lfactor, rfactor)
+
+    def mix(self, layers, sample_width):
+        """
+        adds up equally long (data, factor) layers, each multiplied by its
+        factor like mul() first. The sum is kept wider than the sample width
+        and clipped once, at the end.
+        """
+        layers = [data if factor == 1 else self.mul(data, sample_width, factor)
+                  for data, factor in layers]
+        if len(layers) == 2:
+            # a single add only clips once
+            return self.add(layers[0], layers[1], sample_width)
+        if sample_width <= 2 and len(layers) <= 1 << 8:
+            # 4-byte samples with 8 bits of headroom, so audioop.add won't
+            # clip before the end
+            total = None
+            for data in layers:
+                wide = audioop.mul(audioop.lin2lin(data, sample_width, 4), 4,
+                                   1.0 / (1 << 8))
+                total = wide if total is None else audioop.add(total, wide, 4)
+            return audioop.lin2lin(audioop.mul(total, 4, 1 << 8), 4,
+                                   sample_width)
+
+        lo, hi = pyaudioop._bounds(sample_width)
+        total = map(sum, zip(*[self._array(data, sample_width)
+                               for data in layers]))
+        mixed = self._array(b'', sample_width)
+        mixed.extend(map(max, map(min, total, itertools.repeat(hi)),
+                         itertools.repeat(lo)))
+        return self._tobytes(mixed, sample_width)
+
+    # ramp() holds the gain over runs of frames so that it makes at most this
+    # many audioop calls
+    ramp_steps = 4096
+
+    def ramp(self, data, sample_width, channels, from_power, to_power,
+             curve='linear', ramp_frames=None):
+        """
+        multiplies each frame by the gain of a ramp_gain curve, from
+        from_power at the first frame towards to_power after ramp_frames
+        frames (default: the end of data)
+        """
+        data = memoryview(data)
+        frame_width = sample_width * channels
+        frame_count = len(data) // frame_width
+        ramp_frames = ramp_frames or frame_count
+        step = max(1, -(-ramp_frames // self.ramp_steps))
+        output = []
+        for i in range(0, frame_count, step):
+            gain = ramp_gain(curve, from_power, to_power, ramp_frames, i)
+            output.append(audioop.mul(data[i * frame_width:(i + step) * frame_width],
+                                      sample_width, gain))
+        return b''.join(output)
+
+    def envelope(self, data, sample_width, channels, stages):
+        """
+        applies a chain of GainStage and BiasStage stages in order: the
+        result of each is clipped and floored (or, for biases, wrapped
+        around) like mul() and bias(). audioop has nothing to fuse them into,
+        so each stage is a pass of its own.
+        """
+        frame_width = sample_width * channels
+        for stage in stages:
+            if isinstance(stage, BiasStage):
+                data = self._bias_channels(data, sample_width, channels,
+                                           stage.offsets)
+                continue
+            data = memoryview(data)
+            start = stage.start * frame_width
+            end = max(stage.end * frame_width, start)
+            output = [data[:start], data[start:end], data[end:]]
+            if stage.from_power != 1:
+                output[0] = self.mul(output[0], sample_width, stage.from_power)
+            if end > start:
+                output[1] = self.ramp(output[1], sample_width, channels,
+                                      stage.from_power, stage.to_power,
+                                      stage.curve, stage.end - stage.start)
+            if stage.to_power != 1:
+                output[2] = self.mul(output[2], sample_width, stage.to_power)
+            data = b''.join(output)
+        return data
+
+    def _bias_channels(self, data, sample_width, channels, offsets):
+        if len(set(offsets)) == 1:
+            return self.bias(data, sample_width, offsets[0])
+        return self.interleave(
+            [self.bias(channel_data, sample_width, offset) for channel_data, offset
+             in zip(self.deinterleave(data, sample_width, channels), offsets)],
+            sample_width)
+
+    def widen_24bit(self, data):
+        """
+        Converts packed 24-bit samples to 32-bit ones: each sample's 3 bytes
+        become the upper 3 bytes and the low byte is filled with the sign
+        bit. Done with strided byte copies rather than sample by sample.
+        """
+        sample_count = len(data) // 3
+        data = bytes(data[:sample_count * 3])
+        high = data[2::3]
+        wide = bytearray(sample_count * 4)
+        wide[0::4] = high.translate(_SIGN_PADDING)
+        wide[1::4] = data[0::3]
+        wide[2::4] = data[1::3]
+        wide[3::4] = high
+        return wide
+
+    def unpack_24bit(self, data):
+        """
+        Converts packed 24-bit samples to 32-bit ones of the same value: each
+        sample's 3 bytes become the lower 3 bytes and the high byte is filled
+        with the sign bit.
+        """
+        sample_count = len(data) // 3
+        data = bytes(data[:sample_count * 3])
+        wide = bytearray(sample_count * 4)
+        wide[0::4] = data[0::3]
+        wide[1::4] = data[1::3]
+        wide[2::4] = data[2::3]
+        wide[3::4] = data[2::3].translate(_SIGN_PADDING)
+        return wide
+
+    def pack_24bit(self, data):
+        """
+        The inverse of unpack_24bit(): keeps the lower 3 bytes of each 32-bit
+        sample (any bytes-like object, e.g. an array of 'i' samples)
+        """
+        data = bytes(memoryview(data).cast('B'))
+        sample_count = len(data) // 4
+        packed = bytearray(sample_count * 3)
+        packed[0::3] = data[0::4]
+        packed[1::3] = data[1::4]
+        packed[2::3] = data[2::4]
+        return packed
+
+    def _array(self, data, sample_width):
+        samples = array.array(get_array_type(sample_width * 8))
+        if sample_width == 3:
+            data = self.unpack_24bit(data)
+        samples.frombytes(data)
+        return samples
+
+    def _tobytes(self, samples, sample_width):
+        if sample_width == 3:
+            return bytes(self.pack_24bit(samples))
+        return samples.tobytes()
+
+    def _channel(self, data, sample_width, channels, index):
+        frame_width = sample_width * channels
+        if sample_width == 1:
+            return data[index::frame_width]
+        channel = bytearray(len(data) // frame_width * sample_width)
+        for b in range(sample_width):
+            channel[b::sample_width] = data[index * sample_width + b::frame_width]
+        return channel
+
+    def get_channel(self, data, sample_width, channels, index):
+        """
+        returns the samples of one channel (0 based) of interleaved data
+        """
+        return self._channel(bytes(data), sample_width, channels, index)
+
+    def deinterleave(self, data, sample_width, channels):
+        """
+        returns the samples of each channel of interleaved data: the bytes
+        are moved from frame major to channel major order with one strided
+        copy per byte of a sample, so samples are never unpacked
+        """
+        data = bytes(data)
+        return [self._channel(data, sample_width, channels, i)
+                for i in range(channels)]
+
+    def interleave(self, channels_data, sample_width):
+        """
+        The inverse of deinterleave(): interleaves the samples of each
+        channel, padding the shorter channels with silence
+        """
+        channels = len(channels_data)
+        frame_width = sample_width * channels
+        frame_count = max(len(data) for data in channels_data) // sample_width
+        interleaved = bytearray(frame_count * frame_width)
+        for i, data in enumerate(channels_data):
+            data = bytes(data)
+            stop = len(data) // sample_width * frame_width
+            for b in range(sample_width):
+                interleaved[i * sample_width + b:stop:frame_width] = \
+                    data[b::sample_width]
+        return interleaved
+
+    def downmix(self, data, sample_width, channels):
+        """
+        mixes interleaved channels down to mono, adding up each channel's
+        samples floor-divided by the channel count
+        """
+        channels_samples = [
+            map(operator.floordiv, self._array(channel, sample_width),
+                itertools.repeat(channels))
+            for channel in self.deinterleave(data, sample_width, channels)
+        ]
+        converted = self._array(b'', sample_width)
+        converted.extend(map(sum, zip(*channels_samples)))
+        return self._tobytes(converted, sample_width)
+
+    def remix(self, data, sample_width, matrix):
+        """
+        mixes interleaved channels through a gain matrix, with a row per
+        output channel and a gain per input channel in each row. Like
+        tomono(), each output sample is the sum of the products in double
+        precision, clipped and floored.
+        """
+        in_channels = len(matrix[0])
+        if in_channels == 1:
+            channels_data = [data]
+        else:
+            channels_data = self.deinterleave(data, sample_width, in_channels)
+        output = []
+        for row in matrix:
+            # zero gains don't change the sum, so their channels are skipped
+            terms = [(gain, channel_data) for gain, channel_data
+                     in zip(row, channels_data) if gain]
+            if not terms:
+                output.append(bytes(len(channels_data[0])))
+            elif len(terms) == 1:
+                gain, channel_data = terms[0]
+                output.append(audioop.mul(channel_data, sample_width, gain))
+            elif len(terms) == 2:
+                (gain1, data1), (gain2, data2) = terms
+                output.append(audioop.tomono(
+                    self.interleave([data1, data2], sample_width),
+                    sample_width, gain1, gain2))
+            else:
+                output.append(self._sum_products(terms, sample_width))
+        if len(output) == 1:
+            return output[0]
+        return self.interleave(output, sample_width)
+
+    def _sum_products(self, terms, sample_width):
+        # audioop has no call that sums more than two channels, so the
+        # products are added up through map(), which loops in C
+        total = None
+        for gain, channel_data in terms:
+            products = map(operator.mul, self._array(channel_data, sample_width),
+                           itertools.repeat(gain))
+            total = products if total is None else \
+                map(operator.add, total, products)
+        lo, hi = pyaudioop._bounds(sample_width)
+        clipped = map(max, map(min, total, itertools.repeat(hi)),
+                      itertools.repeat(lo))
+        mixed = self._array(b'', sample_width)
+        mixed.extend(map(math.floor, clipped))
+        return self._tobytes(mixed, sample_width)
+
+
+if np is not None:
+    _SAMPLE_DTYPES = {1: np.uint8, 2: np.uint16, 3: np.dtype('V3'),
+                      4: np.uint32}
+
+
+class NumpyEngine(AudioopEngine):
+    """
+    Vectorized sample operations, on the NumPy kernels of pyaudioop.
+
+    Like audioop, products are computed in double precision, clipped to the
+    sample range and floored.
+    """
+    name = 'numpy'
+
+    def _samples(self, data, sample_width):
+        return pyaudioop._np_samples(data, sample_width)
+
+    def _pack(self, samples, sample_width):
+        return pyaudioop._np_pack(samples, sample_width)
+
+    def mul(self, data, sample_width, factor):
+        samples = self._samples(data, sample_width)
+        return self._pack(pyaudioop._np_mul(samples, sample_width, factor),
+                          sample_width)
+
+    def add(self, data1, data2, sample_width):
+        samples1 = self._samples(data1, sample_width)
+        samples2 = self._samples(data2, sample_width)
+        if len(samples1) != len(samples2):
+            raise audioop.error("Lengths should be the same")
+        return self._pack(pyaudioop._np_add(samples1, samples2, sample_width),
+                          sample_width)
+
+    def bias(self, data, sample_width, bias):
+        samples = self._samples(data, sample_width)
+        return self._pack(pyaudioop._np_bias(samples, sample_width, bias),
+                          sample_width)
+
+    def avg(self, data, sample_width):
+        samples = self._samples(data, sample_width)
+        if not len(samples):
+            return 0
+        return int(math.floor(pyaudioop._np_sum(samples) / len(samples)))
+
+    def tomono(self, data, sample_width, lfactor, rfactor):
+        samples = self._samples(data, sample_width)
+        return self._pack(pyaudioop._np_tomono(samples, sample_width,
+                                               lfactor, rfactor),
+                          sample_width)
+
+    def tostereo(self, data, sample_width, lfactor, rfactor):
+        samples = self._samples(data, sample_width)
+        return self._pack(pyaudioop._np_tostereo(samples, sample_width,
+                                                 lfactor, rfactor),
+                          sample_width)
+
+    def mix(self, layers, sample_width):
+        if len(layers) == 2:
+            return super(NumpyEngine, self).mix(layers, sample_width)
+        layers = [(self._samples(data, sample_width), factor)
+                  for data, factor in layers]
+        out = np.empty_like(layers[0][0])
+        lo, hi = pyaudioop._bounds(sample_width)
+        total = np.empty(min(len(out), pyaudioop._BLOCK), dtype=np.int64)
+        for start in range(0, len(out), pyaudioop._BLOCK):
+            stop = min(start + pyaudioop._BLOCK, len(out))
+            block = total[:stop - start]
+            block[:] = 0
+            for samples, factor in layers:
+                samples = samples[start:stop]
+                if factor != 1:
+                    samples = pyaudioop._np_mul(samples, sample_width, factor)
+                block += samples
+            np.clip(block, lo, hi, out=block)
+            out[start:stop] = block
+        return self._pack(out, sample_width)
+
+    def ramp(self, data, sample_width, channels, from_power, to_power,
+             curve='linear', ramp_frames=None):
+        frames = self._samples(data, sample_width).reshape(-1, channels)
+        ramp_frames = ramp_frames or len(frames)
+        out = np.empty_like(frames)
+        lo, hi = pyaudioop._bounds(sample_width)
+        for start in range(0, len(frames), pyaudioop._BLOCK):
+            stop = min(start + pyaudioop._BLOCK, len(frames))
+            gain = ramp_gain(curve, from_power, to_power, ramp_frames,
+                             np.arange(start, stop, dtype=np.float64), np)
+            block = frames[start:stop] * gain[:, None]
+            np.clip(block, lo, hi, out=block)
+            np.floor(block, out=block)
+            out[start:stop] = block
+        return self._pack(out, sample_width)
+
+    def envelope(self, data, sample_width, channels, stages):
+        # the gain stages between two offsets fold into one per-frame gain, so
+        # the samples are read, scaled and rounded once per run of gains; the
+        # offsets are added to the rounded integers and wrap around like bias()
+        frames = self._samples(data, sample_width).reshape(-1, channels)
+        out = np.empty_like(frames)
+        lo, hi = pyaudioop._bounds(sample_width)
+        modulus = 1 << (8 * sample_width)
+        for start in range(0, len(frames), pyaudioop._BLOCK):
+            stop = min(start + pyaudioop._BLOCK, len(frames))
+            size = stop - start
+            block = frames[start:stop]
+            # a scalar, until a ramp falls in this block
+            gain = 1.0
+            for stage in stages:
+                if isinstance(stage, BiasStage):
+                    block = self._envelope_round(block, gain, lo, hi)
+                    block = block.astype(np.int64) + np.array(stage.offsets,
+                                                              dtype=np.int64)
+                    block -= lo
+                    np.mod(block, modulus, out=block)
+                    block += lo
+                    gain = 1.0
+                    continue
+                ramp_start = min(max(stage.start - start, 0), size)
+                ramp_end = min(max(stage.end - start, ramp_start), size)
+                if ramp_start == size:
+                    stage_gain = stage.from_power
+                elif ramp_end == 0:
+                    stage_gain = stage.to_power
+                else:
+                    stage_gain = np.empty((size, 1))
+                    stage_gain[:ramp_start] = stage.from_power
+                    stage_gain[ramp_start:ramp_end, 0] = ramp_gain(
+                        stage.curve, stage.from_power, stage.to_power,
+                        stage.end - stage.start,
+                        np.arange(start + ramp_start - stage.start,
+                                  start + ramp_end - stage.start,
+                                  dtype=np.float64), np)
+                    stage_gain[ramp_end:] = stage.to_power
+                gain = gain * stage_gain
+            out[start:stop] = self._envelope_round(block, gain, lo, hi)
+        return self._pack(out, sample_width)
+
+    @staticmethod
+    def _envelope_round(block, gain, lo, hi):
+        if np.isscalar(gain) and gain == 1.0:
+            return block
+        block = block * gain
+        np.clip(block, lo, hi, out=block)
+        np.floor(block, out=block)
+        return block
+
+    def widen_24bit(self, data):
+        packed = np.frombuffer(data, dtype=np.uint8)
+        packed = packed[:len(packed) // 3 * 3].reshape(-1, 3)
+        wide = np.empty((len(packed), 4), dtype=np.uint8)
+        wide[:, 1:] = packed
+        np.multiply(packed[:, 2] >> 7, 0xFF, out=wide[:, 0])
+        return wide.reshape(-1)
+
+    def unpack_24bit(self, data):
+        packed = np.frombuffer(data, dtype=np.uint8)
+        packed = packed[:len(packed) // 3 * 3].reshape(-1, 3)
+        wide = np.empty((len(packed), 4), dtype=np.uint8)
+        wide[:, :3] = packed
+        np.multiply(packed[:, 2] >> 7, 0xFF, out=wide[:, 3])
+        return wide.reshape(-1)
+
+    def pack_24bit(self, data):
+        wide = np.frombuffer(data, dtype=np.uint8)
+        wide = wide[:len(wide) // 4 * 4].reshape(-1, 4)
+        return wide[:, :3].reshape(-1)
+
+    def _frames(self, data, sample_width, channels):
+        # a (frame, channel) view of the data, with one opaque element per
+        # sample: channels are only moved around, never converted
+        return np.frombuffer(data, dtype=_SAMPLE_DTYPES[sample_width]) \
+            .reshape(-1, channels)
+
+    def get_channel(self, data, sample_width, channels, index):
+        frames = self._frames(data, sample_width, channels)
+        return np.ascontiguousarray(frames[:, index]).view(np.uint8)
+
+    def deinterleave(self, data, sample_width, channels):
+        # a single copy into channel major order
+        channel_major = np.ascontiguousarray(
+            self._frames(data, sample_width, channels).T)
+        return [channel.view(np.uint8) for channel in channel_major]
+
+    def interleave(self, channels_data, sample_width):
+        dtype = _SAMPLE_DTYPES[sample_width]
+        channels_samples = [np.frombuffer(data, dtype=dtype)
+                            for data in channels_data]
+        frame_count = max(len(samples) for samples in channels_samples)
+        frames = np.zeros((frame_count, len(channels_samples)), dtype=dtype)
+        for i, samples in enumerate(channels_samples):
+            frames[:len(samples), i] = samples
+        return frames.view(np.uint8).reshape(-1)
+
+    def downmix(self, data, sample_width, channels):
+        frames = self._samples(data, sample_width).reshape(-1, channels)
+        # each term is floor-divided first, so the sum can't overflow
+        converted = (frames // channels).sum(axis=1, dtype=np.int64)
+        return self._pack(converted, sample_width)
+
+    def remix(self, data, sample_width, matrix):
+        frames = self._samples(data, sample_width).reshape(-1, len(matrix[0]))
+        out = np.empty((len(frames), len(matrix)), dtype=frames.dtype)
+        lo, hi = pyaudioop._bounds(sample_width)
+        for start in range(0, len(frames), pyaudioop._BLOCK):
+            block = frames[start:start + pyaudioop._BLOCK].astype(np.float64)
+            for o, row in enumerate(matrix):
+                mixed = np.zeros(len(block))
+                for i, gain in enumerate(row):
+                    if gain:
+                        mixed += block[:, i] * gain
+                np.clip(mixed, lo, hi, out=mixed)
+                np.floor(mixed, out=mixed)
+                out[start:start + len(block), o] = mixed
+        return self._pack(out, sample_width)
+
+
+_ENGINES = {
+    'audioop': AudioopEngine,
+    'numpy': NumpyEngine,
+}
+
+_engine = None
+
+
+def available_engines():
+    """
+    returns the names of the backends that can be used here
+    """
+    return [name for name in _ENGINES if name != 'numpy' or np is not None]
+
+
+def set_engine(name=None):
+    """
+    Selects the backend by name ("numpy" or "audioop"). None picks NumPy
+    when it can be imported, unless the PYDUB_SAMPLE_ENGINE environment
+    variable names a backend.
+    """
+    global _engine
+    if name is None:
+        name = os.environ.get('PYDUB_SAMPLE_ENGINE') or \
+            ('numpy' if np is not None else 'audioop')
+    if name not in _ENGINES:
+        raise ValueError("Unknown sample engine {!r}, expected one of: {}"
+                         .format(name, ", ".join(sorted(_ENGINES))))
+    if name == 'numpy' and np is None:
+        raise ImportError("The numpy sample engine requires numpy")
+    _engine = _ENGINES[name]()
+    return _engine
+
+
+def get_engine():
+    """
+    returns the backend in use, selecting it on first use
+    """
+    return _engine or set_engine()
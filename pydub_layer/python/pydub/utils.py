@@ -13,7 +13,7 @@ from functools import wraps
 try:
     import audioop
 except ImportError:
-    import pyaudioop as audioop
+    from . import pyaudioop as audioop
 
 if sys.version_info >= (3, 0):
     basestring = str
@@ -21,16 +21,19 @@ if sys.version_info >= (3, 0):
 FRAME_WIDTHS = {
     8: 1,
     16: 2,
+    24: 3,
     32: 4,
 }
 ARRAY_TYPES = {
     8: "b",
     16: "h",
+    24: "i",
     32: "i",
 }
 ARRAY_RANGES = {
     8: (-0x80, 0x7F),
     16: (-0x8000, 0x7FFF),
+    24: (-0x800000, 0x7FFFFF),
     32: (-0x80000000, 0x7FFFFFFF),
 }
 
@@ -0,0 +1,30 @@
+import array
+import os
+import sys
+
+import pytest
+
+# The pydub layer is mounted at /opt/python in Lambda; mirror that for tests.
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "pydub_layer", "python"),
+)
+# The functions are the Lambda task root, where they import each other by name.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "functions"))
+
+from pydub import sample_engine  # noqa: E402
+from pydub.audio_segment import AudioSegment  # noqa: E402
+
+
+def make_segment(samples, channels=1, sample_width=2, frame_rate=1000):
+    data = array.array("h" if sample_width == 2 else "i", samples).tobytes()
+    return AudioSegment(
+        data, sample_width=sample_width, channels=channels, frame_rate=frame_rate
+    )
+
+
+@pytest.fixture(params=sample_engine.available_engines())
+def engine(request):
+    sample_engine.set_engine(request.param)
+    yield request.param
+    sample_engine.set_engine()
@@ -0,0 +1,136 @@
+import pytest
+
+import allowlist
+from allowlist import AllowlistLoader, SenderAllowlist
+
+
+def test_exact_addresses_ignore_case_and_whitespace():
+    senders = SenderAllowlist.from_text(" Jane@Example.com ,bob@example.org")
+    assert senders.allows("jane@example.com")
+    assert senders.allows("  JANE@EXAMPLE.COM ")
+    assert senders.allows("bob@example.org")
+    assert not senders.allows("john@example.com")
+    assert not senders.allows("example.com")
+
+
+def test_domain_wildcards():
+    senders = SenderAllowlist.from_entries(["*@example.com", "*@*.corp.org"])
+    assert senders.allows("anyone@example.com")
+    assert senders.allows("Anyone@EXAMPLE.com")
+    # "*@domain" is only that domain
+    assert not senders.allows("anyone@mail.example.com")
+    # "*@*.domain" is every subdomain, but not the domain itself
+    assert senders.allows("anyone@mail.corp.org")
+    assert senders.allows("anyone@a.b.corp.org")
+    assert not senders.allows("anyone@corp.org")
+    assert not senders.allows("anyone@notcorp.org")
+
+
+def test_comments_and_blank_lines():
+    senders = SenderAllowlist.from_text(
+        "# team\n"
+        "\n"
+        "jane@example.com  # Jane\n"
+        "   \n"
+        "#bob@example.com\n"
+        "*@example.org,\n"
+    )
+    assert len(senders) == 2
+    assert senders.allows("jane@example.com")
+    assert senders.allows("bob@example.org")
+    assert not senders.allows("bob@example.com")
+
+
+class FakeS3:
+    def __init__(self, text, etag="v1"):
+        self.text = text
+        self.etag = etag
+        self.calls = []
+        self.error = None
+
+    def __call__(self, bucket, key, etag):
+        self.calls.append((bucket, key, etag))
+        if self.error is not None:
+            raise self.error
+        if etag == self.etag:
+            # 304 Not Modified
+            return None, etag
+        return self.text, self.etag
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(allowlist.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture()
+def s3(monkeypatch):
+    fake = FakeS3("jane@example.com\n")
+    monkeypatch.setattr(allowlist, "get_file_content_if_modified", fake)
+    monkeypatch.setenv("WHITELIST", "bob@example.com")
+    monkeypatch.setenv("WHITELIST_S3_URI", "s3://config/allowlist.txt")
+    monkeypatch.setenv("WHITELIST_TTL_SECONDS", "60")
+    return fake
+
+
+def test_loader_combines_environment_and_s3(s3, clock):
+    senders = AllowlistLoader().get()
+    assert senders.allows("bob@example.com")
+    assert senders.allows("jane@example.com")
+    assert s3.calls == [("config", "allowlist.txt", None)]
+
+
+def test_loader_refreshes_after_the_ttl(s3, clock):
+    loader = AllowlistLoader()
+    first = loader.get()
+
+    clock[0] += 59
+    assert loader.get() is first
+    assert len(s3.calls) == 1
+
+    # unchanged: fetched with the ETag, and the same allowlist is kept
+    clock[0] += 2
+    assert loader.get() is first
+    assert s3.calls[-1] == ("config", "allowlist.txt", "v1")
+
+    s3.text, s3.etag = "john@example.com\n", "v2"
+    clock[0] += 61
+    senders = loader.get()
+    assert senders.allows("john@example.com")
+    assert not senders.allows("jane@example.com")
+    assert senders.allows("bob@example.com")
+
+
+def test_loader_keeps_the_current_list_when_a_refresh_fails(s3, clock):
+    loader = AllowlistLoader()
+    first = loader.get()
+
+    s3.error = RuntimeError("S3 is down")
+    clock[0] += 61
+    assert loader.get() is first
+    # and doesn't retry until the next TTL
+    assert loader.get() is first
+    assert len(s3.calls) == 2
+
+
+def test_loader_fails_without_a_list(s3, clock):
+    s3.error = RuntimeError("S3 is down")
+    with pytest.raises(RuntimeError):
+        AllowlistLoader().get()
+
+
+def test_loader_without_s3_loads_once(monkeypatch, clock):
+    def fail(*args):
+        raise AssertionError("S3 isn't configured")
+
+    monkeypatch.setattr(allowlist, "get_file_content_if_modified", fail)
+    monkeypatch.setenv("WHITELIST", "bob@example.com,*@example.org")
+    monkeypatch.delenv("WHITELIST_S3_URI", raising=False)
+
+    loader = AllowlistLoader()
+    first = loader.get()
+    assert len(first) == 2
+    clock[0] += 10 ** 6
+    assert loader.get() is first
@@ -0,0 +1,65 @@
+import pytest
+
+from pydub.audio_buffer import AudioBuffer
+from pydub.audio_segment import AudioSegment
+
+from .conftest import make_segment
+
+
+def test_append_and_write(engine):
+    a = make_segment([1, 2, 3])
+    b = make_segment([4, 5])
+
+    buf = AudioBuffer(sample_width=2, frame_rate=1000).append(a).append(b)
+    assert buf.freeze() == a + b
+
+    buf.write(b, position=1)
+    assert list(buf.freeze().get_array_of_samples()) == [1, 4, 5, 4, 5]
+
+    # past the end, with silence in between
+    buf.write(a, position=7)
+    assert len(buf) == 10
+    assert list(buf.freeze().get_array_of_samples()) == [1, 4, 5, 4, 5, 0, 0, 1, 2, 3]
+
+
+def test_mix_and_gain_in_place(engine):
+    base = make_segment([1000] * 6)
+    blip = make_segment([100, 200, 300])
+
+    buf = AudioBuffer.from_segment(base).mix(blip, position=4, gain=6.0206)
+    assert list(buf.freeze().get_array_of_samples()) == \
+        [1000, 1000, 1000, 1000, 1200, 1400, 600]
+
+    buf.apply_gain(-6.0206, start=1, end=3)
+    assert list(buf.freeze().get_array_of_samples()) == \
+        [1000, 499, 499, 1000, 1200, 1400, 600]
+
+
+def test_segments_are_converted(engine):
+    buf = AudioBuffer(sample_width=2, frame_rate=1000, channels=2)
+    buf.append(make_segment([7, 8]))
+    assert list(buf.freeze().get_array_of_samples()) == [7, 7, 8, 8]
+
+
+def test_freeze_shares_until_the_next_change(engine):
+    buf = AudioBuffer(sample_width=2, frame_rate=1000, reserve=100)
+    buf.append(make_segment([1, 2, 3]))
+
+    frozen = buf.freeze()
+    assert frozen._buffer.obj is buf._store
+
+    buf.apply_gain(6).append(make_segment([4]))
+    assert list(frozen.get_array_of_samples()) == [1, 2, 3]
+    assert len(buf) == 4
+
+
+def test_24bit_needs_packed_segments(engine, monkeypatch):
+    with pytest.raises(ValueError):
+        AudioBuffer(sample_width=3, frame_rate=1000)
+
+    monkeypatch.setattr(AudioSegment, "packed_24bit", True)
+    buf = AudioBuffer(sample_width=3, frame_rate=1000)
+    buf.append(make_segment([1, -2, 3]))
+    frozen = buf.freeze()
+    assert (frozen.sample_width, len(frozen.raw_data)) == (3, 9)
+    assert frozen.set_sample_width(2).get_array_of_samples().tolist() == [1, -2, 3]
@@ -0,0 +1,86 @@
+import io
+import os
+
+import pytest
+
+from pydub import audio_encoder
+from pydub.audio_encoder import AudioEncoder
+from pydub.exceptions import CouldntEncodeError, InvalidTag
+
+from .conftest import make_segment
+
+
+def test_raw_output_is_written_as_it_comes():
+    mono = make_segment([1, 2, 3])
+    stereo = make_segment([4, 5, 6, 7], channels=2)
+
+    out = io.BytesIO()
+    with AudioEncoder(out, format="raw") as encoder:
+        encoder.write(mono)
+        assert out.getvalue() == mono.raw_data
+        encoder.write(stereo)
+    # in the format of the first segment
+    assert out.getvalue() == mono.raw_data + stereo.set_channels(1).raw_data
+
+    chunks = []
+    with AudioEncoder(chunks.append, format="raw", channels=2) as encoder:
+        encoder.write(mono)
+    assert chunks == [mono.set_channels(2).raw_data]
+
+    with pytest.raises(ValueError):
+        encoder.write(mono)
+
+
+def test_options_are_checked_up_front():
+    with pytest.raises(InvalidTag):
+        AudioEncoder(io.BytesIO(), format="mp3", tags="title")
+    with pytest.raises(AttributeError):
+        AudioEncoder(io.BytesIO(), format="raw", codec="pcm_s16le")
+
+
+def test_export_pipes_unless_the_format_needs_seeking(monkeypatch, tmp_path):
+    targets = []
+
+    class FakeEncoder(AudioEncoder):
+        def write(self, seg):
+            targets.append(self._path or self._out_f)
+            self._emit(b"encoded")
+            return self
+
+        def close(self):
+            self.closed = True
+
+        def _emit(self, data):
+            if self._path:
+                with open(self._path, "wb") as f:
+                    f.write(data)
+            else:
+                super(FakeEncoder, self)._emit(data)
+
+    monkeypatch.setattr(audio_encoder, "AudioEncoder", FakeEncoder)
+    seg = make_segment([1, 2, 3])
+
+    out = io.BytesIO()
+    assert seg.export(out, format="ogg").read() == b"encoded"
+    assert targets.pop() is out
+
+    # through a temporary file, which is removed afterwards
+    assert seg.export(io.BytesIO(), format="mp4").read() == b"encoded"
+    temp_path = targets.pop()
+    assert isinstance(temp_path, str) and not os.path.exists(temp_path)
+
+    # written by the encoder, and read back through the returned file
+    path = str(tmp_path / "out.mp3")
+    with seg.export(path, format="mp3") as f:
+        assert f.read() == b"encoded"
+    assert targets.pop() == path
+
+    # and isn't created by export when encoding fails
+    def fail(self, seg):
+        raise CouldntEncodeError("bad codec")
+
+    monkeypatch.setattr(FakeEncoder, "write", fail)
+    path = str(tmp_path / "failed.mp3")
+    with pytest.raises(CouldntEncodeError):
+        seg.export(path, format="mp3")
+    assert not os.path.exists(path)
@@ -0,0 +1,277 @@
+import array
+import io
+import pickle
+
+import pytest
+
+from pydub.audio_segment import AudioSegment, _read_all
+from pydub.exceptions import CouldntDecodeError, CouldntDecodeFilesError
+from pydub.utils import db_to_float
+
+from .conftest import make_segment
+
+
+def test_slices_share_the_buffer():
+    seg = make_segment(range(1000))
+    part = seg[100:200]
+
+    assert part._buffer is seg._buffer
+    assert part.get_array_of_samples().tolist() == list(range(100, 200))
+    assert part[10:20].get_array_of_samples().tolist() == list(range(110, 120))
+    assert seg.get_sample_slice(5, 8)._buffer is seg._buffer
+
+
+def test_raw_data_materializes_a_view():
+    seg = make_segment(range(1000))
+    part = seg[100:200]
+
+    assert part.raw_data == seg.raw_data[200:400]
+    # the view holds its own bytes from then on
+    assert part._buffer is not seg._buffer
+    assert part._buffer is part.raw_data
+
+
+def test_views_compare_and_pickle_like_copies():
+    seg = make_segment(range(1000))
+    part = seg[100:200]
+
+    assert part == make_segment(range(100, 200))
+    assert pickle.loads(pickle.dumps(part)) == part
+    assert part.rms == make_segment(range(100, 200)).rms
+
+
+def test_fade_curves():
+    # 1 second of a constant 10000 at 1000 Hz, so frame i is at i ms
+    seg = make_segment([10000] * 1000)
+
+    linear = seg.fade_in(1000).get_array_of_samples()
+    assert linear[0] == 0
+    assert linear[500] == 5000
+    assert linear[999] == 9990
+    assert list(linear) == sorted(linear)
+
+    equal_power = seg.fade_in(1000, curve="equal_power").get_array_of_samples()
+    assert equal_power[500] == 7071
+    assert list(equal_power) == sorted(equal_power)
+
+    log = seg.fade_in(1000, curve="log").get_array_of_samples()
+    # -120 dB to 0 dB, so -60 dB half way
+    assert log[500] == 10
+    assert log[999] == 9862
+
+
+def test_fade_past_the_end_keeps_its_slope():
+    seg = make_segment([10000] * 1000)
+
+    faded = seg.fade(from_gain=-120, start=0, duration=2000)
+    assert len(faded) == len(seg)
+    # 999 frames into a 2000 frame ramp
+    assert faded.get_array_of_samples()[999] == 4995
+
+
+def test_fade_unknown_curve():
+    with pytest.raises(ValueError):
+        make_segment([0] * 10).fade_in(5, curve="cubic")
+
+
+def test_24bit_data_is_widened_to_32bit():
+    # 1, -1 and -8388608 as packed little-endian 24-bit samples
+    seg = AudioSegment(b"\x01\x00\x00\xff\xff\xff\x00\x00\x80", sample_width=3,
+                       channels=1, frame_rate=1000)
+
+    assert seg.sample_width == 4
+    # the 24-bit value moves to the top 3 bytes, the sign fills the low byte
+    assert seg.raw_data == b"\x00\x01\x00\x00\xff\xff\xff\xff\xff\x00\x00\x80"
+
+
+def test_packed_24bit_segments(monkeypatch):
+    monkeypatch.setattr(AudioSegment, "packed_24bit", True)
+    # 1, -1 and -8388608 as packed little-endian 24-bit samples
+    data = b"\x01\x00\x00\xff\xff\xff\x00\x00\x80"
+    seg = AudioSegment(data, sample_width=3, channels=1, frame_rate=1000)
+
+    assert seg.sample_width == 3
+    assert seg.raw_data == data
+    assert seg[1:].raw_data == data[3:]
+    assert seg.get_array_of_samples() == array.array("i", [1, -1, -8388608])
+    assert seg.apply_gain(-6.0206).get_array_of_samples() == array.array("i", [0, -1, -4194304])
+    assert seg.overlay(seg).get_array_of_samples() == array.array("i", [2, -2, -8388608])
+    assert seg._spawn(array.array("i", [5, -5, 0])).raw_data == \
+        b"\x05\x00\x00\xfb\xff\xff\x00\x00\x00"
+
+    out = io.BytesIO()
+    seg.export(out, format="wav")
+    exported = out.getvalue()
+    assert exported[34:36] == b"\x18\x00"  # bits per sample
+    assert AudioSegment(data=exported).raw_data == data
+
+
+def test_apply_mono_filter_to_each_channel():
+    seg = make_segment([1, 10, 100, 2, 20, 200], channels=3)
+
+    def reverse_loud_channel(channel_seg):
+        return channel_seg.reverse() if channel_seg.max > 50 else channel_seg
+
+    filtered = seg.apply_mono_filter_to_each_channel(reverse_loud_channel)
+    assert filtered.channels == 3
+    assert list(filtered.get_array_of_samples()) == [1, 10, 200, 2, 20, 100]
+
+
+def test_remix():
+    seg = make_segment([100, -200, 300, 400], channels=2)
+
+    assert list(seg.remix([[0.5, 0.5]]).get_array_of_samples()) == [-50, 350]
+    remixed = seg.remix([[0, 1], [1, 0], [1, -1]])
+    assert remixed.channels == 3
+    assert list(remixed.get_array_of_samples()) == [-200, 100, 300, 400, 300, -100]
+    assert seg.apply_gain_stereo(0, 6).raw_data == \
+        seg.remix([[1, 0], [0, db_to_float(6)]]).raw_data
+    assert list(seg.invert_phase((0, 1)).get_array_of_samples()) == [100, 200, 300, -400]
+
+    with pytest.raises(ValueError):
+        seg.remix([[1]])
+
+
+def test_join_matches_chained_appends():
+    segs = [make_segment(list(range(i, i + 300 + 37 * i))) for i in range(5)]
+
+    chained = segs[0]
+    for seg in segs[1:]:
+        chained = chained.append(seg, crossfade=50)
+    assert AudioSegment.join(segs, crossfade=50) == chained
+
+    crossfades = [0, 20, 100, 0]
+    chained = segs[0]
+    for seg, crossfade in zip(segs[1:], crossfades):
+        chained = chained.append(seg, crossfade=crossfade)
+    assert AudioSegment.join(segs, crossfade=crossfades) == chained
+
+
+def test_join_edge_cases():
+    seg = make_segment([1, 2, 3])
+
+    assert len(AudioSegment.join([])) == 0
+    assert AudioSegment.join([seg]) == seg
+    assert list(AudioSegment.join([seg, seg]).get_array_of_samples()) == [1, 2, 3, 1, 2, 3]
+    with pytest.raises(ValueError):
+        AudioSegment.join([seg, seg], crossfade=[1, 1])
+    with pytest.raises(ValueError):
+        AudioSegment.join([seg, seg], crossfade=4)
+
+
+def test_iter_file_wav_and_raw():
+    seg = make_segment(list(range(-2500, 2500)), channels=2)
+    wav = io.BytesIO()
+    seg.export(wav, format="wav")
+    # a chunk after the audio data isn't read as audio
+    wav = io.BytesIO(wav.getvalue() + b"LIST\x04\x00\x00\x00INFO")
+
+    blocks = list(AudioSegment.iter_file(wav, block_ms=1000, format="wav"))
+    assert [len(block) for block in blocks] == [1000, 1000, 500]
+    assert AudioSegment.join(blocks) == seg
+
+    raw = io.BytesIO(seg.raw_data)
+    blocks = AudioSegment.iter_file(raw, block_ms=2000, format="raw", sample_width=2,
+                                    frame_rate=1000, channels=2)
+    assert [len(block) for block in blocks] == [2000, 500]
+
+
+def test_wav_audio_is_not_copied_on_decode():
+    seg = make_segment(list(range(-500, 500)), channels=2)
+    wav = io.BytesIO()
+    seg.export(wav, format="wav")
+
+    decoded = AudioSegment.from_file(wav, format="wav")
+    assert isinstance(decoded._buffer, memoryview)
+    assert decoded == seg
+
+
+def test_huge_reads_fall_back_to_chunks():
+    class HugeFile(io.BytesIO):
+        # like macOS, which can't read 2GB or more at once
+        def read(self, size=-1):
+            if size is None or size < 0 or size >= 2 ** 31:
+                raise OSError(22, "Invalid argument")
+            return super(HugeFile, self).read(size)
+
+    assert _read_all(HugeFile(b"audio" * 100)) == b"audio" * 100
+
+
+def test_from_file_time_range():
+    seg = make_segment(list(range(-3000, 3000)), channels=2)
+    wav = io.BytesIO()
+    seg.export(wav, format="wav")
+
+    def decode(**kwargs):
+        return AudioSegment.from_file(io.BytesIO(wav.getvalue()), format="wav", **kwargs)
+
+    assert decode(start_second=0.5, duration=1.25) == seg[500:1750]
+    assert decode(start_second=2.5) == seg[2500:]
+    assert decode(duration=0.1) == seg[:100]
+    assert len(decode(start_second=10)) == 0
+
+    raw = AudioSegment.from_raw(io.BytesIO(seg.raw_data), sample_width=2, frame_rate=1000,
+                                channels=2, start_second=1, duration=1)
+    assert raw == seg[1000:2000]
+
+
+def test_from_files_keeps_order_and_reports_errors(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / "{0}.wav".format(i)
+        make_segment([i] * 100).export(str(path), format="wav")
+        paths.append(str(path))
+
+    segments = AudioSegment.from_files(paths, max_workers=3)
+    assert [seg.get_array_of_samples()[0] for seg in segments] == list(range(5))
+
+    missing = str(tmp_path / "missing.wav")
+    with pytest.raises(CouldntDecodeFilesError) as e:
+        AudioSegment.from_files(paths[:2] + [missing], max_workers=2)
+    assert [file for file, _ in e.value.errors] == [missing]
+    assert isinstance(e.value, CouldntDecodeError)
+
+
+def test_from_file_target_format():
+    seg = make_segment(list(range(-3000, 3000)), channels=2)
+    wav = io.BytesIO()
+    seg.export(wav, format="wav")
+
+    got = AudioSegment.from_file(io.BytesIO(wav.getvalue()), format="wav", start_second=1,
+                                 target_frame_rate=500, target_channels=1, target_sample_width=1)
+    assert got == seg[1000:].set_channels(1).set_frame_rate(500).set_sample_width(1)
+
+    # with the whole format known, ffmpeg outputs headerless samples
+    command, pcm_format = AudioSegment._decode_command("in.mp3", frame_rate=16000, channels=1,
+                                                       sample_width=3)
+    assert command[command.index("-i") + 2:] == ["-ar", "16000", "-ac", "1", "-vn", "-f", "s24le", "-"]
+    assert (pcm_format.channels, pcm_format.sample_rate, pcm_format.bits_per_sample) == (1, 16000, 24)
+
+    # the rest of it comes from the probe
+    info = {"streams": [{"codec_type": "audio", "codec_name": "flac", "sample_fmt": "s16",
+                         "bits_per_sample": 16, "channels": 2, "sample_rate": "44100"}]}
+    command, pcm_format = AudioSegment._decode_command("in.flac", info=info, channels=1)
+    assert command[command.index("-i") + 2:] == ["-ar", "44100", "-ac", "1", "-vn", "-f", "s16le", "-"]
+    assert (pcm_format.channels, pcm_format.sample_rate, pcm_format.bits_per_sample) == (1, 44100, 16)
+
+    # otherwise it outputs wav, whose header tells
+    command, pcm_format = AudioSegment._decode_command("in.mp3", sample_width=1)
+    assert command[command.index("-i") + 2:] == ["-acodec", "pcm_u8", "-vn", "-f", "wav", "-"]
+    assert pcm_format is None
+
+
+def test_from_file_empty_output(monkeypatch):
+    # a converter that exits cleanly without writing any samples
+    monkeypatch.setattr(AudioSegment, "converter", "true")
+    with pytest.raises(CouldntDecodeError):
+        AudioSegment.from_file(io.BytesIO(b"\xff\xfb\x90\x00" * 64), format="mp3",
+                               target_frame_rate=8000, target_channels=1, target_sample_width=2)
+
+
+def test_from_mono_audiosegments_requires_equal_lengths():
+    left = make_segment([1, 2, 3])
+    stereo = AudioSegment.from_mono_audiosegments(left, make_segment([4, 5, 6]))
+    assert stereo.get_array_of_samples().tolist() == [1, 4, 2, 5, 3, 6]
+
+    with pytest.raises(ValueError):
+        AudioSegment.from_mono_audiosegments(left, make_segment([4, 5]))
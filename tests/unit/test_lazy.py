@@ -0,0 +1,65 @@
+import pytest
+
+from pydub.lazy import LazySegment
+
+from .conftest import make_segment
+
+
+def chain(seg):
+    return seg.apply_gain(-3).fade_in(200).fade_out(300).apply_gain(1.5) \
+        .remove_dc_offset(offset=0.01)
+
+
+def test_matches_eager_operations(engine):
+    seg = make_segment([(i * 7919) % 60000 - 30000 for i in range(2000)], channels=2)
+
+    eager = chain(seg).get_array_of_samples()
+    lazy = chain(seg.lazy()).get_array_of_samples()
+    assert len(lazy) == len(eager)
+    # rounded once instead of after each of the five operations
+    assert max(abs(a - b) for a, b in zip(eager, lazy)) <= 5
+
+
+def test_stages_are_deferred(engine):
+    seg = make_segment([1000] * 100)
+    lazy = seg.lazy().apply_gain(-6) - 3 + 3
+
+    assert lazy._segment is None
+    assert len(lazy._stages) == 1
+    assert (len(lazy), lazy.frame_count(), lazy.channels) == (100, 100, 1)
+    assert lazy._segment is None
+
+    assert lazy == seg.apply_gain(-6)
+    assert lazy._segment is not None
+
+
+def test_other_operations_stay_lazy(engine):
+    seg = make_segment([1000, -1000] * 50, channels=2)
+
+    left, right = seg.lazy().apply_gain(-6).split_to_mono()
+    assert isinstance(left, LazySegment)
+    assert isinstance(seg.lazy()[10:20], LazySegment)
+    assert isinstance(seg.lazy() + seg, LazySegment)
+
+    assert left.fade_in(10) == seg.apply_gain(-6).split_to_mono()[0].fade_in(10)
+    assert seg.lazy().reverse().raw_data == seg.reverse().raw_data
+
+
+def test_remove_dc_offset(engine):
+    seg = make_segment([1100, 900, 1300, 700] * 25, channels=2)
+
+    assert seg.lazy().remove_dc_offset(channel=1) == seg.remove_dc_offset(channel=1)
+    assert seg.lazy().apply_gain(-6).remove_dc_offset() == \
+        seg.apply_gain(-6).remove_dc_offset()
+    with pytest.raises(ValueError):
+        seg.lazy().remove_dc_offset(offset=2)
+
+
+def test_offsets_wrap_around_like_eager(engine):
+    seg = make_segment([32000, -32000, 32700, 100] * 25, channels=2)
+
+    def near_full_scale(seg):
+        return seg.apply_gain(1).remove_dc_offset(offset=-0.02).apply_gain(-6)
+
+    # one gain on each side of the offset, so nothing is rounded differently
+    assert near_full_scale(seg.lazy()) == near_full_scale(seg)
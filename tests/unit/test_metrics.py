@@ -0,0 +1,107 @@
+import json
+import logging
+
+import pytest
+
+import metrics
+from constants import METRICS_NAMESPACE
+from metrics import log_payload, record, stage
+
+
+def emitted(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_stage_as_context_manager(capsys):
+    with stage("fetch", key="raw/1.txt") as fetch:
+        fetch.record("Bytes", 100, "Bytes")
+        record("Bytes", 20, "Bytes")
+        record("Retries", 1)
+    record("Retries", 5)  # no stage running: dropped
+
+    [line] = emitted(capsys)
+    assert line["Stage"] == "fetch"
+    assert line["key"] == "raw/1.txt"
+    assert line["Bytes"] == 120
+    assert line["Retries"] == 1
+    assert line["Duration"] >= 0
+    assert "Errors" not in line
+
+
+def test_emf_line_shape(capsys):
+    with stage("upload") as upload:
+        upload.record("Bytes", 3, "Bytes")
+
+    [line] = emitted(capsys)
+    assert isinstance(line["_aws"]["Timestamp"], int)
+    [directive] = line["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == METRICS_NAMESPACE
+    assert directive["Dimensions"] == [["Stage"]]
+    assert sorted(directive["Metrics"], key=lambda m: m["Name"]) == [
+        {"Name": "Bytes", "Unit": "Bytes"},
+        {"Name": "Duration", "Unit": "Milliseconds"},
+    ]
+
+
+def test_stage_as_decorator(capsys):
+    @stage("synthesize")
+    def synthesize(chars):
+        record("Chars", chars)
+        return chars * 2
+
+    assert synthesize(3) == 6
+    assert synthesize(4) == 8
+
+    # a separate stage per call
+    assert [line["Chars"] for line in emitted(capsys)] == [3, 4]
+
+
+def test_nested_stages(capsys):
+    with stage("outer"):
+        record("Count", 1)
+        with stage("inner"):
+            record("Count", 10)
+        # back on the outer stage
+        record("Count", 2)
+
+    inner, outer = emitted(capsys)
+    assert (inner["Stage"], inner["Count"]) == ("inner", 10)
+    assert (outer["Stage"], outer["Count"]) == ("outer", 3)
+    assert metrics._current_stage.get() is None
+
+
+def test_errors_are_counted(capsys):
+    with pytest.raises(ValueError):
+        with stage("extract"):
+            raise ValueError("bad response")
+
+    [line] = emitted(capsys)
+    assert line["Stage"] == "extract"
+    assert line["Errors"] == 1
+    assert {"Name": "Errors", "Unit": "Count"} in line["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+
+
+def test_log_payload_sampling(monkeypatch, caplog):
+    caplog.set_level(logging.INFO)
+    monkeypatch.setenv("PAYLOAD_LOG_SAMPLE_RATE", "0.5")
+
+    monkeypatch.setattr(metrics.random, "random", lambda: 0.5)
+    log_payload("prompt", "skipped")
+    monkeypatch.setattr(metrics.random, "random", lambda: 0.49)
+    log_payload("prompt", "logged")
+
+    assert [r.getMessage() for r in caplog.records] == ["prompt: logged"]
+
+
+def test_log_payload_truncation(monkeypatch, caplog):
+    caplog.set_level(logging.INFO)
+    monkeypatch.setenv("PAYLOAD_LOG_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PAYLOAD_LOG_MAX_CHARS", "5")
+
+    log_payload("feed", "12345")
+    log_payload("feed", "123456789")
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "feed: 12345",
+        "feed: 12345... [truncated, 9 chars]",
+    ]
@@ -0,0 +1,50 @@
+from pydub.mixer import Mixer
+
+from .conftest import make_segment
+
+
+def test_tracks_are_clipped_once(engine):
+    base = make_segment([30000, 30000, 30000, 0])
+    loud = make_segment([30000, 30000])
+    inverted = make_segment([-30000, -30000, -30000])
+
+    mixed = Mixer(base).add(loud).add(inverted, position=1).mix()
+    # overlaying one at a time would clip 60000 to 32767 before adding -30000
+    assert list(mixed.get_array_of_samples()) == [32767, 30000, 0, -30000]
+
+
+def test_gain_loop_and_ducking(engine):
+    base = make_segment([1000] * 6)
+    blip = make_segment([100, 200])
+
+    mixed = Mixer(base).add(blip, position=1, gain=6.0206, loop=True).mix()
+    assert list(mixed.get_array_of_samples()) == [1000, 1200, 1400, 1200, 1400, 1200]
+
+    ducked = Mixer(base).add(blip, position=2, times=1, duck=-6.0206).mix()
+    assert list(ducked.get_array_of_samples()) == [1000, 1000, 599, 699, 1000, 1000]
+
+
+def test_ducks_apply_to_earlier_tracks(engine):
+    base = make_segment([0] * 4)
+    music = make_segment([1000] * 4)
+    voice = make_segment([10, 10])
+
+    mixed = Mixer(base).add(music).add(voice, position=1, duck=-6.0206).mix()
+    assert list(mixed.get_array_of_samples()) == [1000, 509, 509, 1000]
+
+
+def test_formats_are_synced(engine):
+    base = make_segment([0, 0], frame_rate=1000)
+    stereo = make_segment([1, 2, 3, 4], channels=2, frame_rate=1000)
+
+    mixed = Mixer(base).add(stereo).mix()
+    assert mixed.channels == 2
+    assert list(mixed.get_array_of_samples()) == [1, 2, 3, 4]
+
+
+def test_matches_overlay(engine):
+    base = make_segment(list(range(-4000, 4000, 10)))
+    seg = make_segment(list(range(0, 3000, 30)))
+
+    assert Mixer(base).add(seg, position=100, times=3, duck=-3).mix() == \
+        base.overlay(seg, position=100, times=3, gain_during_overlay=-3)
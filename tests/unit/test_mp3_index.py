@@ -0,0 +1,60 @@
+import struct
+
+import pytest
+
+from pydub.exceptions import CouldntDecodeError
+from pydub.mp3_index import index_mp3, parse_frame_header
+
+# MPEG-1 layer III, 128 kbps, 44100 Hz, joint stereo, no padding
+HEADER = 0xFFFB9044
+FRAME_SIZE = 144 * 128000 // 44100
+
+
+def make_frame(header=HEADER, payload=b""):
+    frame = struct.pack(">I", header) + payload
+    return frame + b"\0" * (FRAME_SIZE - len(frame))
+
+
+def test_parse_frame_header():
+    frame = parse_frame_header(make_frame())
+    assert frame.version == 1
+    assert frame.layer == 3
+    assert frame.bitrate == 128000
+    assert frame.sample_rate == 44100
+    assert frame.channels == 2
+    assert frame.samples == 1152
+    assert frame.size == FRAME_SIZE
+
+
+def test_index_cbr_stream():
+    data = b"ID3\x04\0\0\0\0\0\x05" + b"\0" * 5 + make_frame() * 100
+    index = index_mp3(data, seek_interval=0.5)
+
+    assert index.frame_count == 100
+    assert index.duration == pytest.approx(100 * 1152 / 44100.0)
+    assert index.bitrate == pytest.approx(128000, rel=0.01)
+    assert index.vbr_header is None
+    assert index.byte_offset(0) == 15
+    # 0.5s is frame 19.14..., so it's played by frame 19
+    assert index.byte_offset(0.5) == 15 + 19 * FRAME_SIZE
+    assert index.byte_offset(0.99) == 15 + 19 * FRAME_SIZE
+    assert index.byte_offset(1000) == index.seek_table[-1]
+
+
+def test_xing_frame_is_not_audio():
+    xing = b"\0" * 32 + b"Info" + struct.pack(">II", 1, 100)
+    data = make_frame(payload=xing) + make_frame() * 100
+    index = index_mp3(data)
+
+    assert index.vbr_header == "Info"
+    assert index.frame_count == 100
+
+
+def test_resyncs_after_garbage():
+    data = make_frame() * 10 + b"\xff\x00garbage" + make_frame() * 10
+    assert index_mp3(data).frame_count == 20
+
+
+def test_no_frames():
+    with pytest.raises(CouldntDecodeError):
+        index_mp3(b"not an mp3 file at all")
@@ -0,0 +1,75 @@
+import io
+import struct
+
+from pydub import probe
+from pydub.audio_segment import AudioSegment, _pcm_format
+
+# MPEG-1 layer III, 128 kbps, 44.1 kHz: 417 byte frames
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\0" * 413
+
+
+def sniffed_format(data):
+    info = probe.sniff_info(io.BytesIO(data))
+    return info and _pcm_format(info)
+
+
+def flac(bits):
+    streaminfo = b"\0" * 10 + struct.pack(">Q", (44100 << 44) | (1 << 41) | ((bits - 1) << 36))
+    return b"fLaC\x00\x00\x00\x22" + streaminfo + b"\0" * 16
+
+
+def vorbis(channels, sample_rate):
+    return b"\x01vorbis" + struct.pack("<IBI", 0, channels, sample_rate) + b"\0" * 14
+
+
+def ogg(packet):
+    return b"OggS" + b"\0" * 22 + b"\x01" + bytes([len(packet)]) + packet
+
+
+def test_sniffing():
+    wav = io.BytesIO()
+    AudioSegment(b"\0" * 40, sample_width=2, frame_rate=8000, channels=2).export(wav, format="wav")
+    # (sample width, channels, frame rate)
+    assert sniffed_format(wav.getvalue()) == (2, 2, 8000)
+
+    assert sniffed_format(MP3_FRAME * 2) == (2, 2, 44100)
+    id3 = b"ID3\x04\x00\x00\x00\x00\x01\x00" + b"\0" * 128
+    assert sniffed_format(id3 + MP3_FRAME) == (2, 2, 44100)
+    # a lone frame header could be chance
+    assert sniffed_format(MP3_FRAME[:100]) is None
+
+    assert sniffed_format(flac(16)) == (2, 2, 44100)
+    assert sniffed_format(flac(24)) == (4, 2, 44100)
+    assert sniffed_format(ogg(vorbis(1, 22050))) == (4, 1, 22050)
+    assert sniffed_format(ogg(b"OpusHead\x01\x02" + b"\0" * 9)) == (4, 2, 48000)
+    assert sniffed_format(b"not audio" * 10) is None
+
+
+def test_probe_results_are_cached(monkeypatch, tmp_path):
+    probed = []
+
+    def mediainfo_json(file, read_ahead_limit=-1):
+        probed.append(file)
+        return {"streams": [{"codec_type": "audio", "bits_per_sample": 24}]}
+
+    monkeypatch.setattr(probe, "mediainfo_json", mediainfo_json)
+    monkeypatch.setattr(probe, "probe_cache", probe.ProbeCache(maxsize=1))
+
+    path = tmp_path / "audio.bin"
+    path.write_bytes(b"not audio" * 10)
+    data = io.BytesIO(b"other audio" * 10)
+
+    probe.probe_info(str(path))
+    probe.probe_info(str(path))
+    assert len(probed) == 1
+
+    assert probe.probe_info(data)["streams"][0]["bits_per_sample"] == 24
+    assert data.tell() == 0
+    assert len(probed) == 2
+    # the path was evicted
+    probe.probe_info(str(path))
+    assert len(probed) == 3
+
+    # sniffed files aren't probed at all
+    probe.probe_info(io.BytesIO(MP3_FRAME * 2))
+    assert len(probed) == 3
@@ -0,0 +1,117 @@
+import random
+import warnings
+
+import pytest
+
+from pydub import pyaudioop
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    audioop = pytest.importorskip("audioop")
+
+SIZES = [1, 2, 3, 4]
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if pyaudioop.np is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setattr(pyaudioop, "np", None)
+    return request.param
+
+
+def fragment(samples, size, seed=0):
+    rnd = random.Random(seed)
+    return bytes(rnd.getrandbits(8) for _ in range(samples * size))
+
+
+def outcome(fn, *args):
+    try:
+        return fn(*args)
+    except (audioop.error, pyaudioop.error) as e:
+        return "error: {}".format(e)
+
+
+def assert_conforms(name, *args):
+    assert outcome(getattr(pyaudioop, name), *args) == \
+        outcome(getattr(audioop, name), *args), (name, args[1:])
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_statistics(backend, size):
+    for cp in (b"", fragment(301, size), audioop.mul(fragment(300, size), size, 0.01)):
+        for name in ("max", "minmax", "avg", "rms", "reverse"):
+            assert_conforms(name, cp, size)
+        for i in (0, 5, 300, -1):
+            assert_conforms("getsample", cp, size, i)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_arithmetic(backend, size):
+    # full-scale noise, so products and sums clip
+    cp = fragment(300, size)
+    other = fragment(300, size, seed=1)
+    for factor in (0, 0.5, 1, 1.2589, 2.0, -1.0, -3.7):
+        assert_conforms("mul", cp, size, factor)
+        assert_conforms("tomono", cp, size, factor, 0.3)
+        assert_conforms("tostereo", cp, size, 1, factor)
+    assert_conforms("tomono", cp[:-size], size, 0.5, 0.5)
+    assert_conforms("add", cp, other, size)
+    assert_conforms("add", cp, other[:-size], size)
+    for bias in (0, 7, -1, -128, 2 ** 31 - 1, -2 ** 31):
+        assert_conforms("bias", cp, size, bias)
+    for size2 in SIZES:
+        assert_conforms("lin2lin", cp, size, size2)
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("channels", [1, 2])
+@pytest.mark.parametrize("rates", [(8000, 8000), (44100, 48000), (48000, 44100), (11025, 44100), (7, 3)])
+def test_ratecv(backend, size, channels, rates):
+    cp = fragment(200 * channels, size)
+    for weights in ((1, 0), (3, 2)):
+        args = (size, channels) + rates
+        expected = audioop.ratecv(cp, *args, None, *weights)
+        assert pyaudioop.ratecv(cp, *args, None, *weights) == expected
+        # carry the state over to the next fragment
+        assert pyaudioop.ratecv(cp, *args, expected[1], *weights) == \
+            audioop.ratecv(cp, *args, expected[1], *weights)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_peaks_and_crossings(backend, size):
+    # a slow wave, so extremes are a few samples apart, with some repeats
+    wave = audioop.mul(fragment(300, size), size, 0.001)
+    wave = audioop.add(wave, audioop.tomono(audioop.tostereo(wave, size, 1, 1), size, 1, 0), size)
+    for cp in (b"", fragment(1, size), fragment(2, size), fragment(301, size), wave,
+               audioop.bias(wave, size, 3) * 3):
+        for name in ("avgpp", "maxpp", "cross"):
+            assert_conforms(name, cp, size)
+
+
+def test_find(backend):
+    cp = fragment(400, 2)
+    reference = audioop.mul(cp[200:300], 2, 0.7)
+    for args in ((cp, reference), (cp, cp), (cp, b""), (cp[:10], cp[:20]),
+                 (b"\0" * 40, reference[:20]), (cp, b"\0" * 20), (cp[:-1], cp)):
+        # repr, as nan doesn't equal itself
+        assert repr(outcome(pyaudioop.findfit, *args)) == repr(outcome(audioop.findfit, *args))
+    for args in ((cp, cp[::-1]), (cp[:200], reference + reference), (cp, b"\0" * 800),
+                 (b"\0" * 20, b"\0" * 20), (b"\0" * 20, cp[:20]), (cp, cp[:20]), (cp[:3], cp[:3])):
+        assert repr(outcome(pyaudioop.findfactor, *args)) == repr(outcome(audioop.findfactor, *args))
+    for length in (0, 1, 50, 400, 401, -1):
+        assert_conforms("findmax", cp, length)
+    assert_conforms("findmax", b"", 0)
+    assert_conforms("findmax", cp[:-1], 1)
+
+
+def test_errors(backend):
+    assert_conforms("mul", b"\0" * 5, 2, 1.0)
+    assert_conforms("max", b"\0" * 2, 5)
+    assert_conforms("ratecv", b"\0" * 2, 2, 0, 8000, 8000, None)
+    assert_conforms("ratecv", b"\0" * 2, 2, 1, 0, 8000, None)
+    assert_conforms("ratecv", b"\0" * 2, 2, 1, 8000, 8000, (0, ((0, 0), (0, 0))))
+    with pytest.raises(TypeError):
+        pyaudioop.rms("text", 2)
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from pydub import sample_engine
+from pydub.audio_segment import AudioSegment
+
+np = pytest.importorskip("numpy")
+
+
+def random_data(frames, channels, sample_width, seed=0):
+    rnd = random.Random(seed)
+    return bytes(rnd.getrandbits(8) for _ in range(frames * channels * sample_width))
+
+
+@pytest.fixture
+def engines():
+    yield sample_engine.AudioopEngine(), sample_engine.NumpyEngine()
+    sample_engine.set_engine()
+
+
+@pytest.mark.parametrize("sample_width", [1, 2, 3, 4])
+def test_numpy_matches_audioop(engines, sample_width):
+    audioop_engine, numpy_engine = engines
+    data = random_data(2000, 2, sample_width)
+    other = random_data(2000, 2, sample_width, seed=1)
+
+    def same(op, *args):
+        assert bytes(getattr(numpy_engine, op)(*args)) == \
+            bytes(getattr(audioop_engine, op)(*args)), (op, args[1:])
+
+    # full-scale noise, so products and sums clip
+    for factor in (0, 0.5, 1, 1.9953, -1.0):
+        same("mul", data, sample_width, factor)
+        same("tomono", data, sample_width, factor, 0.5)
+        same("tostereo", data, sample_width, 1, factor)
+    same("add", data, other, sample_width)
+    for bias in (0, 5, -128, 2 ** 31 - 1):
+        same("bias", data, sample_width, bias)
+    assert numpy_engine.avg(data, sample_width) == audioop_engine.avg(data, sample_width)
+
+    for channels in (2, 4):
+        same("get_channel", data, sample_width, channels, 1)
+        same("downmix", data, sample_width, channels)
+        same("remix", data, sample_width, [[0.5] * channels,
+                                           [1.5, -1] + [0.25] * (channels - 2),
+                                           [0] * channels])
+        assert [bytes(d) for d in numpy_engine.deinterleave(data, sample_width, channels)] == \
+            [bytes(d) for d in audioop_engine.deinterleave(data, sample_width, channels)]
+    same("remix", data, sample_width, [[1], [-0.7]])
+    same("interleave", [data, other[:100 * sample_width]], sample_width)
+    same("ramp", data, sample_width, 2, 0.001, 1.0)
+    same("ramp", data, sample_width, 2, 1.0, 0.5, "linear", 4000)
+    same("widen_24bit", data + b"\0")
+    same("unpack_24bit", data + b"\0")
+    same("pack_24bit", data)
+
+
+@pytest.mark.parametrize("curve", ["linear", "equal_power"])
+def test_long_ramps_stay_within_tolerance(engines, curve):
+    audioop_engine, numpy_engine = engines
+    audioop_engine.ramp_steps = 64
+    data = random_data(1000, 2, 2)
+
+    expected = np.frombuffer(numpy_engine.ramp(data, 2, 2, 1e-6, 1.0, curve), dtype="<i2")
+    stepped = np.frombuffer(audioop_engine.ramp(data, 2, 2, 1e-6, 1.0, curve), dtype="<i2")
+    # the gain is held over 16 frames, 1/64 of the ramp, and neither curve
+    # is steeper than pi / 2
+    assert np.abs(expected.astype(int) - stepped).max() <= 32768 * 1.571 / 64
+
+
+def test_segment_operations_match_across_engines():
+    seg = AudioSegment(random_data(3000, 2, 2), sample_width=2, frame_rate=8000, channels=2)
+    quad = AudioSegment(random_data(1000, 4, 2), sample_width=2, frame_rate=8000, channels=4)
+
+    def run():
+        mono = seg.split_to_mono()
+        return [
+            seg.apply_gain(-4.5).raw_data,
+            seg.overlay(seg[:100], position=50, gain_during_overlay=-6).raw_data,
+            seg.set_channels(1).raw_data,
+            mono[0].set_channels(2).raw_data,
+            quad.set_channels(1).raw_data,
+            quad.remix([[1, 0.5, 0.5, 1], [0, 1, -1, 0.3]]).raw_data,
+            seg.pan(-0.4).raw_data,
+            [m.raw_data for m in mono],
+            AudioSegment.from_mono_audiosegments(*mono).raw_data,
+            seg.get_dc_offset(2),
+            seg.remove_dc_offset().raw_data,
+            quad.remove_dc_offset(channel=2).raw_data,
+        ]
+
+    sample_engine.set_engine("audioop")
+    try:
+        expected = run()
+        sample_engine.set_engine("numpy")
+        assert run() == expected
+    finally:
+        sample_engine.set_engine()
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        sample_engine.set_engine("fortran")